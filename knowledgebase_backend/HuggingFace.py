@@ -12,12 +12,12 @@ from langchain.llms import HuggingFaceHub
 
 
 def get_pdf_text(pdf_docs):
-    text = ""
+    texts = []
     for pdf in pdf_docs:
         pdf_reader = PdfReader(pdf)
         for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
+            texts.append(page.extract_text())
+    return "".join(texts)
 
 
 def get_text_chunks(text):
@@ -0,0 +1,125 @@
+"""
+Compare the IVF index with the exact search of the vector store.
+
+The chunks are synthetic unit vectors drawn around random topics, --noise sets how far they
+spread from their topic, written as documents of --document-chunks chunks each. The questions
+are drawn the same way. For every corpus size and nprobe the benchmark reports the recall@k of
+the IVF index, the share of the exact k nearest chunks it returns, and the p50 and p99 latency
+of both searches.
+
+Usage, from knowledgebase_backend:
+    python benchmarks/ann_benchmark.py --sizes 10000 100000 1000000 --dimensions 384
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from infastructure.repositories.vector_store_repository import (
+    VectorStoreRepository,
+    VectorIndex,
+    normalize,
+)
+from infastructure.repositories.ann_index_repository import IvfIndex
+
+
+def draw(generator, topics, count, noise):
+    # Vectors spread around randomly chosen topics, like the chunks of real documents
+    chosen = topics[generator.integers(len(topics), size=count)]
+    return normalize(
+        chosen + noise * generator.normal(size=chosen.shape) / np.sqrt(chosen.shape[1])
+    )
+
+
+def write_corpus(directory, size, document_chunks, topics, generator, noise):
+    paths = []
+    for start in range(0, size, document_chunks):
+        count = min(document_chunks, size - start)
+        path = os.path.join(directory, f"document-{start}")
+        documents = [
+            Document(page_content=f"{start + position}", metadata={})
+            for position in range(count)
+        ]
+        VectorIndex.write(path, documents, draw(generator, topics, count, noise))
+        paths.append(path)
+    return paths
+
+
+def percentile(latencies, value):
+    return np.percentile(np.array(latencies) * 1000, value)
+
+
+def run(size, args):
+    generator = np.random.default_rng(size)
+    topics = normalize(generator.normal(size=(max(10, size // 500), args.dimensions)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(
+            directory, size, args.document_chunks, topics, generator, args.noise
+        )
+        vector_store = VectorStoreRepository()
+        indexes = {path: vector_store.load(path) for path in paths}
+
+        started = time.perf_counter()
+        ivf_index = IvfIndex.train(list(indexes.values()))
+        for path, index in indexes.items():
+            ivf_index.insert(path, index)
+        build_seconds = time.perf_counter() - started
+
+        queries = draw(generator, topics, args.questions, args.noise)
+        exact_results = []
+        exact_latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            documents = vector_store.search(paths, query, args.k)
+            exact_latencies.append(time.perf_counter() - started)
+            exact_results.append({document.page_content for document in documents})
+
+        print(
+            f"{size} chunks, {len(ivf_index.centroids)} lists, built in "
+            f"{build_seconds:.1f}s, exact p50 {percentile(exact_latencies, 50):.2f} ms "
+            f"p99 {percentile(exact_latencies, 99):.2f} ms"
+        )
+
+        for nprobe in args.nprobe:
+            recalls = []
+            latencies = []
+            for query, expected in zip(queries, exact_results):
+                started = time.perf_counter()
+                candidates = ivf_index.search(
+                    indexes, query, args.k * vector_store.rerank_factor, nprobe
+                )
+                documents = vector_store.rerank(candidates, query, args.k)
+                latencies.append(time.perf_counter() - started)
+                found = {document.page_content for document in documents}
+                recalls.append(len(found & expected) / len(expected))
+
+            print(
+                f"    nprobe {nprobe:<5} recall@{args.k} {np.mean(recalls):6.1%}   "
+                f"p50 {percentile(latencies, 50):7.2f} ms   "
+                f"p99 {percentile(latencies, 99):7.2f} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--noise", type=float, default=1.5)
+    parser.add_argument("--document-chunks", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32, 128])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args)
+
+
+if __name__ == "__main__":
+    main()
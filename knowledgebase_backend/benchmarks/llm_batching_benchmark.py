@@ -0,0 +1,81 @@
+"""
+Measure what micro-batching the completion requests does to the latency of the questions.
+
+--concurrency threads ask --questions questions between them, of the local fake model that
+completes --slots batches at a time in --latency seconds whatever their size, like a server
+with batched inference, or of the OpenAI compatible model with --provider. For every batch
+window the benchmark reports the p50 and p99 latency of a question, the throughput and the
+mean batch size.
+
+Usage, from knowledgebase_backend:
+    python benchmarks/llm_batching_benchmark.py --windows 0 10 50 --concurrency 16
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from infastructure.repositories.llm_provider_repository import (
+    FakeCompletionLLM,
+    OpenAICompletionLLM,
+)
+from infastructure.repositories.pdf_chat_repository import OPEN_AI_API_KEY
+
+
+def build_llm(args, window):
+    if args.provider:
+        return OpenAICompletionLLM(
+            OPEN_AI_API_KEY, batch_window_ms=window, max_batch_size=args.max_batch_size
+        )
+    return FakeCompletionLLM(
+        latency_seconds=args.latency,
+        batch_window_ms=window,
+        slots=args.slots,
+        max_batch_size=args.max_batch_size,
+        max_concurrency=args.slots,
+    )
+
+
+def run(args, window):
+    llm = build_llm(args, window)
+
+    def ask(number):
+        started = time.perf_counter()
+        llm.invoke(f"Question {number}: what is the warranty period of part {number}?")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = np.array(list(pool.map(ask, range(args.questions)))) * 1000
+    seconds = time.perf_counter() - started
+
+    stats = llm.get_stats() or {"mean_batch_size": 1.0}
+    print(
+        f"window {window:6.1f} ms   p50 {np.percentile(latencies, 50):8.1f} ms   "
+        f"p99 {np.percentile(latencies, 99):8.1f} ms   "
+        f"{args.questions / seconds:7.1f} questions/s   "
+        f"batch size {stats['mean_batch_size']:5.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 10, 50])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--provider", action="store_true")
+    args = parser.parse_args()
+
+    for window in args.windows:
+        run(args, window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measure the latency the cross-encoder re-ranking adds to a question.
+
+Every question re-scores --candidates synthetic chunks of about --chunk-words words, for every
+batch size given, without any timeout. The benchmark reports the p50 and p99 latency per
+question and the throughput in chunks per second, which tells how many candidates fit in
+RERANKER_TIMEOUT_SECONDS on this CPU.
+
+Usage, from knowledgebase_backend with sentence-transformers installed:
+    python benchmarks/reranker_benchmark.py --candidates 20 50 100 --batch-sizes 8 16 32
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from infastructure.repositories.reranker_repository import CrossEncoderReranker
+
+WORDS = (
+    "the pump valve seal bearing filter pressure must be checked before every start of "
+    "the hydraulic circuit and replaced when the fault code is reported by the control unit"
+).split()
+
+
+def build_chunks(count, words):
+    return [
+        Document(page_content=" ".join(random.choices(WORDS, k=words)), metadata={})
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--chunk-words", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    for batch_size in args.batch_sizes:
+        reranker = CrossEncoderReranker(batch_size=batch_size, timeout_seconds=1e9)
+
+        # Load the model and warm it up before measuring
+        reranker.rerank("warm up", build_chunks(batch_size, args.chunk_words))
+
+        for candidates in args.candidates:
+            latencies = []
+            for _ in range(args.questions):
+                chunks = build_chunks(candidates, args.chunk_words)
+                started = time.perf_counter()
+                reranker.rerank("when is the seal of the pump replaced", chunks)
+                latencies.append(time.perf_counter() - started)
+
+            latencies = np.array(latencies) * 1000
+            print(
+                f"batch {batch_size:<4} candidates {candidates:<5} "
+                f"p50 {np.percentile(latencies, 50):8.1f} ms   "
+                f"p99 {np.percentile(latencies, 99):8.1f} ms   "
+                f"{candidates / np.median(latencies) * 1000:7.0f} chunks/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the retrieval of the "similarity" and the "hybrid" mode of QueryProcessor.
+
+The document is a synthetic maintenance manual full of part numbers and fault codes and every
+question asks about one of them. A question is answered when the chunk holding its identifier
+is among the retrieved chunks. The questions are embedded once up front, so the latencies are
+those of the retrieval alone.
+
+Usage, from knowledgebase_backend with OPEN_AI_API_KEY set:
+    python benchmarks/retrieval_benchmark.py --chunks 500 --questions 100
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from infastructure.repositories.embedding_cache_repository import (
+    EmbeddingCacheRepository,
+)
+from infastructure.repositories.pdf_chat_repository import (
+    DocumentIndexer,
+    QueryProcessor,
+    OPEN_AI_API_KEY,
+)
+
+COMPONENTS = ["pump", "valve", "seal", "gasket", "bearing", "filter", "sensor", "relay"]
+SYSTEMS = ["hydraulic circuit", "cooling loop", "fuel line", "control unit"]
+SYMPTOMS = [
+    "overheats",
+    "leaks",
+    "vibrates",
+    "stops responding",
+    "draws too much current",
+]
+
+
+def build_manual(chunk_count):
+    # Every chunk describes one part with its own part number and fault code
+    texts = []
+    questions = []
+    for number in range(chunk_count):
+        part_number = f"PN-{random.randint(10000, 99999)}-{number:04d}"
+        fault_code = f"E{random.randint(100, 999)}_{number:04d}"
+        component = random.choice(COMPONENTS)
+        texts.append(
+            Document(
+                page_content=(
+                    f"Part {part_number} is the {component} of the "
+                    f"{random.choice(SYSTEMS)}. Replace the {component} every "
+                    f"{random.randint(1, 20) * 500} operating hours. Fault code "
+                    f"{fault_code} is raised when the {component} "
+                    f"{random.choice(SYMPTOMS)}."
+                ),
+                metadata={"source": "manual.pdf", "page": number // 4},
+            )
+        )
+        questions.append((f"What does fault code {fault_code} mean?", fault_code))
+        questions.append((f"How often is part {part_number} replaced?", part_number))
+    return texts, questions
+
+
+def run(query_processor, indexer, mode, questions, embeddings):
+    query_processor.retrieval_mode = mode
+    latencies = []
+    answered = 0
+    for (question, identifier), embedding in zip(questions, embeddings):
+        started = time.perf_counter()
+        documents = query_processor.retrieve(
+            question, indexer, "benchmark", ["manual.pdf"], embedding
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        answered += any(identifier in document.page_content for document in documents)
+
+    latencies.sort()
+    print(
+        f"{mode:<12}recall@{query_processor.search_args} "
+        f"{answered / len(questions):6.1%}   "
+        f"p50 {statistics.median(latencies):7.2f} ms   "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=100)
+    args = parser.parse_args()
+
+    random.seed(0)
+    texts, questions = build_manual(args.chunks)
+    questions = random.sample(questions, min(args.questions, len(questions)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        indexer = DocumentIndexer(
+            OPEN_AI_API_KEY,
+            index_directory=directory,
+            embedding_cache=EmbeddingCacheRepository(
+                os.path.join(directory, "embeddings.sqlite3")
+            ),
+        )
+        indexer.write_index("benchmark", "manual.pdf", texts)
+
+        query_processor = QueryProcessor(OPEN_AI_API_KEY)
+        embeddings = [
+            query_processor.embed_question(question) for question, _ in questions
+        ]
+
+        # Load the indexes before timing anything
+        query_processor.retrieve(
+            questions[0][0], indexer, "benchmark", ["manual.pdf"], embeddings[0]
+        )
+
+        print(f"{args.chunks} chunks, {len(questions)} questions")
+        for mode in ("similarity", "hybrid"):
+            run(query_processor, indexer, mode, questions, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare the structure aware splitter with the RecursiveCharacterTextSplitter it replaces.
+
+The pages are those of --pdf, parsed with the PdfParser, or of a synthetic maintenance manual
+of --pages pages laid out the way pypdf extracts them: numbered and capital headings, wrapped
+paragraph lines and part tables. For both splitters the benchmark reports the split time and
+throughput, the number of chunks, their size in tokens and how many chunks mix two sections,
+a heading line appearing after the start of the chunk.
+
+Usage, from knowledgebase_backend:
+    python benchmarks/splitter_benchmark.py --pages 1000
+    python benchmarks/splitter_benchmark.py --pdf manual.pdf
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import textwrap
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from infastructure.repositories.token_counter_repository import TokenCounter
+from infastructure.repositories.pdf_parser_repository import PdfParser
+from infastructure.repositories.text_splitter_repository import (
+    StructureTextSplitter,
+    is_heading,
+)
+
+WORDS = (
+    "the pump valve seal bearing filter pressure must be checked before every start of "
+    "the hydraulic circuit and replaced when the fault code is reported by the control unit"
+).split()
+
+
+def build_sentence():
+    words = random.choices(WORDS, k=random.randint(8, 24))
+    return " ".join(words).capitalize() + "."
+
+
+def build_page(number):
+    # Headings, wrapped paragraphs and a parts table, one newline between lines like pypdf
+    lines = []
+    for section in range(random.randint(1, 3)):
+        if random.random() < 0.3:
+            lines.append(f"SECTION {number}-{section} SAFETY NOTES")
+        else:
+            lines.append(
+                f"{number}.{section + 1} Maintenance of part {number}{section}"
+            )
+        for _ in range(random.randint(2, 5)):
+            paragraph = " ".join(build_sentence() for _ in range(random.randint(3, 8)))
+            lines.extend(textwrap.wrap(paragraph, 90))
+        if random.random() < 0.4:
+            for _ in range(random.randint(3, 10)):
+                lines.append(
+                    f"PN-{random.randint(10000, 99999)}    seal    "
+                    f"{random.randint(1, 9)}    {random.uniform(1, 99):.2f}"
+                )
+    return "\n".join(lines)
+
+
+def load_pages(args):
+    if args.pdf:
+        return PdfParser().load(args.pdf, args.pdf)
+    random.seed(0)
+    return [
+        Document(page_content=build_page(number), metadata={"page": number})
+        for number in range(args.pages)
+    ]
+
+
+def count_mixed_sections(chunks):
+    # Chunks in which a heading line appears after their first line
+    return sum(
+        any(is_heading(line) for line in chunk.page_content.split("\n")[1:])
+        for chunk in chunks
+    )
+
+
+def run(name, split, pages, token_counter, repeat):
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = split(pages)
+        seconds.append(time.perf_counter() - started)
+    best = min(seconds)
+
+    tokens = np.array(
+        token_counter.count_batch([chunk.page_content for chunk in chunks])
+    )
+    print(
+        f"{name:<10} {best * 1000:8.1f} ms  {len(pages) / best:9.0f} pages/s  "
+        f"{len(chunks):6} chunks  tokens mean {tokens.mean():6.1f} "
+        f"p95 {np.percentile(tokens, 95):6.1f} max {tokens.max():5}  "
+        f"mixed sections {count_mixed_sections(chunks):5}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    token_counter = TokenCounter()
+    characters = sum(len(page.page_content) for page in pages)
+    print(f"{len(pages)} pages, {characters} characters")
+
+    recursive = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        add_start_index=True,
+    )
+    structure = StructureTextSplitter(token_counter=token_counter)
+    run("recursive", recursive.split_documents, pages, token_counter, args.repeat)
+    run("structure", structure.split_documents, pages, token_counter, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
+import json
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from internal.entities.pdf import Pdf
 from internal.interfaces.database_interface import DatabaseInterface
-from infastructure.repositories.database_repository import DatabaseRepository
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
 from internal.use_cases.database_service import DatabaseService
 from infastructure.repositories.pdf_chat_repository import PdfChatRepository
 from internal.use_cases.pdf_service import PdfService
@@ -24,9 +28,67 @@ auth_service = AuthenticationService(auth_repository)
 pdf_repository = PdfChatRepository()
 pdf_service = PdfService(pdf_repository)
 
-database_repository = DatabaseRepository()
+database_repository = AsyncDatabaseRepository()
 database_service = DatabaseService(database_repository)
 
+# The chat repository keeps the history of the conversation sessions bounded
+conversations = pdf_repository.conversations
+
+
+async def get_pdf_names(user: str, pdf: Pdf, database_interface: DatabaseInterface):
+    """
+    Return the names of the indexed files the question is asked about, or the error response.
+    """
+    requested = pdf.get_filenames()
+    pdfs = await database_interface.find_pdfs(user, requested, pdf.tag)
+
+    # Every file asked about by name must belong to the user
+    if not pdfs or (requested is not None and len(pdfs) != len(set(requested))):
+        return None, JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "File does not belong to user"},
+        )
+
+    # The answer can only be generated from the files that are indexed
+    pdf_names = [
+        pdf_data["pdf_name"]
+        for pdf_data in pdfs
+        if pdf_data.get("ingest_status") in (None, "indexed")
+    ]
+
+    # A file whose ingestion failed has to be uploaded again before it can be asked about
+    failed = [
+        pdf_data for pdf_data in pdfs if pdf_data.get("ingest_status") == "failed"
+    ]
+    if failed and (not pdf_names or pdf.filename):
+        return None, JSONResponse(
+            status_code=422,
+            content={
+                "status": "error",
+                "message": "File could not be processed, upload it again",
+            },
+        )
+
+    if not pdf_names or (pdf.filename and len(pdf_names) != len(pdfs)):
+        return None, JSONResponse(
+            status_code=409,
+            content={"status": "error", "message": "File is still being processed"},
+        )
+
+    return pdf_names, None
+
+
+async def get_session(
+    user: str, pdf: Pdf, pdf_names: list, database_interface: DatabaseInterface
+):
+    """
+    Return the conversation session the question is part of, or None without a session id.
+    """
+    if pdf.session_id is None:
+        return None
+    session = await database_interface.get_session(user, pdf.session_id)
+    return conversations.start(session, user, pdf.session_id, pdf_names)
+
 
 @pdf_router.post("/ask_question")
 async def ask_question(
@@ -40,8 +102,6 @@ async def ask_question(
     # Get the current user
     user = auth_interface.get_current_user(current_user)
 
-    print(user)
-
     # Check if the user is valid
     if user is None:
         return JSONResponse(
@@ -49,22 +109,101 @@ async def ask_question(
             content={"status": "error", "message": "Invalid token"},
         )
 
-        # Check if the file actually belongs to the user.
-    belongs_to_user = database_interface.check_if_file_belongs_to_user(
-        user, pdf.filename
+    # Find the files the question is asked about
+    pdf_names, error_response = await get_pdf_names(user, pdf, database_interface)
+    if error_response is not None:
+        return error_response
+
+    # Follow-up questions of a session are answered with its history
+    session = await get_session(user, pdf, pdf_names, database_interface)
+
+    # Generate a response
+    response = await run_in_threadpool(
+        pdf_interface.generate_response, pdf.question, pdf_names, user, session
     )
+    if response is not None:
+        content = {"status": "success", "message": response}
+        if session is not None:
+            await database_interface.save_session(session)
+            content["session_id"] = pdf.session_id
+        return JSONResponse(status_code=200, content=content)
+
+
+async def format_server_sent_events(events):
+    # Turn the (event, data) pairs of the answer into Server-Sent Events
+    async for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def save_session_after(events, session, database_interface: DatabaseInterface):
+    # The session is saved once the whole answer has been sent
+    async for event in events:
+        yield event
+    await database_interface.save_session(session)
+
+
+@pdf_router.post("/ask_question/stream")
+async def ask_question_stream(
+    pdf: Pdf,
+    current_user: str = Depends(oauth2_scheme),
+    auth_interface: AuthInterface = Depends(auth_service),
+    pdf_interface: PdfInterface = Depends(pdf_service),
+    database_interface: DatabaseInterface = Depends(database_service),
+):
+
+    # Get the current user
+    user = auth_interface.get_current_user(current_user)
 
-    # If the file does not belong to the user, return an error message
-    if belongs_to_user == False:
+    # Check if the user is valid
+    if user is None:
         return JSONResponse(
             status_code=404,
-            content={"status": "error", "message": "File does not belong to user"},
+            content={"status": "error", "message": "Invalid token"},
         )
 
-    # Generate a response
-    response = pdf_interface.generate_response(pdf.question, pdf.filename)
-    if response is not None:
+    # Find the files the question is asked about
+    pdf_names, error_response = await get_pdf_names(user, pdf, database_interface)
+    if error_response is not None:
+        return error_response
+
+    # Follow-up questions of a session are answered with its history
+    session = await get_session(user, pdf, pdf_names, database_interface)
+
+    # Send the retrieved chunks, then the answer token by token. The generator blocks
+    # on the model, so it is iterated in the thread pool.
+    events = iterate_in_threadpool(
+        pdf_interface.stream_response(pdf.question, pdf_names, user, session)
+    )
+    if session is not None:
+        events = save_session_after(events, session, database_interface)
+    return StreamingResponse(
+        format_server_sent_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@pdf_router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    current_user: str = Depends(oauth2_scheme),
+    auth_interface: AuthInterface = Depends(auth_service),
+    database_interface: DatabaseInterface = Depends(database_service),
+):
+
+    # Get the current user
+    user = auth_interface.get_current_user(current_user)
+
+    # Check if the user is valid
+    if user is None:
         return JSONResponse(
-            status_code=200,
-            content={"status": "success", "message": response},
+            status_code=404,
+            content={"status": "error", "message": "Invalid token"},
         )
+
+    # Forget the history of the conversation
+    await database_interface.delete_session(user, session_id)
+    return JSONResponse(
+        status_code=200,
+        content={"status": "success", "message": "Session deleted"},
+    )
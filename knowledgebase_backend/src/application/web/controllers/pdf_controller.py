@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, File, UploadFile, Form
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from infastructure.repositories.aws_repository import AWSRepository
 from internal.use_cases.aws_service import AwsService
 from fastapi.responses import JSONResponse
@@ -7,11 +8,18 @@ from internal.interfaces.auth_interface import AuthInterface
 from internal.interfaces.aws_interface import AwsInterface
 from internal.interfaces.database_interface import DatabaseInterface
 from infastructure.repositories.auth_repository import AuthRepository
-from infastructure.repositories.database_repository import DatabaseRepository
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
 from internal.use_cases.database_service import DatabaseService
 from internal.use_cases.auth_service import AuthenticationService
 from fastapi.encoders import jsonable_encoder
 from internal.helper.auth_helper import get_current_user
+from internal.interfaces.pdf_interface import PdfInterface
+from application.web.controllers.pdf_chat_controller import pdf_repository, pdf_service
+from infastructure.repositories.ingestion_repository import IngestionRepository
+from internal.use_cases.ingestion_service import IngestionService
+from internal.interfaces.ingestion_interface import IngestionInterface
 
 # Create a router for the AWS controller
 aws_router = APIRouter()
@@ -24,9 +32,14 @@ aws_repository = AWSRepository()
 aws_service = AwsService(aws_repository)
 auth_repository = AuthRepository()
 auth_service = AuthenticationService(auth_repository)
-database_repository = DatabaseRepository()
+database_repository = AsyncDatabaseRepository()
 database_service = DatabaseService(database_repository)
 
+# The chat repository is shared with the pdf chat controller, so that deleting or
+# re-indexing a file invalidates the caches the questions are answered from
+ingestion_repository = IngestionRepository(pdf_repository)
+ingestion_service = IngestionService(ingestion_repository, database_service)
+
 
 @aws_router.post("/upload_pdf")
 async def upload_pdf(
@@ -37,6 +50,7 @@ async def upload_pdf(
     auth_interface: AuthInterface = Depends(auth_service),
     aws_interface: AwsInterface = Depends(aws_service),
     database_interface: DatabaseInterface = Depends(database_service),
+    ingestion_interface: IngestionInterface = Depends(ingestion_service),
 ):
 
     # user = auth_interface.user_info(current_user)
@@ -49,29 +63,87 @@ async def upload_pdf(
             content={"status": "error", "message": "Invalid token"},
         )
 
-    # Extract the filename and the content of the file. Giving a unique name is important hence the user's email is used
+    # Extract the filename of the file. Giving a unique name is important hence the user's email is used
     file_name = file.filename
-    file_content = await file.read()
 
     # Check if the file is empty
-    if not file_name or not file_content:
+    if not file_name or not file.size:
         return {"message": "Please provide a file name and content"}
 
-    # Upload the file to the S3 bucket
-    updated = aws_interface.upload_pdf(user, file_name, file_content)
+    # Stream the file to the S3 bucket, the hash of the content is computed on the way
+    content_hash = await aws_interface.upload_pdf_stream(user, file_name, file)
 
     # Return a success message if the file was uploaded successfully
-    if updated == True:
+    if content_hash is not None:
+
+        # Details of a previous upload of the file with the same name
+        previous = await database_interface.get_pdf_details(user, file_name)
 
         # Save the file details to the database
-        saved = database_interface.insert_one(user, file_name, tag, description)
+        saved = await database_interface.insert_one(
+            user, file_name, tag, description, content_hash
+        )
 
         if saved is not None:
+
+            # The same content was already indexed, there is nothing to ingest again
+            unchanged = (
+                previous is not None
+                and previous.get("content_hash") == content_hash
+                and previous.get("ingest_status") == "indexed"
+            )
+
+            # Parse, split, embed and index the file in the background
+            job_id = None
+            if not unchanged:
+                job_id = await ingestion_interface.enqueue_document(user, file_name)
+
             return JSONResponse(
                 status_code=200,
-                content={"status": "success", "message": "File uploaded successfully"},
+                content={
+                    "status": "success",
+                    "message": "File uploaded successfully",
+                    "job_id": job_id,
+                },
             )
 
+    return JSONResponse(
+        status_code=500,
+        content={"status": "error", "message": "Failed to upload file"},
+    )
+
+
+@aws_router.get("/ingest_status")
+async def ingest_status(
+    file_name: str,
+    current_user: str = Depends(get_current_user),
+    auth_interface: AuthInterface = Depends(auth_service),
+    ingestion_interface: IngestionInterface = Depends(ingestion_service),
+):
+    # Get the current user
+    user = auth_interface.get_current_user(current_user)
+
+    # Check if the user is valid
+    if user is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Invalid token"},
+        )
+
+    # Get the state of the ingestion job of the file
+    ingest_status = await ingestion_interface.get_ingest_status(user, file_name)
+
+    if ingest_status is not None:
+        return JSONResponse(
+            status_code=200,
+            content={"status": "success", "ingestion": ingest_status},
+        )
+
+    return JSONResponse(
+        status_code=404,
+        content={"status": "error", "message": "File not found"},
+    )
+
 
 @aws_router.get("/get_all_pdfs")
 async def get_all_pdfs(
@@ -90,7 +162,7 @@ async def get_all_pdfs(
         )
 
     # Get all the PDFs from the S3 bucket
-    pdfs = database_interface.find_all(user)
+    pdfs = await database_interface.find_all(user)
 
     if pdfs is not None:
 
@@ -123,7 +195,9 @@ async def get_pdf_url(
         )
 
     # Check if the file actually belongs to the user.
-    belongs_to_user = database_interface.check_if_file_belongs_to_user(user, file_name)
+    belongs_to_user = await database_interface.check_if_file_belongs_to_user(
+        user, file_name
+    )
 
     # If the file does not belong to the user, return an error message
     if belongs_to_user == False:
@@ -155,6 +229,7 @@ async def delete_pdf(
     auth_interface: AuthInterface = Depends(auth_service),
     aws_interface: AwsInterface = Depends(aws_service),
     database_interface: DatabaseInterface = Depends(database_service),
+    pdf_interface: PdfInterface = Depends(pdf_service),
 ):
     # Get the current user
     user = auth_interface.get_current_user(current_user)
@@ -167,7 +242,9 @@ async def delete_pdf(
         )
 
     # Check if the file actually belongs to the user.
-    belongs_to_user = database_interface.check_if_file_belongs_to_user(user, file_name)
+    belongs_to_user = await database_interface.check_if_file_belongs_to_user(
+        user, file_name
+    )
 
     # If the file does not belong to the user, return an error message
     if belongs_to_user == False:
@@ -176,12 +253,16 @@ async def delete_pdf(
             content={"status": "error", "message": "File does not belong to user"},
         )
 
+    # Remove the stored index of the file. It waits for an ingestion of the file in
+    # progress, so it runs on a worker thread instead of the event loop
+    await run_in_threadpool(pdf_interface.delete_index, user, file_name)
+
     # Delete the file from the S3 bucket
     # deleted = aws_interface.delete_pdf(file_name)
 
     # If the file was deleted successfully, delete the file details from the database
     # if deleted == True:
-    deleted_from_db = database_interface.delete_one(user, file_name)
+    deleted_from_db = await database_interface.delete_one(user, file_name)
 
     if deleted_from_db is not None:
         return JSONResponse(
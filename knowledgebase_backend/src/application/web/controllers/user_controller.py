@@ -24,7 +24,7 @@ async def signup(user: UserBase, user_interface: UserInterface = Depends(user_se
     user_data = user.model_dump()
 
     # Create the user
-    user_resonse = user_interface.create_user(user_data)
+    user_resonse = await user_interface.create_user(user_data)
 
     # Check if the user already exists then return error.
     if user_resonse is None:
@@ -46,7 +46,7 @@ async def all_data(
     password = user_data["password"]
 
     # Check if password matches from the database records.
-    is_valid_entry = auth_interface.check_password_for_login(username, password)
+    is_valid_entry = await auth_interface.check_password_for_login(username, password)
 
     # In case the password does not match return error.
     if is_valid_entry == False:
@@ -60,7 +60,7 @@ async def all_data(
         refresh_token = auth_interface.create_refresh_token(data)
 
         # Save the refresh token in the database
-        auth_interface.save_refresh_token(username, refresh_token)
+        await auth_interface.save_refresh_token(username, refresh_token)
 
         return {
             "access_token": access_token,
@@ -136,5 +136,4 @@ async def google_auth_callback(
 
 @router.get("/auth/user_info")
 async def user_info(url: str, auth_interface: AuthInterface = Depends(auth_service)):
-    print(auth_interface.user_info(url))
     return auth_interface.user_info(url)
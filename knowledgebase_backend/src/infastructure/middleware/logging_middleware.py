@@ -1,7 +1,113 @@
+import os
+import time
+import uuid
+import random
+import logging
+from infastructure.resources.log_queue import REQUEST_CONTEXT
+from dotenv import load_dotenv
 
+# Load environment variables from .env file
+load_dotenv()
 
-async def log_middleware(request, call_next):
-    print(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"Response: {response.status_code}")
-    return response
+# Access environment variables
+LOG_SAMPLE_RATES = os.getenv(
+    "LOG_SAMPLE_RATES", "/health=0.01,/health/pools=0.01,/metrics=0.01"
+)
+LOG_SLOW_REQUEST_SECONDS = float(os.getenv("LOG_SLOW_REQUEST_SECONDS", 1.0))
+
+logger = logging.getLogger("knowledgebase.access")
+
+
+def parse_sample_rates(sample_rates: str) -> dict:
+    # "route=rate,route=rate", the routes not listed are always logged
+    rates = {}
+    for entry in sample_rates.split(","):
+        if "=" in entry:
+            route, rate = entry.rsplit("=", 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class LoggingMiddleware:
+    """
+    Log one JSON line per HTTP request with its method, route, status, duration, user and
+    request id. The request id is taken from the X-Request-ID header or generated, and sent
+    back in the response. The routes in sample_rates, like the health checks, only log that
+    share of their requests, but failed and slow requests are always logged.
+    Written as a plain ASGI middleware, the response is streamed through untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rates=LOG_SAMPLE_RATES,
+        slow_request_seconds=LOG_SLOW_REQUEST_SECONDS,
+    ):
+        self.app = app
+        self.sample_rates = parse_sample_rates(sample_rates)
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self.get_request_id(scope)
+        context = {"request_id": request_id, "user": None}
+        token = REQUEST_CONTEXT.set(context)
+        response = {"status": 500}
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (b"x-request-id", request_id.encode("latin-1")),
+                    ],
+                }
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            REQUEST_CONTEXT.reset(token)
+            self.log(scope, response["status"], time.perf_counter() - started, context)
+
+    def get_request_id(self, scope):
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                return value.decode("latin-1")[:128]
+        return uuid.uuid4().hex
+
+    def log(self, scope, status, seconds, context):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
+        # The template of the route matched by the router, the path otherwise
+        route = getattr(scope.get("route"), "path", scope["path"])
+        sample_rate = self.sample_rates.get(route, 1.0)
+        if (
+            sample_rate < 1.0
+            and status < 500
+            and seconds < self.slow_request_seconds
+            and random.random() >= sample_rate
+        ):
+            return
+
+        logger.info(
+            "request",
+            extra={
+                "fields": {
+                    "request_id": context["request_id"],
+                    "method": scope["method"],
+                    "route": route,
+                    "status": status,
+                    "duration_ms": round(seconds * 1000, 2),
+                    "user": context["user"],
+                    "sample_rate": sample_rate,
+                }
+            },
+        )
@@ -0,0 +1,343 @@
+import os
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", 20000))
+IVF_LISTS_FACTOR = float(os.getenv("IVF_LISTS_FACTOR", 4))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 32))
+IVF_TRAINING_SAMPLE = int(os.getenv("IVF_TRAINING_SAMPLE", 50000))
+IVF_TRAINING_ITERATIONS = int(os.getenv("IVF_TRAINING_ITERATIONS", 8))
+IVF_COMPACTION_RATIO = float(os.getenv("IVF_COMPACTION_RATIO", 0.2))
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", 4))
+
+# Rows of vectors compared with the centroids at a time
+ASSIGN_BLOCK_ROWS = 8192
+
+# The code of an entry of an inverted list is its segment and its position in the segment
+POSITION_BITS = 32
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+
+def assign(vectors, centroids):
+    # Nearest centroid of every unit vector, block by block to bound the memory
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + ASSIGN_BLOCK_ROWS], np.float32)
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors, count, iterations=IVF_TRAINING_ITERATIONS, seed=0):
+    """
+    Spherical k-means of the unit vectors, the centroids are unit vectors too.
+    """
+    generator = np.random.default_rng(seed)
+    count = min(count, len(vectors))
+    centroids = vectors[generator.choice(len(vectors), count, replace=False)]
+
+    for _ in range(iterations):
+        assignments = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+
+        # An empty list gets a random vector as its new centroid
+        empty = np.flatnonzero(~sums.any(axis=1))
+        sums[empty] = vectors[generator.choice(len(vectors), len(empty))]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+class IvfIndex:
+    """
+    Inverted file index of the chunks of one user.
+    The vectors stay in the segments, the immutable index files of the document versions. Every
+    chunk is listed under its nearest centroid, so a question only scans the lists of the
+    nprobe centroids closest to it. A deleted segment is only tombstoned, its entries are
+    dropped from the lists by the next compaction.
+    Inserts, deletes and compactions run one at a time, the searches run alongside them and
+    read the segments and the lists under the lock, so they always see a consistent state.
+    """
+
+    def __init__(self, centroids):
+        self.lock = threading.Lock()
+        self.centroids = centroids
+        self.lists = [[] for _ in range(len(centroids))]
+        self.segments = {}
+        self.sizes = {}
+        self.tombstones = set()
+        self.next_segment = 0
+        self.trained_size = 0
+
+    @classmethod
+    def train(cls, indexes, sample_size=IVF_TRAINING_SAMPLE):
+        """
+        Train the centroids on a sample of the vectors of the indexes, about
+        IVF_LISTS_FACTOR * sqrt(chunks) of them.
+        """
+        sizes = [len(index) for index in indexes]
+        total = sum(sizes)
+        generator = np.random.default_rng(0)
+        sample = []
+        for index, size in zip(indexes, sizes):
+            take = min(size, math.ceil(sample_size * size / max(total, 1)))
+            if take:
+                rows = np.sort(generator.choice(size, take, replace=False))
+                sample.append(np.asarray(index.vectors[rows], np.float32))
+
+        lists = max(1, int(IVF_LISTS_FACTOR * math.sqrt(total)))
+        ivf_index = cls(train_centroids(np.concatenate(sample), lists))
+        ivf_index.trained_size = total
+        return ivf_index
+
+    def insert(self, path, index):
+        if path in self.segments or not len(index):
+            return
+        segment = self.next_segment
+        self.next_segment += 1
+
+        # Group the positions of the segment by their centroid
+        assignments = assign(index.vectors, self.centroids)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        codes = (np.int64(segment) << POSITION_BITS) | order.astype(np.int64)
+        with self.lock:
+            for centroid in np.flatnonzero(np.diff(bounds)):
+                parts = self.lists[centroid]
+                parts.append(codes[bounds[centroid] : bounds[centroid + 1]])
+                if len(parts) > 8:
+                    self.lists[centroid] = [np.concatenate(parts)]
+
+            self.segments[path] = segment
+            self.sizes[segment] = len(index)
+
+    def delete(self, path):
+        with self.lock:
+            segment = self.segments.pop(path, None)
+            if segment is not None:
+                self.tombstones.add(segment)
+
+    def get_live_size(self):
+        with self.lock:
+            return sum(self.sizes[segment] for segment in self.segments.values())
+
+    def get_deleted_size(self):
+        with self.lock:
+            return sum(self.sizes[segment] for segment in self.tombstones)
+
+    def needs_compaction(self):
+        deleted = self.get_deleted_size()
+        return deleted > IVF_COMPACTION_RATIO * (deleted + self.get_live_size())
+
+    def needs_training(self):
+        return self.get_live_size() > IVF_RETRAIN_GROWTH * self.trained_size
+
+    def compact(self):
+        # Drop the entries of the tombstoned segments from new lists, the searches keep
+        # reading the current ones until they are swapped in
+        with self.lock:
+            tombstones = np.array(sorted(self.tombstones), dtype=np.int64)
+            current = [list(parts) for parts in self.lists]
+        lists = []
+        for parts in current:
+            if not parts:
+                lists.append([])
+                continue
+            codes = np.concatenate(parts)
+            codes = codes[~np.isin(codes >> POSITION_BITS, tombstones)]
+            lists.append([codes] if len(codes) else [])
+
+        with self.lock:
+            self.lists = lists
+            for segment in tombstones:
+                del self.sizes[int(segment)]
+            self.tombstones.difference_update(int(segment) for segment in tombstones)
+
+    def search(self, indexes, query, count, nprobe=IVF_NPROBE):
+        """
+        Return the approximate (score, index, position) of the count best chunks of the given
+        segments, a dict of path -> VectorIndex, in the lists of the nprobe nearest centroids.
+        """
+        centroid_scores = self.centroids @ query
+        if nprobe < len(centroid_scores):
+            probes = np.argpartition(-centroid_scores, nprobe)[:nprobe]
+        else:
+            probes = np.arange(len(centroid_scores))
+
+        # The segments and the lists of one state of the index, the arrays of the lists are
+        # never changed once added so they are scanned without the lock
+        with self.lock:
+            selected = {
+                self.segments[path]: index
+                for path, index in indexes.items()
+                if path in self.segments
+            }
+            parts = [part for centroid in probes for part in self.lists[centroid]]
+        if not selected or not parts:
+            return []
+        codes = np.concatenate(parts)
+
+        # Only keep the chunks of the selected segments, grouped by segment
+        segments = codes >> POSITION_BITS
+        codes = codes[np.isin(segments, list(selected))]
+        codes.sort()
+        segments = codes >> POSITION_BITS
+        bounds = np.flatnonzero(np.diff(segments)) + 1
+
+        candidates = []
+        for group in np.split(codes, bounds):
+            if not len(group):
+                continue
+            index = selected[int(group[0] >> POSITION_BITS)]
+            positions = group & POSITION_MASK
+            scores = (index.quantized[positions].astype(np.float32) @ query) * (
+                index.scales[positions]
+            )
+            if len(scores) > count:
+                best = np.argpartition(-scores, count)[:count]
+                positions, scores = positions[best], scores[best]
+            candidates.extend(
+                (float(score), index, int(position))
+                for position, score in zip(positions, scores)
+            )
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return candidates[:count]
+
+
+class AnnIndexRepository:
+    """
+    The IVF indexes of the users, kept in memory and built from the vector store.
+    A user gets an IVF index once a question spans at least ANN_MIN_CHUNKS chunks, smaller
+    searches are exact. Training, inserts, deletes and compactions run one at a time on a
+    background thread, a question never waits for them and is answered by the exact search
+    until the IVF index holds all of its documents.
+    """
+
+    def __init__(self, vector_store, min_chunks=ANN_MIN_CHUNKS, nprobe=IVF_NPROBE):
+        self.vector_store = vector_store
+        self.min_chunks = min_chunks
+        self.nprobe = nprobe
+        self.indexes = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ann-index")
+
+    def submit(self, task, *args):
+        def run():
+            try:
+                task(*args)
+            except Exception as e:
+                logger.error("ANN index task failed: %s", e)
+
+        self.worker.submit(run)
+
+    def search(self, username, paths, query, k):
+        """
+        Return the (score, index, position) candidates of the k * rerank factor best chunks of
+        the documents at the paths, or None when the exact search has to answer.
+        """
+        indexes = {path: self.vector_store.load(path) for path in paths}
+        indexes = {path: index for path, index in indexes.items() if index is not None}
+        if sum(len(index) for index in indexes.values()) < self.min_chunks:
+            return None
+
+        ivf_index = self.indexes.get(username)
+        if ivf_index is None:
+            self.schedule(username, "train", self.train, username, list(indexes))
+            return None
+
+        # Documents written by another worker process are inserted here first
+        missing = [path for path in indexes if path not in ivf_index.segments]
+        if missing:
+            for path in missing:
+                self.schedule(username, path, self.insert, username, path)
+            return None
+
+        return ivf_index.search(
+            indexes, query, k * self.vector_store.rerank_factor, self.nprobe
+        )
+
+    def schedule(self, username, key, task, *args):
+        # The same task is only queued once
+        with self.lock:
+            if (username, key) in self.pending:
+                return
+            self.pending.add((username, key))
+
+        def run():
+            try:
+                task(*args)
+            finally:
+                with self.lock:
+                    self.pending.discard((username, key))
+
+        self.submit(run)
+
+    def train(self, username, paths):
+        indexes = [self.vector_store.load(path) for path in paths]
+        indexes = [
+            (path, index) for path, index in zip(paths, indexes) if index is not None
+        ]
+        ivf_index = IvfIndex.train([index for _, index in indexes])
+        for path, index in indexes:
+            ivf_index.insert(path, index)
+        self.indexes[username] = ivf_index
+
+    def insert(self, username, path):
+        ivf_index = self.indexes.get(username)
+        index = self.vector_store.load(path)
+        if ivf_index is None or index is None:
+            return
+        ivf_index.insert(path, index)
+        self.maintain(username)
+
+    def delete(self, username, path):
+        ivf_index = self.indexes.get(username)
+        if ivf_index is None:
+            return
+        ivf_index.delete(path)
+        self.maintain(username)
+
+    def maintain(self, username):
+        # Compact once enough chunks are deleted, and retrain once the index outgrew its lists
+        ivf_index = self.indexes[username]
+        if ivf_index.needs_training():
+            self.train(username, list(ivf_index.segments))
+        elif ivf_index.needs_compaction():
+            ivf_index.compact()
+
+    def on_replace(self, username, previous_path, path):
+        # A new version of a document replaces the previous one in the index of its user
+        if username not in self.indexes:
+            return
+        if previous_path is not None:
+            self.submit(self.delete, username, previous_path)
+        self.submit(self.insert, username, path)
+
+    def on_delete(self, username, path):
+        if username in self.indexes and path is not None:
+            self.submit(self.delete, username, path)
+
+    def get_stats(self):
+        return {
+            username: {
+                "lists": len(ivf_index.centroids),
+                "chunks": ivf_index.get_live_size(),
+                "deleted_chunks": ivf_index.get_deleted_size(),
+            }
+            for username, ivf_index in list(self.indexes.items())
+        }
+
+    def shutdown(self):
+        self.worker.shutdown(wait=False, cancel_futures=True)
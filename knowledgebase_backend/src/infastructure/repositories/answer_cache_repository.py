@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 10000))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 24 * 60 * 60))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0.95)
+)
+
+
+class AnswerCacheRepository:
+    """
+    LRU cache of the answers given for a document, with a time to live.
+    Answers are keyed by the user, the documents asked about with the version of their index
+    and the normalized question.
+    With the semantic tier enabled, a question whose embedding is close enough to the one of
+    a cached question of the same document reuses its answer.
+    """
+
+    def __init__(
+        self,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        semantic=ANSWER_CACHE_SEMANTIC,
+        similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        # (document key, normalized question) -> cached answer, least recently used first
+        self.entries = OrderedDict()
+
+        # document key -> normalized questions cached for the document
+        self.questions = {}
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        # Case, spacing and trailing punctuation do not change the question
+        return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
+
+    @staticmethod
+    def normalize_embedding(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, document_key: tuple, question: str, embed=None):
+        """
+        Return the cached entry of the question, or None, and the embedding of the question.
+        The question is only embedded with embed once the exact lookup missed, to search the
+        semantic tier. The embedding is None when it was not computed.
+        """
+        question_key = self.normalize_question(question)
+        with self.lock:
+            entry = self.get_entry((document_key, question_key))
+            if entry is not None:
+                self.hits += 1
+                return entry, None
+
+            if not self.semantic or embed is None:
+                self.misses += 1
+                return None, None
+
+        # The embedding model is called outside of the lock
+        embedding = embed()
+        with self.lock:
+            entry = self.find_similar(document_key, embedding)
+            if entry is not None:
+                self.semantic_hits += 1
+            else:
+                self.misses += 1
+        return entry, embedding
+
+    def get_entry(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        # Drop the entries that outlived their time to live
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            self.remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def find_similar(self, document_key: tuple, embedding):
+        # Only the questions embedded and still alive are compared
+        now = time.time()
+        keys = []
+        for question_key in self.questions.get(document_key, ()):
+            entry = self.entries[(document_key, question_key)]
+            alive = now - entry["created_at"] <= self.ttl_seconds
+            if entry["embedding"] is not None and alive:
+                keys.append((document_key, question_key))
+        if not keys:
+            return None
+
+        # Cosine similarity of the question with every cached question of the document
+        cached = np.stack([self.entries[key]["embedding"] for key in keys])
+        similarities = cached @ self.normalize_embedding(embedding)
+        best = int(np.argmax(similarities))
+
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self.get_entry(keys[best])
+
+    def put(self, document_key: tuple, question: str, entry: dict, embedding=None):
+        key = (document_key, self.normalize_question(question))
+        with self.lock:
+            self.entries[key] = {
+                **entry,
+                "embedding": (
+                    self.normalize_embedding(embedding)
+                    if self.semantic and embedding is not None
+                    else None
+                ),
+                "created_at": time.time(),
+            }
+            self.entries.move_to_end(key)
+            self.questions.setdefault(document_key, set()).add(key[1])
+
+            # Evict the least recently used answers above the size bound
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key: tuple):
+        document_key, question_key = key
+        self.entries.pop(key, None)
+        questions = self.questions.get(document_key)
+        if questions is not None:
+            questions.discard(question_key)
+            if not questions:
+                del self.questions[document_key]
+
+    def invalidate(self, username: str, pdf_name: str):
+        # Drop the answers of every version of the document, alone or with others
+        with self.lock:
+            for document_key in list(self.questions):
+                owner, documents = document_key
+                if owner == username and any(name == pdf_name for name, _ in documents):
+                    for question_key in list(self.questions[document_key]):
+                        self.remove((document_key, question_key))
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+                ),
+                "size": len(self.entries),
+            }
@@ -0,0 +1,180 @@
+import logging
+from pymongo import ASCENDING, IndexModel
+from infastructure.resources.resource_registry import resource_registry
+
+logger = logging.getLogger(__name__)
+
+# Indexes of every collection, so that the lookups of the routes never scan a collection
+COLLECTION_INDEXES = {
+    "pdfs": [
+        IndexModel(
+            [("username", ASCENDING), ("pdf_name", ASCENDING)],
+            unique=True,
+            name="username_pdf_name",
+        ),
+        IndexModel([("username", ASCENDING), ("tag", ASCENDING)], name="username_tag"),
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username"),
+    ],
+    "refresh_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expiry"),
+    ],
+    "sessions": [
+        IndexModel(
+            [("username", ASCENDING), ("session_id", ASCENDING)],
+            unique=True,
+            name="username_session_id",
+        ),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expiry"),
+    ],
+}
+
+
+class AsyncDatabaseRepository:
+    """
+    Non blocking data access of the users, the pdfs and the refresh tokens.
+    Every query is awaited on the event loop instead of blocking the worker.
+    """
+
+    def __init__(self, resources=resource_registry):
+
+        # The client and its connection pool are shared by every repository
+        self.resources = resources
+
+    @property
+    def db_knowledgebase(self):
+        return self.resources.get_mongo_client()["knowledgebase"]
+
+    async def ensure_indexes(self):
+        for collection_name, indexes in COLLECTION_INDEXES.items():
+            try:
+                # Creating an index that already exists is a no-op
+                await self.db_knowledgebase[collection_name].create_indexes(indexes)
+            except Exception as e:
+                logger.error("Error creating the indexes of %s: %s", collection_name, e)
+
+    async def insert_one(self, data: dict, collection_name: str):
+
+        try:
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Insert the data into the collection
+            await collection.insert_one(data)
+
+            # Return the data that was stored
+            return data
+        except Exception as e:
+            return None
+
+    async def find_all(
+        self, field: str, field_value: str, collection_name: str, projection=None
+    ):
+
+        # Create an empty list to store the data that will be found
+        all_pdfs_of_user = []
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Find all the data that matches the username
+            async for item in collection.find({field: field_value}, projection):
+                item["_id"] = str(item["_id"])
+                all_pdfs_of_user.append(item)
+
+            # Return the data that was found
+            return all_pdfs_of_user
+        except Exception as e:
+            return None
+
+    async def find_many(self, query: dict, collection_name: str, projection=None):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Find all the data that matches all the fields of the query
+            return [item async for item in collection.find(query, projection)]
+        except Exception as e:
+            return None
+
+    async def check_if_file_belongs_to_user(self, username: str, pdf_name: str):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase["pdfs"]
+
+            # Find the data that matches the username and pdf name, only the id is needed
+            pdf_data = await collection.find_one(
+                {"username": username, "pdf_name": pdf_name}, {"_id": 1}
+            )
+
+            return pdf_data is not None
+
+        except Exception as e:
+            return False
+
+    async def find_single_document(
+        self, field: str, field_value: str, collection_name: str, projection=None
+    ):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Find the data that matches the username
+            result = await collection.find_one({field: field_value}, projection)
+
+            # Return the data that was found
+            return result
+        except Exception as e:
+            return None
+
+    async def find_one(self, query: dict, collection_name: str, projection=None):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Find the data that matches all the fields of the query
+            result = await collection.find_one(query, projection)
+
+            if result is not None:
+                result["_id"] = str(result["_id"])
+
+            # Return the data that was found
+            return result
+        except Exception as e:
+            return None
+
+    async def update_one(
+        self, query: dict, values: dict, collection_name: str, upsert=False
+    ):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Set the given values on the data that matches the query
+            await collection.update_one(query, {"$set": values}, upsert=upsert)
+
+            # Return the values that were stored
+            return values
+        except Exception as e:
+            return None
+
+    async def delete_one(self, query: dict, collection_name: str):
+        try:
+
+            # Define the collection where the data will be stored
+            collection = self.db_knowledgebase[collection_name]
+
+            # Delete the data that matches all the fields of the query
+            await collection.delete_one(query)
+
+            # Return the data that was found
+            return True
+        except Exception as e:
+            return False
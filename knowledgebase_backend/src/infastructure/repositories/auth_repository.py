@@ -8,6 +8,7 @@ from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 from jose import JWTError, jwt
+from infastructure.resources.log_queue import set_request_user
 
 # from config.config import SECRET_KEY
 # from config.config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI
@@ -54,8 +55,6 @@ class AuthRepository:
 
     # Create a JWT token with the data and the expiry time
     def create_access_token(self, data: dict) -> str:
-        print("asdfffff")
-
         # Create a copy of the data and add the expiry time to the data
         to_encode = data.copy()
 
@@ -67,8 +66,6 @@ class AuthRepository:
         # Encode the data with the secret key and return the token
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm="HS256")
 
-        print(encoded_jwt)
-
         return encoded_jwt
 
     def is_access_token_expired(self, token: str) -> bool:
@@ -121,7 +118,8 @@ class AuthRepository:
             # Get the username from the payload
             username: str = payload.get("sub")
 
-            print("nonce", username)
+            # The user is logged with the request
+            set_request_user(username)
             if username is None:
                 return None
             else:
@@ -139,7 +137,6 @@ class AuthRepository:
         return JSONResponse(content={"auth_url": auth_url})
 
     def google_auth_callback(self, url: str):
-        print(url)
         code = url
 
         # Create the params for the google api
@@ -1,25 +1,37 @@
-import boto3
 import os
+import logging
+import asyncio
+import hashlib
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from infastructure.resources.resource_registry import resource_registry
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
 
+# S3 requires every part but the last one of a multipart upload to be at least 5 MiB
+UPLOAD_PART_SIZE = max(
+    int(os.getenv("UPLOAD_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024
+)
+UPLOAD_MAX_CONCURRENT_PARTS = int(os.getenv("UPLOAD_MAX_CONCURRENT_PARTS", 4))
+
 
 class AWSRepository:
 
-    def __init__(self):
+    def __init__(self, resources=resource_registry):
         # Initialize the AWSRepository class with the required configuration
         self.aws_bucket_name = os.getenv("AWS_BUCKET_NAME")
-        self.aws_access_key = os.getenv("AWS_ACCESS_KEY")
-        self.aws_secret_key = os.getenv("AWS_SECRET_KEY")
-        self.aws_service = "s3"
-        self.s3_client = boto3.client(
-            self.aws_service,
-            aws_access_key_id=self.aws_access_key,
-            aws_secret_access_key=self.aws_secret_key,
-        )
+        self.resources = resources
         self.expiration_time = 60
+        self.part_size = UPLOAD_PART_SIZE
+        self.max_concurrent_parts = UPLOAD_MAX_CONCURRENT_PARTS
+
+    @property
+    def s3_client(self):
+        # The client and its connection pool are shared by every repository
+        return self.resources.get_s3_client()
 
     def upload_pdf(self, file_name, file_content):
         try:
@@ -29,9 +41,106 @@ class AWSRepository:
             )
             return True
         except Exception as e:
-            print(f"Error uploading {file_name} to S3: {e}")
+            logger.error("Error uploading %s to S3: %s", file_name, e)
             return False
 
+    async def upload_pdf_stream(self, file_name, file):
+        """
+        Upload the file to the S3 bucket part by part while it is read.
+        At most max_concurrent_parts parts are uploaded at the same time, so an upload never
+        holds more than (max_concurrent_parts + 1) * part_size bytes in memory.
+        Return the sha256 of the content, or None if the upload failed.
+        """
+        digest = hashlib.sha256()
+        part = await file.read(self.part_size)
+
+        # A file that fits in one part is uploaded in a single request
+        if len(part) < self.part_size:
+            digest.update(part)
+            uploaded = await run_in_threadpool(self.upload_pdf, file_name, part)
+            return digest.hexdigest() if uploaded else None
+
+        upload_id = None
+        uploads = []
+        try:
+            upload = await run_in_threadpool(
+                self.s3_client.create_multipart_upload,
+                Bucket=self.aws_bucket_name,
+                Key=file_name,
+                ContentType="application/pdf",
+            )
+            upload_id = upload["UploadId"]
+            slots = asyncio.Semaphore(self.max_concurrent_parts)
+            part_number = 1
+
+            while part:
+                digest.update(part)
+
+                # Wait for a free slot before reading the next part, and stop reading the
+                # file as soon as one of the parts failed
+                await slots.acquire()
+                self.raise_failed_part(uploads)
+                uploads.append(
+                    asyncio.create_task(
+                        self.upload_part(file_name, upload_id, part_number, part, slots)
+                    )
+                )
+                part_number += 1
+                part = await file.read(self.part_size)
+
+            parts = await asyncio.gather(*uploads)
+            await run_in_threadpool(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.aws_bucket_name,
+                Key=file_name,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            return digest.hexdigest()
+        except Exception as e:
+            logger.error("Error uploading %s to S3: %s", file_name, e)
+
+            # Stop the parts in flight and let S3 drop the ones already uploaded
+            for task in uploads:
+                task.cancel()
+            await asyncio.gather(*uploads, return_exceptions=True)
+            if upload_id is not None:
+                try:
+                    await run_in_threadpool(
+                        self.s3_client.abort_multipart_upload,
+                        Bucket=self.aws_bucket_name,
+                        Key=file_name,
+                        UploadId=upload_id,
+                    )
+                except Exception as abort_error:
+                    # The upload failed for the error above, the abort only adds to it
+                    logger.error(
+                        "Error aborting the upload of %s to S3: %s",
+                        file_name,
+                        abort_error,
+                    )
+            return None
+
+    @staticmethod
+    def raise_failed_part(uploads):
+        for task in uploads:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+
+    async def upload_part(self, file_name, upload_id, part_number, body, slots):
+        try:
+            response = await run_in_threadpool(
+                self.s3_client.upload_part,
+                Bucket=self.aws_bucket_name,
+                Key=file_name,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            return {"ETag": response["ETag"], "PartNumber": part_number}
+        finally:
+            slots.release()
+
     def get_presigned_pdf_url(self, file_name):
         try:
             # Generate a presigned URL for the file
@@ -45,10 +154,10 @@ class AWSRepository:
                 },
                 ExpiresIn=self.expiration_time,
             )
-            print(f"Generated URL for {file_name}: {url}")
+            logger.debug("Generated a presigned URL for %s", file_name)
             return url
         except Exception as e:
-            print(f"Error generating presigned URL for {file_name}: {e}")
+            logger.error("Error generating presigned URL for %s: %s", file_name, e)
             return None
 
 
@@ -0,0 +1,128 @@
+import os
+from langchain_core.documents import Document
+from infastructure.repositories.token_counter_repository import TokenCounter
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2500))
+CONTEXT_MIN_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", 64))
+
+# Longest overlap looked for between two chunks, a bit more than the overlap of the splitter
+MAX_OVERLAP_CHARACTERS = 400
+MIN_OVERLAP_CHARACTERS = 20
+
+
+def find_overlap(first, second):
+    # Length of the longest end of first that is also the start of second
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARACTERS)
+    for length in range(longest, MIN_OVERLAP_CHARACTERS - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+class ContextPacker:
+    """
+    Assemble the context of the prompt from the retrieved chunks, best first.
+    Duplicated chunks are dropped and overlapping or adjacent chunks of the same page are merged
+    into one passage, then the passages are packed by rank into the token budget.
+    """
+
+    def __init__(
+        self,
+        budget=CONTEXT_TOKEN_BUDGET,
+        min_passage_tokens=CONTEXT_MIN_PASSAGE_TOKENS,
+        token_counter=None,
+    ):
+        self.budget = budget
+        self.min_passage_tokens = min_passage_tokens
+        self.token_counter = token_counter or TokenCounter()
+
+    def merge(self, documents):
+        """
+        Return the passages of the documents as (rank, text, metadata), the rank of a passage
+        being the best rank of its chunks.
+        """
+        # Group the chunks by page, keeping their retrieval rank
+        pages = {}
+        seen = set()
+        for rank, document in enumerate(documents):
+            if document.page_content in seen:
+                continue
+            seen.add(document.page_content)
+            key = (
+                document.metadata.get("pdf_name", document.metadata.get("source")),
+                document.metadata.get("page"),
+            )
+            pages.setdefault(key, []).append((rank, document))
+
+        passages = []
+        for chunks in pages.values():
+            # Chunks of the same page in the order of the page when the splitter recorded it
+            if all("start_index" in document.metadata for _, document in chunks):
+                chunks.sort(key=lambda chunk: chunk[1].metadata["start_index"])
+
+            rank, document = chunks[0]
+            text, metadata = document.page_content, document.metadata
+            for next_rank, next_document in chunks[1:]:
+                next_text = next_document.page_content
+                if next_text in text:
+                    rank = min(rank, next_rank)
+                    continue
+                overlap = self.get_overlap(metadata, text, next_document)
+                if overlap is not None:
+                    text += next_text[overlap:]
+                    rank = min(rank, next_rank)
+                    continue
+
+                # Without the positions the next chunk may come first on the page
+                previous_overlap = find_overlap(next_text, text)
+                if previous_overlap:
+                    text = next_text + text[previous_overlap:]
+                    metadata = next_document.metadata
+                    rank = min(rank, next_rank)
+                else:
+                    passages.append((rank, text, metadata))
+                    rank, text, metadata = next_rank, next_text, next_document.metadata
+            passages.append((rank, text, metadata))
+
+        passages.sort(key=lambda passage: passage[0])
+        return passages
+
+    def get_overlap(self, metadata, text, next_document):
+        """
+        Return how many characters of the next chunk the passage already ends with, or None
+        when the next chunk does not continue the passage.
+        """
+        start = metadata.get("start_index")
+        next_start = next_document.metadata.get("start_index")
+        if start is not None and next_start is not None:
+            # The positions on the page tell where the next chunk starts
+            if next_start <= start + len(text):
+                return start + len(text) - next_start
+            return None
+        return find_overlap(text, next_document.page_content) or None
+
+    def pack(self, documents):
+        """
+        Return the passages of the documents that fit in the token budget, best first.
+        A passage that does not fit is cut to the tokens left, unless fewer than
+        min_passage_tokens are left, in which case only a smaller passage can still fit.
+        """
+        packed = []
+        remaining = self.budget
+        for _, text, metadata in self.merge(documents):
+            if remaining <= 0:
+                break
+            tokens = self.token_counter.count(text)
+            if tokens <= remaining:
+                packed.append(Document(page_content=text, metadata=metadata))
+                remaining -= tokens
+            elif remaining >= self.min_passage_tokens:
+                text = self.token_counter.truncate(text, remaining)
+                packed.append(Document(page_content=text, metadata=metadata))
+                remaining = 0
+        return packed
@@ -0,0 +1,148 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from langchain_core.documents import Document
+from infastructure.repositories.token_counter_repository import TokenCounter
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", 24 * 60 * 60))
+CONVERSATION_WINDOW_TURNS = int(os.getenv("CONVERSATION_WINDOW_TURNS", 4))
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", 600))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", 200))
+
+SUMMARY_PROMPT = """Progressively summarize the conversation about the documents, adding onto the previous summary. Keep the names, numbers and facts the questions and answers rely on.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+
+def format_turn(turn):
+    return f"Question: {turn['question']}\nAnswer: {turn['answer']}"
+
+
+class ConversationRepository:
+    """
+    Keep the history of the conversation sessions bounded.
+    The last window_turns questions and answers of a session are kept as they are, the older
+    ones are folded into a running summary by the model, so the history sent with a follow-up
+    question stays within history_tokens however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds=CONVERSATION_TTL_SECONDS,
+        window_turns=CONVERSATION_WINDOW_TURNS,
+        history_tokens=CONVERSATION_HISTORY_TOKENS,
+        summary_tokens=CONVERSATION_SUMMARY_TOKENS,
+        token_counter=None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.window_turns = max(1, window_turns)
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.token_counter = token_counter or TokenCounter()
+
+    def start(self, session, username, session_id, pdf_names):
+        """
+        Return the stored session when it is about the same documents, or a new one.
+        """
+        pdf_names = sorted(pdf_names)
+        if session is None or session.get("pdf_names") != pdf_names:
+            session = {
+                "username": username,
+                "session_id": session_id,
+                "pdf_names": pdf_names,
+                "summary": "",
+                "turns": [],
+                "recent_documents": [],
+                "versions": [],
+            }
+        self.touch(session)
+        return session
+
+    def touch(self, session):
+        # Mongo drops the session once it expires
+        session["expires_at"] = datetime.now(timezone.utc) + timedelta(
+            seconds=self.ttl_seconds
+        )
+
+    def has_history(self, session):
+        return session is not None and bool(session["summary"] or session["turns"])
+
+    def get_history(self, session):
+        """
+        Return the summary and the most recent turns that fit in history_tokens, as text.
+        """
+        if not self.has_history(session):
+            return ""
+
+        summary = session["summary"]
+        remaining = self.history_tokens - self.token_counter.count(summary)
+        lines = []
+        for turn in reversed(session["turns"]):
+            line = format_turn(turn)
+            tokens = self.token_counter.count(line)
+            if tokens > remaining:
+                break
+            lines.append(line)
+            remaining -= tokens
+        lines.reverse()
+
+        if summary:
+            lines.insert(0, f"Summary: {summary}")
+        return "\n\n".join(lines)
+
+    def get_search_question(self, session, question):
+        # A follow-up often refers to the previous question, so both are searched for
+        if session is None or not session["turns"]:
+            return question
+        return f"{session['turns'][-1]['question']} {question}"
+
+    def get_recent_documents(self, session, versions):
+        # The chunks of the previous answer, unless the documents were indexed again since
+        if session is None or session["versions"] != versions:
+            return []
+        return [
+            Document(page_content=document["content"], metadata=document["metadata"])
+            for document in session["recent_documents"]
+        ]
+
+    def add_turn(self, session, question, answer, documents, versions, llm):
+        """
+        Record the question and its answer, then fold the turns that left the window into the
+        summary.
+        """
+        session["turns"].append({"question": question, "answer": answer})
+        session["recent_documents"] = [
+            {"content": document.page_content, "metadata": document.metadata}
+            for document in documents
+        ]
+        session["versions"] = versions
+
+        overflow = session["turns"][: -self.window_turns]
+        if overflow:
+            session["summary"] = self.summarize(session["summary"], overflow, llm)
+            session["turns"] = session["turns"][-self.window_turns :]
+        self.touch(session)
+
+    def summarize(self, summary, turns, llm):
+        lines = "\n\n".join(format_turn(turn) for turn in turns)
+        try:
+            summary = llm.invoke(
+                SUMMARY_PROMPT.format(summary=summary or "None", lines=lines)
+            ).strip()
+        except Exception as e:
+            # The turns are dropped without being summarized
+            logger.warning("Error summarizing the conversation: %s", e)
+        return self.token_counter.truncate(summary, self.summary_tokens)
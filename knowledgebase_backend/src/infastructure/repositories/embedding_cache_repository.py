@@ -0,0 +1,170 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500000))
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING_CACHE_TOUCH_BATCH", 1000))
+
+# Other worker processes write to the same file, so the count of vectors is read again from
+# time to time
+COUNT_SECONDS = 60
+
+
+class EmbeddingCacheRepository:
+    """
+    Content addressed store of embedding vectors.
+    A vector is keyed by the hash of the embedding model and the chunk text, so the same chunk
+    is never embedded twice whoever uploads it. The least recently used vectors are evicted
+    once the cache holds more than max_entries vectors. Lookups do not write, the last use
+    of the vectors they found is written with the next writes, or once touch_batch of them
+    are pending.
+    """
+
+    def __init__(
+        self,
+        path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        touch_batch=EMBEDDING_CACHE_TOUCH_BATCH,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # The connection is shared between the request threads and guarded by the lock
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self.connection.commit()
+
+        # Last use of the vectors found since the last write, by key
+        self.touched = {}
+        self.count()
+
+    @staticmethod
+    def get_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        with self.lock:
+            # Look the keys up in batches to stay below the sqlite variable limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = array("f", vector).tolist()
+
+            # Mark the found vectors as recently used, written with the next writes
+            now = time.time()
+            self.touched.update((key, now) for key in found)
+            if len(self.touched) >= self.touch_batch:
+                self.write_touched()
+                self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: dict):
+        now = time.time()
+        with self.lock:
+            self.write_touched()
+
+            # Vectors are stored as packed float32 values, the vector of a key never changes
+            inserted = self.connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, array("f", vector).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            ).rowcount
+            self.size += max(inserted, 0)
+            self.evict()
+            self.connection.commit()
+
+    def write_touched(self):
+        if self.touched:
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self.touched.items()],
+            )
+            self.touched = {}
+
+    def count(self):
+        (self.size,) = self.connection.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+        self.counted_at = time.monotonic()
+
+    def evict(self):
+        # Drop the least recently used vectors above the size bound, the count kept here is
+        # checked against the file before anything is dropped
+        stale = time.monotonic() - self.counted_at > COUNT_SECONDS
+        if stale or self.size > self.max_entries:
+            self.count()
+        if self.size > self.max_entries:
+            deleted = self.connection.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self.size - self.max_entries,),
+            ).rowcount
+            self.size -= deleted
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": self.size}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends the chunks missing from the cache to the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCacheRepository):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self.cache.get_key(self.model, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed every distinct missing chunk only once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,257 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    APIStatusError,
+)
+from langchain_core.embeddings import Embeddings
+from infastructure.repositories.token_counter_repository import TokenCounter
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", 50000))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 512))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+EMBEDDING_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_SECONDS", 1))
+EMBEDDING_MAX_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_MAX_BACKOFF_SECONDS", 60))
+EMBEDDING_QUERY_RESERVED_SHARE = float(
+    os.getenv("EMBEDDING_QUERY_RESERVED_SHARE", 0.05)
+)
+EMBEDDING_QUERY_CONCURRENCY = int(os.getenv("EMBEDDING_QUERY_CONCURRENCY", 4))
+
+
+class RateLimiter:
+    """
+    Token buckets of the requests and the tokens that may be sent per minute.
+    Both buckets start full and refill continuously, a request waits until both hold enough.
+    The bulk requests wait in order and leave reserved_share of both buckets to the priority
+    ones, like the embedding of a question, which do not queue behind them.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, reserved_share=0.0):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.reserved_requests = requests_per_minute * reserved_share
+        self.reserved_tokens = tokens_per_minute * reserved_share
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.requests = min(
+            self.request_capacity, self.requests + elapsed * self.request_capacity / 60
+        )
+        self.tokens = min(
+            self.token_capacity, self.tokens + elapsed * self.token_capacity / 60
+        )
+
+    async def acquire(self, tokens, priority=False):
+        if priority:
+            await self.wait(tokens, 0.0, 0.0)
+            return
+
+        # The lock keeps the waiting requests in order, the first one is served first
+        async with self.lock:
+            await self.wait(tokens, self.reserved_requests, self.reserved_tokens)
+
+    async def wait(self, tokens, reserved_requests, reserved_tokens):
+        # A batch larger than the whole budget only waits for a full bucket
+        tokens = min(tokens, self.token_capacity - reserved_tokens)
+        while True:
+            self.refill()
+            if (
+                self.requests >= 1 + reserved_requests
+                and self.tokens >= tokens + reserved_tokens
+            ):
+                self.requests -= 1
+                self.tokens -= tokens
+                return
+
+            missing_requests = max(0.0, 1 + reserved_requests - self.requests)
+            missing_tokens = max(0.0, tokens + reserved_tokens - self.tokens)
+            await asyncio.sleep(
+                max(
+                    missing_requests * 60 / self.request_capacity,
+                    missing_tokens * 60 / self.token_capacity,
+                )
+            )
+
+
+class EmbeddingDispatcher(Embeddings):
+    """
+    Embeddings of the OpenAI API sent in token budgeted batches.
+    The batches run on one event loop shared by every thread of the process, at most
+    max_concurrency at a time, within the requests and tokens per minute budget. A rate limited
+    or failed request is retried with an exponential backoff with full jitter.
+    The embedding of a question has its own query_concurrency slots and a reserved share of
+    the budget, so it does not wait behind the batches of an upload.
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        model=OPENAI_EMBEDDING_MODEL,
+        base_url=None,
+        batch_tokens=EMBEDDING_BATCH_TOKENS,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        backoff_seconds=EMBEDDING_BACKOFF_SECONDS,
+        max_backoff_seconds=EMBEDDING_MAX_BACKOFF_SECONDS,
+        query_reserved_share=EMBEDDING_QUERY_RESERVED_SHARE,
+        query_concurrency=EMBEDDING_QUERY_CONCURRENCY,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.query_reserved_share = query_reserved_share
+        self.query_concurrency = query_concurrency
+        self.retries = 0
+        self.token_counter = TokenCounter()
+
+        # Created on the event loop of the dispatcher when it is first used
+        self.loop = None
+        self.client = None
+        self.slots = None
+        self.query_slots = None
+        self.rate_limiter = None
+        self.lock = threading.Lock()
+
+    def get_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self.loop.run_forever,
+                    name="embedding-dispatcher",
+                    daemon=True,
+                ).start()
+            return self.loop
+
+    def run(self, coroutine):
+        # Run the coroutine on the shared loop and wait for it from the calling thread
+        return asyncio.run_coroutine_threadsafe(coroutine, self.get_loop()).result()
+
+    def get_batches(self, texts):
+        """
+        Group the texts into batches of at most batch_tokens tokens and batch_size texts.
+        Return the (start, texts, token count) of every batch.
+        """
+        batches = []
+        start, batch, batch_tokens = 0, [], 0
+        for position, text in enumerate(texts):
+            tokens = self.token_counter.count(text)
+            if batch and (
+                batch_tokens + tokens > self.batch_tokens
+                or len(batch) >= self.batch_size
+            ):
+                batches.append((start, batch, batch_tokens))
+                start, batch, batch_tokens = position, [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append((start, batch, batch_tokens))
+        return batches
+
+    async def dispatch(self, texts: list, priority=False) -> list:
+        # Only ever runs on the loop of the dispatcher, where the client and the limits live
+        if self.client is None:
+            self.client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0
+            )
+            self.slots = asyncio.Semaphore(self.max_concurrency)
+            self.query_slots = asyncio.Semaphore(self.query_concurrency)
+            self.rate_limiter = RateLimiter(
+                self.requests_per_minute,
+                self.tokens_per_minute,
+                self.query_reserved_share,
+            )
+
+        # The API rejects empty inputs
+        texts = [text or " " for text in texts]
+        vectors = [None] * len(texts)
+
+        async def embed_batch(start, batch, tokens):
+            async with self.query_slots if priority else self.slots:
+                for position, vector in enumerate(
+                    await self.request_with_retries(batch, tokens, priority)
+                ):
+                    vectors[start + position] = vector
+
+        await asyncio.gather(
+            *(embed_batch(*batch) for batch in self.get_batches(texts))
+        )
+        return vectors
+
+    async def request_with_retries(self, batch, tokens, priority=False):
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(tokens, priority)
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.model, input=batch, encoding_format="float"
+                )
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except (APIConnectionError, APITimeoutError, APIStatusError) as e:
+                retryable = not isinstance(e, APIStatusError) or (
+                    e.status_code == 429 or e.status_code >= 500
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.get_backoff(attempt, e))
+
+    def get_backoff(self, attempt, error):
+        # Wait as long as the server asks for, otherwise a random part of the exponential delay
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_backoff_seconds)
+                except ValueError:
+                    pass
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        return random.uniform(0, delay)
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return self.run(self.dispatch(texts))
+
+    async def aembed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self.dispatch(texts), self.get_loop())
+        )
+
+    def embed_query(self, text: str) -> list:
+        # The question is embedded in the priority lane, ahead of the queued batches
+        return self.run(self.dispatch([text], priority=True))[0]
@@ -0,0 +1,93 @@
+import os
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from infastructure.repositories.embedding_dispatcher_repository import (
+    EmbeddingDispatcher,
+)
+from infastructure.resources.torch_runtime import import_torch
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv(
+    "LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 64))
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings computed on the CPU by a sentence-transformers model, without any network call.
+    The model is loaded on first use and the chunks are encoded in batches of batch_size by
+    the TORCH_THREADS threads of the process.
+    """
+
+    def __init__(
+        self,
+        model=LOCAL_EMBEDDING_MODEL,
+        backend=LOCAL_EMBEDDING_BACKEND,
+        batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+    ):
+        self.model = model
+        self.backend = backend
+        self.batch_size = batch_size
+        self.encoder = None
+        self.lock = threading.Lock()
+
+    def get_encoder(self):
+        with self.lock:
+            if self.encoder is None:
+                # Only needed by the local provider, so only imported when it is used
+                import_torch()
+                from sentence_transformers import SentenceTransformer
+
+                self.encoder = SentenceTransformer(
+                    self.model, device="cpu", backend=self.backend
+                )
+            return self.encoder
+
+    def embed_array(self, texts: list) -> np.ndarray:
+        """
+        Return the embeddings of the texts as one contiguous float32 array, a row per text.
+        """
+        vectors = self.get_encoder().encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_array([text])[0].tolist()
+
+
+# The embedding providers, by the name set in EMBEDDING_PROVIDER
+EMBEDDING_PROVIDERS = {
+    "openai": lambda api_key: EmbeddingDispatcher(api_key),
+    "local": lambda api_key: LocalEmbeddings(),
+}
+
+providers = {}
+providers_lock = threading.Lock()
+
+
+def get_embedding_provider(api_key=None, name=EMBEDDING_PROVIDER) -> Embeddings:
+    # Every provider is created once per process, so a local model is only loaded once
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider {name}")
+
+    with providers_lock:
+        if name not in providers:
+            providers[name] = EMBEDDING_PROVIDERS[name](api_key)
+        return providers[name]
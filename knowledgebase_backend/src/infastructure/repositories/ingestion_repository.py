@@ -0,0 +1,166 @@
+import os
+import logging
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from infastructure.repositories.pdf_chat_repository import (
+    PdfChatRepository,
+    DocumentProcessor,
+)
+from infastructure.repositories.pdf_parser_repository import PdfParser
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+INGESTION_IO_WORKERS = int(os.getenv("INGESTION_IO_WORKERS", 4))
+INGESTION_PARSE_WORKERS = int(os.getenv("INGESTION_PARSE_WORKERS", os.cpu_count() or 1))
+INGESTION_EMBEDDING_CONCURRENCY = int(os.getenv("INGESTION_EMBEDDING_CONCURRENCY", 2))
+
+
+class IngestionRepository:
+    """
+    Run the parse -> split -> embed -> index pipeline of the uploaded documents in the background.
+    Parsing is CPU bound and runs in a process pool, the other stages wait on the network or the
+    disk and run in a thread pool. The number of documents being embedded at the same time is
+    bounded here so that the embedding throughput of all the uploads is throttled in one place.
+    """
+
+    def __init__(self, pdf_repository=PdfChatRepository):
+        self.pdf_repository = pdf_repository
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=INGESTION_IO_WORKERS, thread_name_prefix="ingestion"
+        )
+        self.parse_pool = None
+        self.parse_pool_lock = threading.Lock()
+        self.embedding_slots = threading.BoundedSemaphore(
+            INGESTION_EMBEDDING_CONCURRENCY
+        )
+
+        # The job of every document being ingested, by (username, pdf_name)
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+
+    def get_parse_pool(self):
+        # The worker processes are only started once the first document is ingested. They
+        # are spawned, a fork of this process could copy a lock held by one of its threads
+        with self.parse_pool_lock:
+            if self.parse_pool is None:
+                self.parse_pool = ProcessPoolExecutor(
+                    max_workers=INGESTION_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self.parse_pool
+
+    def enqueue(self, username: str, pdf_name: str, on_progress):
+        """
+        Queue the ingestion of the document and return the id of its job. A document has one
+        job at a time: a job that has not started yet picks up the new upload anyway, a
+        running one is run once more when it is done.
+        """
+        key = (username, pdf_name)
+        with self.jobs_lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                job["rerun"] = job["started"]
+                job["on_progress"] = on_progress
+                return job["job_id"]
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "on_progress": on_progress,
+                "started": False,
+                "rerun": False,
+            }
+            self.jobs[key] = job
+        self.io_pool.submit(self.run_jobs, key)
+        return job["job_id"]
+
+    def run_jobs(self, key):
+        job = self.jobs[key]
+        finished = False
+        try:
+            while not finished:
+                with self.jobs_lock:
+                    job["started"] = True
+                    job["rerun"] = False
+                self.run_job(job["job_id"], *key, job["on_progress"])
+                with self.jobs_lock:
+                    finished = not job["rerun"]
+                    if finished:
+                        del self.jobs[key]
+        finally:
+            # Whatever went wrong, the next upload of the document gets a job of its own
+            if not finished:
+                with self.jobs_lock:
+                    self.jobs.pop(key, None)
+
+    def run_job(self, job_id: str, username: str, pdf_name: str, on_progress):
+        try:
+            processor = DocumentProcessor(
+                self.pdf_repository.embedding_cache, PdfParser(self.get_parse_pool())
+            )
+            indexer = self.pdf_repository.indexer
+
+            # Parse the pages of the document across the worker processes, the pages
+            # unchanged since the previous version keep their text
+            on_progress("parsing", 0.1)
+            known_pages = indexer.get_known_pages(username, pdf_name)
+            with self.pdf_repository.local_document(
+                pdf_name, revalidate=True
+            ) as local_path:
+                data = processor.load(local_path, pdf_name, known_pages=known_pages)
+            parse_seconds = [page.metadata["parse_seconds"] for page in data]
+            if parse_seconds:
+                unchanged = sum(
+                    page.metadata["page_hash"] in known_pages for page in data
+                )
+                logger.info(
+                    "Parsed %d pages of %s in %.2fs of worker time, slowest page "
+                    "%.2fs, %d pages unchanged",
+                    len(data),
+                    pdf_name,
+                    sum(parse_seconds),
+                    max(parse_seconds),
+                    unchanged,
+                )
+
+            # Split the document into chunks
+            on_progress("splitting", 0.4)
+            texts = processor.split_documents(data)
+            embeddings = processor.get_embeddings()
+
+            # The document is embedded and written by one job or question at a time
+            with indexer.get_document_lock(username, pdf_name), self.embedding_slots:
+                # Only embed the chunks that are not in the previous version
+                on_progress("embedding", 0.5)
+                vectors = indexer.embed_chunks(username, pdf_name, texts, embeddings)
+
+                # Write the new version, the chunks that disappeared are left out
+                on_progress("indexing", 0.9)
+                indexer.write_index(username, pdf_name, texts, vectors, pages=data)
+
+            # The answers given from the previous version are stale
+            self.pdf_repository.invalidate_answers(username, pdf_name)
+
+            on_progress("indexed", 1.0)
+        except Exception as e:
+            logger.error("Ingestion job %s for %s failed: %s", job_id, pdf_name, e)
+            try:
+                on_progress("failed", 1.0, str(e))
+            except Exception as report_error:
+                logger.error(
+                    "Failure of ingestion job %s for %s was not recorded: %s",
+                    job_id,
+                    pdf_name,
+                    report_error,
+                )
+
+    def shutdown(self):
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=False, cancel_futures=True)
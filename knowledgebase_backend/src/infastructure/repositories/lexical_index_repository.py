@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+LEXICAL_INDEX_CACHE_SIZE = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", 1024))
+
+# Words, numbers and identifiers such as part numbers (AB-1234), codes (E_404) or versions
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+
+# Parameters of BM25 and of the reciprocal rank fusion
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+
+def tokenize(text):
+    # Identifiers are indexed whole and by their parts, so "AB-1234" also matches "1234"
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in TOKEN_SEPARATORS.split(token) if part)
+    return tokens
+
+
+def get_chunk_key(document):
+    # The same chunk found by the vector and the lexical search is the same text of one file
+    return document.metadata.get("pdf_name"), document.page_content
+
+
+def reciprocal_rank_fusion(rankings, k):
+    """
+    Fuse rankings of documents, best first, into the k best documents.
+    A document scores 1 / (RRF_K + rank) in every ranking it appears in.
+    """
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = get_chunk_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            documents.setdefault(key, document)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class LexicalIndex:
+    """
+    Inverted index of the chunks of one version of a document, the id of a chunk being its
+    position in the vector index of the same version.
+    The postings of all the terms are stored back to back in flat arrays, the postings of
+    term i being chunk_ids[offsets[i]:offsets[i + 1]] with their term frequencies. The arrays
+    are memory mapped like the vectors, the texts of the chunks are only kept once, in the
+    chunk store of the vector index.
+    """
+
+    ARRAYS = ("offsets", "chunk_ids", "term_frequencies", "chunk_lengths")
+
+    def __init__(self, terms, offsets, chunk_ids, term_frequencies, chunk_lengths):
+        self.terms = {term: position for position, term in enumerate(terms)}
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.term_frequencies = term_frequencies
+        self.chunk_lengths = chunk_lengths
+
+    @classmethod
+    def build(cls, documents):
+        postings = {}
+        chunk_lengths = np.zeros(len(documents), dtype=np.uint32)
+        for chunk_id, document in enumerate(documents):
+            tokens = tokenize(document.page_content)
+            chunk_lengths[chunk_id] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append((chunk_id, frequency))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        flat = [posting for term in terms for posting in postings[term]]
+        chunk_ids = np.array([chunk_id for chunk_id, _ in flat], dtype=np.uint32)
+        term_frequencies = np.array(
+            [frequency for _, frequency in flat], dtype=np.uint32
+        )
+        return cls(terms, offsets, chunk_ids, term_frequencies, chunk_lengths)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "terms.json"), "w") as file:
+            json.dump(list(self.terms), file)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "terms.json")) as file:
+            terms = json.load(file)
+        arrays = [
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in cls.ARRAYS
+        ]
+        return cls(terms, *arrays)
+
+    def get_postings(self, term):
+        position = self.terms.get(term)
+        if position is None:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.chunk_ids[start:end], self.term_frequencies[start:end]
+
+
+class LexicalIndexRepository:
+    """
+    Store the lexical indexes of the versions of the documents and search them with BM25.
+    The index of a version is written in its "lexical" directory, next to the vector index
+    the texts of the found chunks are read from. The most recently searched indexes are kept
+    loaded, by default as many as the documents a question over all the files of a user
+    usually spans.
+    """
+
+    def __init__(self, vector_store, max_loaded=LEXICAL_INDEX_CACHE_SIZE):
+        self.vector_store = vector_store
+        self.max_loaded = max_loaded
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_lexical_path(self, path):
+        return os.path.join(path, "lexical")
+
+    def write(self, path, documents):
+        # The documents are the chunks of the vector index at path, in the same order
+        index = LexicalIndex.build(documents)
+        index.save(self.get_lexical_path(path))
+        with self.lock:
+            self.loaded[path] = index
+            self.loaded.move_to_end(path)
+            self.evict()
+
+    def forget(self, path):
+        with self.lock:
+            self.loaded.pop(path, None)
+
+    def load(self, path):
+        with self.lock:
+            if path in self.loaded:
+                self.loaded.move_to_end(path)
+                return self.loaded[path]
+
+        lexical_path = self.get_lexical_path(path)
+        if not os.path.isfile(os.path.join(lexical_path, "terms.json")):
+            return None
+        index = LexicalIndex.load(lexical_path)
+
+        with self.lock:
+            self.loaded[path] = index
+            self.evict()
+        return index
+
+    def evict(self):
+        while len(self.loaded) > self.max_loaded:
+            self.loaded.popitem(last=False)
+
+    def search(self, paths, query, k):
+        """
+        Return the documents of the k best chunks of the indexes for the query, best first.
+        The statistics of BM25 are computed over all the given indexes together, so the
+        scores of chunks from different documents can be compared.
+        """
+        indexes = [(path, self.load(path)) for path in paths]
+        indexes = [(path, index) for path, index in indexes if index is not None]
+        terms = set(tokenize(query))
+        if not indexes or not terms:
+            return []
+
+        chunk_count = sum(len(index.chunk_lengths) for _, index in indexes)
+        average_length = (
+            sum(int(index.chunk_lengths.sum()) for _, index in indexes) / chunk_count
+        )
+        if not average_length:
+            return []
+
+        # Inverse document frequency of every query term over all the indexes
+        idf = {}
+        for term in terms:
+            frequency = sum(
+                len(postings[0])
+                for postings in (index.get_postings(term) for _, index in indexes)
+                if postings is not None
+            )
+            if frequency:
+                idf[term] = math.log(
+                    1 + (chunk_count - frequency + 0.5) / (frequency + 0.5)
+                )
+
+        candidates = []
+        for path, index in indexes:
+            scores = np.zeros(len(index.chunk_lengths), dtype=np.float32)
+            norms = BM25_K1 * (
+                1 - BM25_B + BM25_B * index.chunk_lengths / average_length
+            )
+            for term, term_idf in idf.items():
+                postings = index.get_postings(term)
+                if postings is None:
+                    continue
+                chunk_ids, frequencies = postings
+                scores[chunk_ids] += (
+                    term_idf
+                    * frequencies
+                    * (BM25_K1 + 1)
+                    / (frequencies + norms[chunk_ids])
+                )
+
+            # Only the k best chunks of each index can make the overall top k
+            best = np.argsort(-scores)[:k]
+            candidates.extend(
+                (float(scores[chunk_id]), path, int(chunk_id))
+                for chunk_id in best
+                if scores[chunk_id] > 0
+            )
+
+        # The texts of the best chunks are read from the chunk stores of the vector indexes
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        documents = []
+        for _, path, chunk_id in candidates[:k]:
+            vector_index = self.vector_store.load(path)
+            if vector_index is not None:
+                documents.append(vector_index.get_document(chunk_id))
+        return documents
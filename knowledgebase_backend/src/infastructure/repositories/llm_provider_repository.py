@@ -0,0 +1,251 @@
+import os
+import time
+import queue
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo-instruct")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", 700))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", 0))
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", 8))
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv("LLM_FAKE_LATENCY_SECONDS", 0.2))
+LLM_FAKE_TOKEN_SECONDS = float(os.getenv("LLM_FAKE_TOKEN_SECONDS", 0.01))
+LLM_FAKE_SLOTS = int(os.getenv("LLM_FAKE_SLOTS", 4))
+
+
+class MicroBatcher:
+    """
+    Coalesce the concurrent completion requests of the process into batches.
+    The first prompt waits at most window_seconds for others to join it, then up to
+    max_batch_size prompts are completed together by one call of complete_batch. The batches
+    run on max_concurrency threads, so the next batch is collected while one is completed.
+    """
+
+    def __init__(self, complete_batch, window_seconds, max_batch_size, max_concurrency):
+        self.complete_batch = complete_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.queue = queue.Queue()
+        self.workers = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="llm-batch"
+        )
+        self.requests = 0
+        self.batches = 0
+        threading.Thread(target=self.collect, name="llm-batcher", daemon=True).start()
+
+    def submit(self, prompt):
+        # Wait for the completion of the prompt from the calling thread
+        future = Future()
+        self.queue.put((prompt, future))
+        return future.result()
+
+    def collect(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.requests += len(batch)
+            self.batches += 1
+            self.workers.submit(self.complete, batch)
+
+    def complete(self, batch):
+        try:
+            completions = self.complete_batch([prompt for prompt, _ in batch])
+            for (_, future), completion in zip(batch, completions):
+                future.set_result(completion)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class CompletionLLM(ABC):
+    """
+    Base of the completion models, with the invoke and stream methods of the langchain LLMs
+    the prompts are sent to.
+    complete_batch completes several prompts in one call. With a batch window, the concurrent
+    invoke calls are coalesced into one such call.
+    """
+
+    def __init__(
+        self,
+        batch_window_ms=LLM_BATCH_WINDOW_MS,
+        max_batch_size=LLM_MAX_BATCH_SIZE,
+        max_concurrency=LLM_MAX_CONNECTIONS,
+    ):
+        self.batcher = None
+        if batch_window_ms > 0:
+            self.batcher = MicroBatcher(
+                self.complete_batch,
+                batch_window_ms / 1000,
+                max_batch_size,
+                max_concurrency,
+            )
+
+    @abstractmethod
+    def complete_batch(self, prompts: list) -> list:
+        pass
+
+    @abstractmethod
+    def stream(self, prompt: str):
+        pass
+
+    def invoke(self, prompt: str) -> str:
+        if self.batcher is not None:
+            return self.batcher.submit(prompt)
+        return self.complete_batch([prompt])[0]
+
+    def get_stats(self) -> dict:
+        return self.batcher.get_stats() if self.batcher is not None else None
+
+
+class OpenAICompletionLLM(CompletionLLM):
+    """
+    Completions of the OpenAI API, or of any server with an OpenAI compatible completions
+    endpoint at base_url. The client and its pool of keep-alive connections are created once
+    and reused by every question, and a batch of prompts is sent as one request.
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        model=LLM_MODEL,
+        base_url=LLM_BASE_URL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        timeout_seconds=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        max_connections=LLM_MAX_CONNECTIONS,
+        **kwargs,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout_seconds,
+            max_retries=max_retries,
+            http_client=httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=timeout_seconds,
+            ),
+        )
+        super().__init__(max_concurrency=max_connections, **kwargs)
+
+    def complete_batch(self, prompts: list) -> list:
+        response = self.client.completions.create(
+            model=self.model,
+            prompt=prompts,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+
+        # The choices come back in any order, with the index of their prompt
+        completions = [""] * len(prompts)
+        for choice in response.choices:
+            completions[choice.index] = choice.text
+        return completions
+
+    def stream(self, prompt: str):
+        response = self.client.completions.create(
+            model=self.model,
+            prompt=prompt,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].text:
+                yield chunk.choices[0].text
+
+
+class FakeCompletionLLM(CompletionLLM):
+    """
+    Local stand-in for the model, for the tests and the offline runs and benchmarks.
+    Like a server with batched inference, it completes at most slots requests at a time and a
+    batch of prompts takes latency_seconds whatever its size, a streamed answer one more
+    token_seconds per token. The answer only depends on the prompt.
+    """
+
+    def __init__(
+        self,
+        latency_seconds=LLM_FAKE_LATENCY_SECONDS,
+        token_seconds=LLM_FAKE_TOKEN_SECONDS,
+        slots=LLM_FAKE_SLOTS,
+        **kwargs,
+    ):
+        self.latency_seconds = latency_seconds
+        self.token_seconds = token_seconds
+
+        # The requests wait for a slot in the order they came, as in the queue of a server
+        self.slots = ThreadPoolExecutor(
+            max_workers=slots, thread_name_prefix="fake-llm"
+        )
+        super().__init__(**kwargs)
+
+    def answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"This is the local answer {digest} to a prompt of {len(prompt.split())} words."
+
+    def complete_batch(self, prompts: list) -> list:
+        self.slots.submit(time.sleep, self.latency_seconds).result()
+        return [self.answer(prompt) for prompt in prompts]
+
+    def stream(self, prompt: str):
+        self.slots.submit(time.sleep, self.latency_seconds).result()
+        for position, token in enumerate(self.answer(prompt).split(" ")):
+            time.sleep(self.token_seconds)
+            yield token if position == 0 else f" {token}"
+
+
+# The LLM providers, by the name set in LLM_PROVIDER
+LLM_PROVIDERS = {
+    "openai": lambda api_key: OpenAICompletionLLM(api_key),
+    "fake": lambda api_key: FakeCompletionLLM(),
+}
+
+providers = {}
+providers_lock = threading.Lock()
+
+
+def get_llm_provider(api_key=None, name=LLM_PROVIDER) -> CompletionLLM:
+    # Every provider is created once per process, so its client and connections are reused
+    if name not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name}")
+
+    with providers_lock:
+        if name not in providers:
+            providers[name] = LLM_PROVIDERS[name](api_key)
+        return providers[name]
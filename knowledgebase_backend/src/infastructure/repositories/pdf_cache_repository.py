@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from botocore.exceptions import ClientError
+from infastructure.resources.resource_registry import resource_registry
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+PDF_CACHE_DIRECTORY = os.getenv("PDF_CACHE_DIRECTORY", "pdf_cache")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+PDF_CACHE_REVALIDATE_SECONDS = int(os.getenv("PDF_CACHE_REVALIDATE_SECONDS", 60))
+
+
+class PdfCacheRepository:
+    """
+    Size bounded LRU cache of the PDFs of the S3 bucket on the local disk.
+    A cached file is identified by its S3 key and ETag and revalidated with a conditional
+    HEAD, so an unchanged file is never downloaded twice. Concurrent requests for the same
+    key wait for a single download instead of each fetching the file.
+    The worker processes share the directory, so the size bound and the order of use are
+    those of the files on disk. A file in use by a thread of this process is never removed,
+    a file of another process is only removed when it is the least recently used one.
+    """
+
+    def __init__(
+        self,
+        resources=resource_registry,
+        directory=PDF_CACHE_DIRECTORY,
+        max_bytes=PDF_CACHE_MAX_BYTES,
+        revalidate_seconds=PDF_CACHE_REVALIDATE_SECONDS,
+    ):
+        self.resources = resources
+        self.aws_bucket_name = os.getenv("AWS_BUCKET_NAME")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+        # Readers of every file in use, and the files to remove once they are not anymore
+        self.readers = {}
+        self.removed = set()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_entries(self):
+        # The cached files as (file name, size), from the least to the most recently used
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        return [(name, size) for _, name, size in sorted(files)]
+
+    def get_file_name(self, key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pdf"
+
+    def get_key_lock(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def read_metadata(self, file_name: str):
+        try:
+            with open(os.path.join(self.directory, file_name + ".json")) as metadata:
+                return json.load(metadata)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def local_copy(self, key: str, revalidate=False):
+        """
+        Yield the path of an up to date local copy of the S3 object, which is not removed
+        before the block ends. The copy is revalidated against S3 when it is older than
+        revalidate_seconds, or always when revalidate is set.
+        """
+        file_name = self.get_file_name(key)
+        with self.lock:
+            self.readers[file_name] = self.readers.get(file_name, 0) + 1
+        try:
+            yield self.get_local_path(key, revalidate)
+        finally:
+            with self.lock:
+                self.readers[file_name] -= 1
+                if not self.readers[file_name]:
+                    del self.readers[file_name]
+                    if file_name in self.removed:
+                        self.removed.discard(file_name)
+                        self.remove_files(file_name, file_name + ".json")
+
+    def get_local_path(self, key: str, revalidate=False) -> str:
+        # Only called by local_copy, which keeps the file from being removed
+        file_name = self.get_file_name(key)
+        path = os.path.join(self.directory, file_name)
+
+        # Only one thread downloads or revalidates a given key at a time
+        with self.get_key_lock(key):
+            metadata = self.read_metadata(file_name) if os.path.exists(path) else None
+
+            if metadata is not None:
+                fresh = time.time() - metadata["validated_at"] < self.revalidate_seconds
+                if (fresh and not revalidate) or self.is_not_modified(
+                    key, metadata["etag"]
+                ):
+                    metadata["validated_at"] = time.time()
+                    self.write_metadata(file_name, metadata)
+                    os.utime(path)
+                    with self.lock:
+                        self.hits += 1
+                    return path
+
+            with self.lock:
+                self.misses += 1
+            self.download(key, file_name)
+            return path
+
+    def is_not_modified(self, key: str, etag: str) -> bool:
+        try:
+            self.resources.get_s3_client().head_object(
+                Bucket=self.aws_bucket_name, Key=key, IfNoneMatch=etag
+            )
+            return False
+        except ClientError as e:
+            # S3 answers 304 when the ETag still matches
+            return e.response.get("Error", {}).get("Code") in ("304", "NotModified")
+
+    def download(self, key: str, file_name: str):
+        response = self.resources.get_s3_client().get_object(
+            Bucket=self.aws_bucket_name, Key=key
+        )
+
+        # Write to a temporary file first so that no reader ever sees a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, "wb") as local_file:
+                for chunk in response["Body"].iter_chunks(1024 * 1024):
+                    local_file.write(chunk)
+            os.replace(temporary_path, os.path.join(self.directory, file_name))
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+        self.write_metadata(
+            file_name,
+            {"key": key, "etag": response["ETag"], "validated_at": time.time()},
+        )
+
+        # The new copy replaced an invalidated one, it is not removed with it
+        with self.lock:
+            self.removed.discard(file_name)
+        self.evict()
+
+    def write_metadata(self, file_name: str, metadata: dict):
+        with open(os.path.join(self.directory, file_name + ".json"), "w") as file:
+            json.dump(metadata, file)
+
+    def evict(self):
+        # Remove the least recently used files above the size bound, except the files in use
+        # and the most recently used one
+        with self.lock:
+            entries = self.get_entries()
+            total = sum(size for _, size in entries)
+            for file_name, size in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                if file_name not in self.readers:
+                    self.remove_files(file_name, file_name + ".json")
+                    total -= size
+
+    def invalidate(self, key: str):
+        file_name = self.get_file_name(key)
+        with self.get_key_lock(key), self.lock:
+            # A file in use is removed once its last reader is done with it, without its
+            # metadata the next reader downloads it again meanwhile
+            if file_name in self.readers:
+                self.removed.add(file_name)
+                self.remove_files(file_name + ".json")
+            else:
+                self.remove_files(file_name, file_name + ".json")
+
+    def remove_files(self, *names: str):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> dict:
+        entries = self.get_entries()
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "files": len(entries),
+                "bytes": sum(size for _, size in entries),
+            }
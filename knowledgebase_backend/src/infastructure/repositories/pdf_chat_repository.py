@@ -1,75 +1,418 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader
+import logging
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import ExitStack, contextmanager
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAI
-from langchain_openai import OpenAIEmbeddings
-from langchain.chains import RetrievalQA
-from langchain_community.vectorstores import Chroma
+from infastructure.repositories.embedding_cache_repository import (
+    EmbeddingCacheRepository,
+    CachedEmbeddings,
+)
+from infastructure.repositories.pdf_cache_repository import PdfCacheRepository
+from infastructure.repositories.pdf_parser_repository import PdfParser
+from infastructure.repositories.text_splitter_repository import StructureTextSplitter
+from infastructure.repositories.answer_cache_repository import AnswerCacheRepository
+from infastructure.repositories.embedding_provider_repository import (
+    EMBEDDING_PROVIDER,
+    get_embedding_provider,
+)
+from infastructure.repositories.vector_store_repository import (
+    VectorStoreRepository,
+    normalize,
+)
+from infastructure.repositories.ann_index_repository import AnnIndexRepository
+from infastructure.repositories.context_packer_repository import ContextPacker
+from infastructure.repositories.conversation_repository import ConversationRepository
+from infastructure.repositories.reranker_repository import get_reranker
+from infastructure.repositories.llm_provider_repository import get_llm_provider
+from infastructure.repositories.lexical_index_repository import (
+    LexicalIndexRepository,
+    reciprocal_rank_fusion,
+)
+from infastructure.resources.telemetry import telemetry
 
 # from config.config import OPEN_AI_API_KEY, AWS_S3_URL
 import os
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Access environment variables
 OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
 AWS_S3_URL = os.getenv("AWS_S3_URL")
+INDEX_DIRECTORY = os.getenv("INDEX_DIRECTORY", "indexes")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "ivf")
+TEXT_SPLITTER = os.getenv("TEXT_SPLITTER", "structure")
+
+# Prompt of the "stuff" chain, the retrieved chunks are stuffed into the context
+QUESTION_PROMPT = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Helpful Answer:"""
 
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, embedding_cache=None, parser=None):
         # Initialize the DocumentProcessor class with the required configuration
         self.api_key = OPEN_AI_API_KEY
         self.chunk_size = 2000
         self.chunk_overlap = 200
+        self.text_splitter = TEXT_SPLITTER
+        self.embedding_cache = embedding_cache
+        self.parser = parser or PdfParser()
+
+    def get_embeddings(self):
+        # OpenAI or the local model, as set in EMBEDDING_PROVIDER
+        embeddings = get_embedding_provider(self.api_key)
+
+        # Only embed the chunks that were never embedded before
+        if self.embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, self.embedding_cache)
+
+        return embeddings
 
-    def process_document(self, pdf_path):
-        # Load the document from the PDF file
-        embeddings = OpenAIEmbeddings(openai_api_key=self.api_key)
+    def load(self, local_path, source, known_pages=None):
+        with telemetry.span("index.parse"):
+            return self.parser.load(local_path, source, known_pages=known_pages)
 
-        # Load the document from the PDF file
-        loader = PyPDFLoader(pdf_path)
+    def split_documents(self, data):
+        with telemetry.span("index.split"):
+            # Split the pages into chunks by token count along their headings and paragraphs
+            if self.text_splitter == "structure":
+                return StructureTextSplitter().split_documents(data)
+
+            # Split the document into chunks of characters
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                add_start_index=True,
+            )
+            return text_splitter.split_documents(data)
+
+    def process_document(self, local_path, source):
+        # Load the embeddings used for the document
+        embeddings = self.get_embeddings()
 
         #  Load the document from the PDF file
-        data = loader.load()
+        data = self.load(local_path, source)
 
         # Split the document into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+        texts = self.split_documents(data)
+        return texts, embeddings
+
+
+class DocumentIndexer:
+    """
+    Persistent index of the documents of every user.
+    Every version of a document gets its own directory with the quantized vectors and the
+    lexical index of its chunks, and a version file that points to the current one. The files
+    of a version are never modified, so questions read them without any lock while a new
+    version is written, and a question over several documents searches their indexes together.
+    With VECTOR_INDEX set to "ivf", large searches go through an IVF index of the user instead
+    of scanning every chunk.
+    """
+
+    def __init__(self, api_key, index_directory=INDEX_DIRECTORY, embedding_cache=None):
+        # Initialize the DocumentIndexer class with the required configuration
+        self.api_key = api_key
+        self.index_directory = index_directory
+        self.embedding_cache = embedding_cache
+        self.vector_store = VectorStoreRepository()
+        self.lexical_indexes = LexicalIndexRepository(self.vector_store)
+        self.ann_indexes = AnnIndexRepository(self.vector_store)
+        self.lock = threading.Lock()
+        self.document_locks = {}
+
+    def get_user_path(self, username):
+        # Vectors of different embedding models can not be searched together, so every other
+        # provider than OpenAI gets its own indexes
+        owner = username
+        if EMBEDDING_PROVIDER != "openai":
+            owner = f"{username}\0{get_embedding_provider(self.api_key).model}"
+
+        # Hash the owner so that any username is a safe directory name
+        key = hashlib.sha256(owner.encode("utf-8")).hexdigest()
+        return os.path.join(self.index_directory, key)
+
+    def get_document_key(self, pdf_name):
+        return hashlib.sha256(pdf_name.encode("utf-8")).hexdigest()
+
+    def get_version_path(self, username, pdf_name):
+        return os.path.join(
+            self.get_user_path(username), "versions", self.get_document_key(pdf_name)
         )
 
-        # Split the document into chunks
-        texts = text_splitter.split_documents(data)
-        return texts, embeddings
+    def get_versions_path(self, username, pdf_name):
+        return os.path.join(
+            self.get_user_path(username), "documents", self.get_document_key(pdf_name)
+        )
+
+    def get_index_path(self, username, pdf_name, version=None):
+        # The directory of the given version, or of the current one
+        version = version or self.get_index_version(username, pdf_name)
+        if version is None:
+            return None
+        return os.path.join(self.get_versions_path(username, pdf_name), version)
+
+    def get_index_paths(self, username, pdf_names):
+        paths = (self.get_index_path(username, pdf_name) for pdf_name in pdf_names)
+        return [path for path in paths if path is not None]
+
+    def index_exists(self, username, pdf_name):
+        path = self.get_index_path(username, pdf_name)
+        return path is not None and self.vector_store.exists(path)
+
+    def get_document_lock(self, username, pdf_name):
+        """
+        Return the lock held while the versions of a document are embedded, written, switched
+        or removed. Without it a writer removes the version another one is still writing.
+        """
+        with self.lock:
+            return self.document_locks.setdefault(
+                (username, pdf_name), threading.RLock()
+            )
+
+    def build_index(self, username, pdf_name, local_path):
+        with self.get_document_lock(username, pdf_name):
+            # Only the pages changed since the previous version are extracted again
+            processor = DocumentProcessor(self.embedding_cache)
+            pages = processor.load(
+                local_path,
+                pdf_name,
+                known_pages=self.get_known_pages(username, pdf_name),
+            )
+            texts = processor.split_documents(pages)
+            return self.write_index(username, pdf_name, texts, pages=pages)
+
+    def get_known_pages(self, username, pdf_name):
+        # Text of the pages of the current version by the hash of their content
+        path = self.get_index_path(username, pdf_name)
+        if path is None:
+            return {}
+        try:
+            with open(os.path.join(path, "pages.json")) as pages_file:
+                return json.load(pages_file)
+        except FileNotFoundError:
+            return {}
+
+    def embed_chunks(self, username, pdf_name, texts, embeddings=None):
+        """
+        Return the vectors of the chunks. The chunks already in the current version of the
+        document keep their vector, only the new ones are embedded.
+        """
+        vectors = [None] * len(texts)
+        path = self.get_index_path(username, pdf_name)
+        index = self.vector_store.load(path) if path is not None else None
+        if index is not None:
+            known = {
+                self.get_chunk_key(document.page_content): position
+                for position, document in enumerate(index.get_documents())
+            }
+            for position, text in enumerate(texts):
+                known_position = known.get(self.get_chunk_key(text.page_content))
+                if known_position is not None:
+                    vectors[position] = index.vectors[known_position]
+
+        missing = [
+            position for position, vector in enumerate(vectors) if vector is None
+        ]
+        if missing:
+            embeddings = (
+                embeddings or DocumentProcessor(self.embedding_cache).get_embeddings()
+            )
+            with telemetry.span("index.embed"):
+                computed = embeddings.embed_documents(
+                    [texts[position].page_content for position in missing]
+                )
+            for position, vector in zip(missing, computed):
+                vectors[position] = vector
+
+        logger.info(
+            "Embedded %d new chunks of %s, reused the vectors of %d unchanged ones",
+            len(missing),
+            pdf_name,
+            len(texts) - len(missing),
+        )
+        return vectors
+
+    def get_chunk_key(self, content):
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def write_index(self, username, pdf_name, texts, vectors=None, pages=None):
+        with self.get_document_lock(username, pdf_name):
+            # Every chunk carries the name of its document
+            for text in texts:
+                text.metadata["pdf_name"] = pdf_name
+
+            # Embed the chunks unless the caller already did
+            if vectors is None:
+                vectors = self.embed_chunks(username, pdf_name, texts)
+
+            # Write the new version next to the current one
+            previous_path = self.get_index_path(username, pdf_name)
+            version = uuid.uuid4().hex
+            path = self.get_index_path(username, pdf_name, version)
+            with telemetry.span("index.write"):
+                self.vector_store.write(path, texts, vectors)
+                self.lexical_indexes.write(path, texts)
+
+            # Keep the text of the pages, the next version only extracts the changed ones
+            if pages is not None:
+                with open(os.path.join(path, "pages.json"), "w") as pages_file:
+                    json.dump(
+                        {
+                            page.metadata["page_hash"]: page.page_content
+                            for page in pages
+                            if "page_hash" in page.metadata
+                        },
+                        pages_file,
+                    )
+
+            # Switch to the new version at once, the cached answers follow it
+            version_path = self.get_version_path(username, pdf_name)
+            os.makedirs(os.path.dirname(version_path), exist_ok=True)
+            with open(f"{version_path}.{version}", "w") as version_file:
+                version_file.write(version)
+            os.replace(f"{version_path}.{version}", version_path)
+
+            self.ann_indexes.on_replace(username, previous_path, path)
+            self.remove_versions(username, pdf_name, keep=version)
+
+    def remove_versions(self, username, pdf_name, keep=None):
+        # Questions still reading a removed version keep their memory mapped files
+        versions_path = self.get_versions_path(username, pdf_name)
+        if not os.path.isdir(versions_path):
+            return
+        for version in os.listdir(versions_path):
+            if version == keep:
+                continue
+            path = os.path.join(versions_path, version)
+            self.vector_store.forget(path)
+            self.lexical_indexes.forget(path)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def get_index_version(self, username, pdf_name):
+        try:
+            with open(self.get_version_path(username, pdf_name)) as version_file:
+                return version_file.read()
+        except FileNotFoundError:
+            return None
+
+    def search_vectors(self, username, pdf_names, embedding, k):
+        paths = self.get_index_paths(username, pdf_names)
+        query = normalize(embedding)
+
+        # The IVF index answers when it holds all the documents, the exact search otherwise
+        candidates = None
+        if VECTOR_INDEX == "ivf":
+            candidates = self.ann_indexes.search(username, paths, query, k)
+        if candidates is None:
+            return self.vector_store.search(paths, query, k)
+        return self.vector_store.rerank(candidates, query, k)
+
+    def search_lexical(self, username, pdf_names, question, k):
+        paths = self.get_index_paths(username, pdf_names)
+        return self.lexical_indexes.search(paths, question, k)
+
+    def delete_index(self, username, pdf_name):
+        with self.get_document_lock(username, pdf_name):
+            # The chunks of the document are tombstoned in the IVF index of the user
+            self.ann_indexes.on_delete(
+                username, self.get_index_path(username, pdf_name)
+            )
+            try:
+                os.remove(self.get_version_path(username, pdf_name))
+            except FileNotFoundError:
+                pass
+            self.remove_versions(username, pdf_name)
 
 
 class QueryProcessor:
-    def __init__(self, api_key):
+    def __init__(self, api_key, llm=None):
 
         # Initialize the QueryProcessor class with the required configuration
         self.api_key = api_key
-        self.model = "gpt-3.5-turbo-instruct"
-        self.temperature = 0
-        self.max_tokens = 700
         self.chain_type = "stuff"
         self.search_args = 5
+        self.retrieval_mode = RETRIEVAL_MODE
+        self.retrieval_candidates = RETRIEVAL_CANDIDATES
+        self.context_packer = ContextPacker()
+        self.reranker = get_reranker()
 
-    def process_query(self, question, texts, embeddings, OPENAI_API_KEY):
-        docsearch = Chroma.from_documents(texts, embeddings)
-        chain = RetrievalQA.from_chain_type(
-            llm=OpenAI(
-                temperature=self.temperature,
-                model=self.model,
-                openai_api_key=self.api_key,
-                max_tokens=self.max_tokens,
-            ),
-            chain_type=self.chain_type,
-            retriever=docsearch.as_retriever(
-                search_type="similarity", search_kwargs={"k": self.search_args}
-            ),
+        # The model, its client and its connections are shared by every question
+        self.llm = llm or get_llm_provider(self.api_key)
+
+    def embed_question(self, question):
+        with telemetry.span("query.embed"):
+            return get_embedding_provider(self.api_key).embed_query(question)
+
+    def retrieve(
+        self,
+        question,
+        indexer,
+        username,
+        pdf_names,
+        embedding=None,
+        recent_documents=None,
+    ):
+        """
+        Return the chunks of the documents that best answer the question.
+        In hybrid mode the vector and the keyword (BM25) rankings of a wider set of candidates
+        are fused with reciprocal rank fusion, so exact part numbers, error codes and
+        identifiers are found even when their embedding is not close to the question.
+        The chunks of the previous answer of a conversation are fused in as one more ranking.
+        With a reranker, a wider set of candidates is retrieved and only the best few of them
+        by the score of the reranker are returned.
+        """
+        hybrid = self.retrieval_mode == "hybrid"
+        k = self.retrieval_candidates if hybrid else self.search_args
+        count = self.search_args
+        if self.reranker is not None:
+            k = max(k, self.reranker.candidates)
+            count = self.reranker.candidates
+
+        documents = self.similarity_search(
+            question, indexer, username, pdf_names, k, embedding
         )
+        rankings = [documents]
+        if hybrid:
+            with telemetry.span("query.lexical_search"):
+                rankings.append(
+                    indexer.search_lexical(username, pdf_names, question, k)
+                )
+        if recent_documents:
+            rankings.append(recent_documents)
+        if len(rankings) > 1:
+            documents = reciprocal_rank_fusion(rankings, count)
+
+        if self.reranker is None:
+            return documents
+        with telemetry.span("query.rerank"):
+            return self.reranker.rerank(question, documents)
+
+    def similarity_search(
+        self, question, indexer, username, pdf_names, k, embedding=None
+    ):
+        # Reuse the embedding of the question when it was already computed
+        if embedding is None:
+            embedding = self.embed_question(question)
+
+        # Only search the chunks of the requested documents, nothing is indexed here
+        with telemetry.span("query.vector_search"):
+            return indexer.search_vectors(username, pdf_names, embedding, k)
+
+    def build_prompt(self, question, documents, history=""):
         query = f"""You are given a pdf as the knowledgebase. Now answer the following question.
         
         The question is as follows: 
@@ -77,8 +420,54 @@ class QueryProcessor:
         {question}
         
         """
-        response = chain.invoke(query, only_answer=True)
-        return response
+        # A follow-up question is answered with the conversation it is part of
+        if history:
+            query = f"""{query}The conversation so far is as follows:
+
+        {history}
+        
+        """
+        # Only the best passages of the chunks that fit in the token budget are sent
+        with telemetry.span("query.pack"):
+            passages = self.context_packer.pack(documents)
+        context = "\n\n".join(passage.page_content for passage in passages)
+        return QUESTION_PROMPT.format(context=context, question=query)
+
+    def process_query(
+        self,
+        question,
+        indexer,
+        username,
+        pdf_names,
+        embedding=None,
+        conversation=None,
+    ):
+        # Follow-up questions are searched for with the conversation they are part of
+        conversation = conversation or {}
+        documents = self.retrieve(
+            conversation.get("search_question", question),
+            indexer,
+            username,
+            pdf_names,
+            embedding,
+            conversation.get("recent_documents"),
+        )
+        prompt = self.build_prompt(question, documents, conversation.get("history", ""))
+        with telemetry.span("query.llm"):
+            response = self.llm.invoke(prompt)
+        return {"result": response, "source_documents": documents}
+
+    def stream_answer(self, question, documents, history=""):
+        # Yield the answer token by token as the model generates it
+        prompt = self.build_prompt(question, documents, history)
+        started = time.perf_counter()
+        first_token = True
+        for token in self.llm.stream(prompt):
+            if first_token:
+                telemetry.record("query.llm_first_token", time.perf_counter() - started)
+                first_token = False
+            yield token
+        telemetry.record("query.llm", time.perf_counter() - started)
 
 
 class PdfChatRepository:
@@ -86,29 +475,289 @@ class PdfChatRepository:
     def __init__(self):
         self.api_key = OPEN_AI_API_KEY
         self.aws_url = AWS_S3_URL
+        self.pdf_cache = PdfCacheRepository()
+        self.embedding_cache = EmbeddingCacheRepository()
+        self.answer_cache = AnswerCacheRepository()
+        self.conversations = ConversationRepository()
+        self.indexer = DocumentIndexer(
+            self.api_key, embedding_cache=self.embedding_cache
+        )
 
-    def generate_response(self, question_data, pdf_path):
+    def index_document(self, username, pdf_path):
         try:
+            # Build the persistent index of the document for the user
+            with self.local_document(pdf_path) as local_path:
+                self.indexer.build_index(username, pdf_path, local_path)
+            return True
+        except Exception as e:
+            logger.error("Error indexing %s: %s", pdf_path, e)
+            return False
 
-            # Process the document
-            doc_processor = DocumentProcessor()
+    def delete_index(self, username, pdf_path):
+        try:
+            self.indexer.delete_index(username, pdf_path)
+            self.pdf_cache.invalidate(pdf_path)
+            self.answer_cache.invalidate(username, pdf_path)
+            return True
+        except Exception as e:
+            logger.error("Error deleting the index of %s: %s", pdf_path, e)
+            return False
+
+    @contextmanager
+    def local_document(self, pdf_path, revalidate=False):
+        # Local copy of the PDF, only downloaded again when it changed in S3 and kept on disk
+        # until the block ends
+        with ExitStack() as stack:
+            with telemetry.span("document.fetch"):
+                local_path = stack.enter_context(
+                    self.pdf_cache.local_copy(pdf_path, revalidate)
+                )
+            yield local_path
+
+    def get_embedding_cache_stats(self):
+        return self.embedding_cache.get_stats()
+
+    def get_pdf_cache_stats(self):
+        return self.pdf_cache.get_stats()
+
+    def get_answer_cache_stats(self):
+        return self.answer_cache.get_stats()
+
+    def get_ann_index_stats(self):
+        return self.indexer.ann_indexes.get_stats()
+
+    def get_llm_stats(self):
+        return get_llm_provider(self.api_key).get_stats()
+
+    def get_reranker_stats(self):
+        reranker = get_reranker()
+        return reranker.get_stats() if reranker is not None else None
 
-            # Process the document
-            texts, embeddings = doc_processor.process_document(
-                f"{self.aws_url}/{pdf_path}"
+    def shutdown(self):
+        self.indexer.ann_indexes.shutdown()
+
+    def invalidate_answers(self, username, pdf_path):
+        self.answer_cache.invalidate(username, pdf_path)
+
+    def get_cached_answer(self, query_processor, question_data, pdf_paths, username):
+        # The answers are only valid for the versions of the documents they were given from
+        document_key = (
+            username,
+            tuple(
+                (pdf_path, self.indexer.get_index_version(username, pdf_path))
+                for pdf_path in sorted(pdf_paths)
+            ),
+        )
+
+        # The question is only embedded for the semantic tier once the exact lookup missed,
+        # retrieval reuses the embedding
+        with telemetry.span("query.answer_cache"):
+            cached, embedding = self.answer_cache.get(
+                document_key,
+                question_data,
+                lambda: query_processor.embed_question(question_data),
             )
+        return document_key, embedding, cached
+
+    def ensure_index(self, username, pdf_paths):
+        # Documents uploaded before indexing existed are indexed on first use
+        for pdf_path in pdf_paths:
+            if self.indexer.index_exists(username, pdf_path):
+                continue
+
+            # Concurrent questions on the document wait for a single build
+            with self.indexer.get_document_lock(username, pdf_path):
+                if not self.indexer.index_exists(username, pdf_path):
+                    with telemetry.span("index.build"), self.local_document(
+                        pdf_path
+                    ) as local_path:
+                        self.indexer.build_index(username, pdf_path, local_path)
+
+    def get_conversation(self, session, question_data, pdf_paths, username):
+        """
+        Return the history, the question to search for and the chunks of the previous answer
+        a question of the session is answered with, or None without a session.
+        """
+        if session is None:
+            return None
+
+        versions = [
+            [pdf_path, self.indexer.get_index_version(username, pdf_path)]
+            for pdf_path in sorted(pdf_paths)
+        ]
+        return {
+            "history": self.conversations.get_history(session),
+            "search_question": self.conversations.get_search_question(
+                session, question_data
+            ),
+            "recent_documents": self.conversations.get_recent_documents(
+                session, versions
+            ),
+            "versions": versions,
+        }
+
+    def add_turn(self, session, conversation, question_data, answer, documents, llm):
+        if session is not None:
+            with telemetry.span("query.add_turn"):
+                self.conversations.add_turn(
+                    session,
+                    question_data,
+                    answer,
+                    documents,
+                    conversation["versions"],
+                    llm,
+                )
+
+    def generate_response(self, question_data, pdf_paths, username, session=None):
+        with telemetry.span("query.total"):
+            return self.answer(question_data, pdf_paths, username, session)
+
+    def answer(self, question_data, pdf_paths, username, session=None):
+        try:
+            self.ensure_index(username, pdf_paths)
 
             # Process the query
             query_processor = QueryProcessor(self.api_key)
+            conversation = self.get_conversation(
+                session, question_data, pdf_paths, username
+            )
 
-            # Process the query
+            # A follow-up is answered from its conversation, so it is never cached
+            follow_up = self.conversations.has_history(session)
+
+            # Answer from the cache when the question was already asked
+            document_key, embedding, cached = None, None, None
+            if not follow_up:
+                document_key, embedding, cached = self.get_cached_answer(
+                    query_processor, question_data, pdf_paths, username
+                )
+            if cached is not None:
+                self.add_turn(
+                    session,
+                    conversation,
+                    question_data,
+                    cached["answer"],
+                    [],
+                    query_processor.llm,
+                )
+                return cached["answer"]
+
+            # Process the query against the stored index of the documents
             result = query_processor.process_query(
-                question_data, texts, embeddings, self.api_key
+                question_data,
+                self.indexer,
+                username,
+                pdf_paths,
+                embedding,
+                conversation,
             )
 
-            print(result["result"])
-
+            if not follow_up:
+                self.answer_cache.put(
+                    document_key,
+                    question_data,
+                    {
+                        "answer": result["result"],
+                        "sources": self.get_sources(result["source_documents"]),
+                    },
+                    embedding,
+                )
+            self.add_turn(
+                session,
+                conversation,
+                question_data,
+                result["result"],
+                result["source_documents"],
+                query_processor.llm,
+            )
             return result["result"]
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.exception("Error answering a question on %s", pdf_paths)
             return None
+
+    def get_sources(self, documents):
+        return [
+            {
+                "source": document.metadata.get("source"),
+                "page": document.metadata.get("page"),
+                "content": document.page_content,
+            }
+            for document in documents
+        ]
+
+    def stream_response(self, question_data, pdf_paths, username, session=None):
+        """
+        Yield ("sources", chunks) once the retrieval is done, then ("token", text) for every
+        token of the answer and finally ("done", None), or ("error", message) on failure.
+        """
+        started = time.perf_counter()
+        try:
+            self.ensure_index(username, pdf_paths)
+            query_processor = QueryProcessor(self.api_key)
+            conversation = self.get_conversation(
+                session, question_data, pdf_paths, username
+            )
+            follow_up = self.conversations.has_history(session)
+
+            # A cached answer is sent at once
+            document_key, embedding, cached = None, None, None
+            if not follow_up:
+                document_key, embedding, cached = self.get_cached_answer(
+                    query_processor, question_data, pdf_paths, username
+                )
+            if cached is not None:
+                yield "sources", cached["sources"]
+                yield "token", cached["answer"]
+                self.add_turn(
+                    session,
+                    conversation,
+                    question_data,
+                    cached["answer"],
+                    [],
+                    query_processor.llm,
+                )
+                telemetry.record("query.total", time.perf_counter() - started)
+                yield "done", None
+                return
+
+            # Retrieve the chunks first so that they can be sent before the answer
+            conversation = conversation or {}
+            documents = query_processor.retrieve(
+                conversation.get("search_question", question_data),
+                self.indexer,
+                username,
+                pdf_paths,
+                embedding,
+                conversation.get("recent_documents"),
+            )
+            sources = self.get_sources(documents)
+            yield "sources", sources
+
+            tokens = []
+            for token in query_processor.stream_answer(
+                question_data, documents, conversation.get("history", "")
+            ):
+                tokens.append(token)
+                yield "token", token
+
+            answer = "".join(tokens)
+            if not follow_up:
+                self.answer_cache.put(
+                    document_key,
+                    question_data,
+                    {"answer": answer, "sources": sources},
+                    embedding,
+                )
+            self.add_turn(
+                session,
+                conversation,
+                question_data,
+                answer,
+                documents,
+                query_processor.llm,
+            )
+            telemetry.record("query.total", time.perf_counter() - started)
+            yield "done", None
+        except Exception:
+            logger.exception("Error streaming an answer on %s", pdf_paths)
+            yield "error", "Failed to generate a response"
@@ -0,0 +1,184 @@
+import os
+import mmap
+import time
+import hashlib
+from collections import deque
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    StreamObject,
+)
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", 16))
+PARSE_MAX_PENDING_TASKS = int(
+    os.getenv("PARSE_MAX_PENDING_TASKS", 2 * (os.cpu_count() or 1))
+)
+
+
+def open_pdf(file):
+    # Map the file instead of reading it into memory
+    pdf_data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return pdf_data, PdfReader(pdf_data)
+
+
+def count_pages(local_path):
+    with open(local_path, "rb") as file:
+        pdf_data, reader = open_pdf(file)
+        with pdf_data:
+            return len(reader.pages)
+
+
+def get_object_hash(obj, digests, path=()):
+    """
+    Return the hash of a PDF object and of everything it refers to, streams included.
+    The hashes of the indirect objects are kept in digests, so a font or a form shared by
+    the pages of a range is only hashed once. The data of images is left out, it does not
+    change the text of a page.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in path:
+            return b"cycle"
+        if key not in digests:
+            digests[key] = get_object_hash(obj.get_object(), digests, path + (key,))
+        return digests[key]
+
+    digest = hashlib.sha256(type(obj).__name__.encode("utf-8"))
+    if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+        digest.update(obj.get_data())
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            # The parent of a page or a form is not part of what it draws
+            if name == "/Parent":
+                continue
+            digest.update(name.encode("utf-8"))
+            digest.update(get_object_hash(obj.raw_get(name), digests, path))
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            digest.update(get_object_hash(item, digests, path))
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+    return digest.digest()
+
+
+def get_page_hash(page, digests=None):
+    """
+    Hash of the content stream of the page and of its resources. The same operators draw
+    another text with other fonts or forms, so the resources are part of the hash.
+    """
+    digests = {} if digests is None else digests
+    contents = page.get_contents()
+    digest = hashlib.sha256(contents.get_data() if contents is not None else b"")
+    digest.update(get_object_hash(page.get("/Resources"), digests))
+    return digest.hexdigest()
+
+
+def extract_page_range(local_path, start, end, known_hashes=frozenset()):
+    """
+    Return (page number, text, extraction seconds, page hash) for the pages of the range.
+    The text of a page whose hash is in known_hashes is not extracted again and is None.
+    Module level so that it can be run in a worker process of the parsing pool.
+    """
+    pages = []
+    digests = {}
+    with open(local_path, "rb") as file:
+        pdf_data, reader = open_pdf(file)
+        with pdf_data:
+            for page_number in range(start, end):
+                started = time.perf_counter()
+                page = reader.pages[page_number]
+                page_hash = get_page_hash(page, digests)
+                text = None if page_hash in known_hashes else page.extract_text()
+                pages.append(
+                    (page_number, text, time.perf_counter() - started, page_hash)
+                )
+    return pages
+
+
+class PdfParser:
+    """
+    Extract the text of a PDF page range by page range.
+    With a pool the ranges are extracted in parallel across its workers, without one they
+    are extracted in the calling thread. Either way the pages come out in order.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        pages_per_task=PARSE_PAGES_PER_TASK,
+        max_pending_tasks=PARSE_MAX_PENDING_TASKS,
+    ):
+        self.pool = pool
+        self.pages_per_task = pages_per_task
+        self.max_pending_tasks = max_pending_tasks
+
+    def iter_pages(self, local_path, known_hashes=frozenset()):
+        """
+        Yield (page number, text, extraction seconds, page hash) for every page of the PDF in
+        order, the text is None for the pages with a known hash. Only max_pending_tasks ranges
+        are extracted ahead of the consumer.
+        """
+        page_count = count_pages(local_path)
+        ranges = deque(
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        )
+
+        if self.pool is None:
+            for start, end in ranges:
+                yield from extract_page_range(local_path, start, end, known_hashes)
+            return
+
+        pending = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < self.max_pending_tasks:
+                    start, end = ranges.popleft()
+                    pending.append(
+                        self.pool.submit(
+                            extract_page_range, local_path, start, end, known_hashes
+                        )
+                    )
+                yield from pending.popleft().result()
+        finally:
+            # Nothing left to extract when the consumer stops early
+            for future in pending:
+                future.cancel()
+
+    def load(self, local_path, source, on_page=None, known_pages=None):
+        """
+        Return one document per page, as the loaders of langchain return them.
+        known_pages maps the hashes of the pages of a previous version of the PDF to their
+        text, the unchanged pages reuse it instead of being extracted again.
+        """
+        known_pages = known_pages or {}
+        documents = []
+        for page_number, text, seconds, page_hash in self.iter_pages(
+            local_path, frozenset(known_pages)
+        ):
+            documents.append(
+                Document(
+                    page_content=known_pages[page_hash] if text is None else text,
+                    metadata={
+                        "source": source,
+                        "page": page_number,
+                        "parse_seconds": seconds,
+                        "page_hash": page_hash,
+                    },
+                )
+            )
+            if on_page is not None:
+                on_page(page_number, seconds)
+        return documents
+
+    def get_text(self, local_path):
+        # Join once at the end instead of growing a string page by page
+        return "".join(text for _, text, _, _ in self.iter_pages(local_path))
@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+import numpy as np
+from infastructure.resources.torch_runtime import import_torch
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+RERANKER = os.getenv("RERANKER", "none")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_CANDIDATES = int(os.getenv("RERANKER_CANDIDATES", 50))
+RERANKER_TOP_K = int(os.getenv("RERANKER_TOP_K", 3))
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", 16))
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", 256))
+RERANKER_TIMEOUT_SECONDS = float(os.getenv("RERANKER_TIMEOUT_SECONDS", 0.5))
+
+
+class CrossEncoderReranker:
+    """
+    Re-score the retrieved chunks with a small cross-encoder run on the CPU.
+    The cross-encoder reads the question and a chunk together, which ranks much better than
+    comparing their embeddings but costs a model run per chunk, so only the candidates of
+    the cheap retrieval are scored, batch_size at a time. A batch is only as large as the
+    measured time per chunk fits in what is left of timeout_seconds, the candidates that do
+    not fit are not scored and keep the order they were retrieved in.
+    """
+
+    def __init__(
+        self,
+        model=RERANKER_MODEL,
+        candidates=RERANKER_CANDIDATES,
+        top_k=RERANKER_TOP_K,
+        batch_size=RERANKER_BATCH_SIZE,
+        max_length=RERANKER_MAX_LENGTH,
+        timeout_seconds=RERANKER_TIMEOUT_SECONDS,
+    ):
+        self.model = model
+        self.candidates = candidates
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.timeout_seconds = timeout_seconds
+        self.cross_encoder = None
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+
+        # Moving average of the seconds the model takes per chunk, None until measured
+        self.pair_seconds = None
+        self.reranked = 0
+        self.timeouts = 0
+        self.overruns = 0
+        self.latencies = []
+
+    def get_cross_encoder(self):
+        with self.lock:
+            if self.cross_encoder is None:
+                # Only needed when re-ranking is enabled, so only imported when it is used
+                import_torch()
+                from sentence_transformers import CrossEncoder
+
+                self.cross_encoder = CrossEncoder(
+                    self.model, device="cpu", max_length=self.max_length
+                )
+            return self.cross_encoder
+
+    def rerank(self, question, documents, k=None):
+        """
+        Return the k best documents by the score of the cross-encoder, best first.
+        """
+        k = k or self.top_k
+        if len(documents) <= 1:
+            return documents[:k]
+
+        # The model is loaded on first use, outside of the time budget of the question
+        cross_encoder = self.get_cross_encoder()
+        started = time.perf_counter()
+        deadline = started + self.timeout_seconds
+
+        scores = []
+        while len(scores) < len(documents):
+            size = self.get_batch_size(deadline - time.perf_counter())
+            if size == 0:
+                break
+            pairs = [
+                (question, document.page_content)
+                for document in documents[len(scores) : len(scores) + size]
+            ]
+            batch_started = time.perf_counter()
+            scores.extend(
+                cross_encoder.predict(
+                    pairs, batch_size=len(pairs), show_progress_bar=False
+                )
+            )
+            self.measure((time.perf_counter() - batch_started) / len(pairs))
+
+        # The scored candidates are ordered by their score, the others stay behind them
+        order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+        reranked = [documents[position] for position in order]
+        reranked.extend(documents[len(scores) :])
+        seconds = time.perf_counter() - started
+        self.record(
+            seconds, len(scores) < len(documents), seconds > self.timeout_seconds
+        )
+        return reranked[:k]
+
+    def get_batch_size(self, remaining_seconds):
+        # Only start the chunks that the model is expected to score before the deadline
+        if remaining_seconds <= 0:
+            return 0
+        if self.pair_seconds is None:
+            return self.batch_size
+        return min(self.batch_size, int(remaining_seconds / self.pair_seconds))
+
+    def measure(self, pair_seconds):
+        if self.pair_seconds is None:
+            self.pair_seconds = pair_seconds
+        else:
+            self.pair_seconds = 0.8 * self.pair_seconds + 0.2 * pair_seconds
+
+    def record(self, seconds, timed_out, overran):
+        with self.stats_lock:
+            self.reranked += 1
+            self.timeouts += timed_out
+            self.overruns += overran
+            self.latencies.append(seconds)
+
+            # Only the latencies of the last questions are kept
+            if len(self.latencies) > 1000:
+                del self.latencies[:500]
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            latencies = np.array(self.latencies) * 1000
+            return {
+                "reranked": self.reranked,
+                "timeouts": self.timeouts,
+                "overruns": self.overruns,
+                "p50_ms": (
+                    float(np.percentile(latencies, 50)) if len(latencies) else 0.0
+                ),
+                "p99_ms": (
+                    float(np.percentile(latencies, 99)) if len(latencies) else 0.0
+                ),
+            }
+
+
+# The re-rankers, by the name set in RERANKER
+RERANKERS = {
+    "cross-encoder": lambda: CrossEncoderReranker(),
+}
+
+rerankers = {}
+rerankers_lock = threading.Lock()
+
+
+def get_reranker(name=RERANKER):
+    # Re-ranking is off with "none", otherwise its model is loaded once per process
+    if name == "none":
+        return None
+    if name not in RERANKERS:
+        raise ValueError(f"Unknown reranker {name}")
+
+    with rerankers_lock:
+        if name not in rerankers:
+            rerankers[name] = RERANKERS[name]()
+        return rerankers[name]
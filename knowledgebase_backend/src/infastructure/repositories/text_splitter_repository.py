@@ -0,0 +1,262 @@
+import os
+import re
+from langchain_core.documents import Document
+from infastructure.repositories.token_counter_repository import TokenCounter
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 500))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 50))
+
+# Lines with at least one printable character
+LINE_PATTERN = re.compile(r"[^\n]*\S[^\n]*")
+SENTENCE_PATTERN = re.compile(r"[^.!?]*[.!?]+\s*|[^.!?]+")
+
+# Numbered ("2.1 Scope"), markdown or all capital lines open a section, unless they end
+# like a sentence
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]+\S[^\n]*"
+    r"|(?:\d+(?:\.\d+)*\.?|[A-Z]\.|[IVX]+\.)[ \t]+[A-Z][^.\n]*"
+    r"|[A-Z][A-Z0-9 ,:&/()'-]{2,})(?<![.,;])[ \t]*$",
+    re.MULTILINE,
+)
+MAX_HEADING_CHARACTERS = 100
+
+# Cells of a table row are separated by tabs, pipes or runs of spaces
+TABLE_SEPARATORS = ("\t", "|", "   ")
+
+# Kinds of the boundary before a line, the stronger the better to cut a chunk at
+LINE, PARAGRAPH, TABLE, HEADING = 0, 1, 2, 3
+
+
+def is_heading(line):
+    return (
+        len(line.strip()) <= MAX_HEADING_CHARACTERS
+        and HEADING_PATTERN.fullmatch(line) is not None
+    )
+
+
+def find_table_rows(text):
+    """
+    Return the starts of the lines with a tab, a pipe or a run of spaces between two cells.
+    The separators are looked for with str.find, much faster than a regex over every line.
+    """
+    rows = set()
+    for separator in TABLE_SEPARATORS:
+        position = text.find(separator)
+        while position != -1:
+            line_start = text.rfind("\n", 0, position) + 1
+            line_end = text.find("\n", position)
+            if line_end == -1:
+                line_end = len(text)
+            if separator != "   " or (
+                text[line_start:position].strip() and text[position:line_end].strip()
+            ):
+                rows.add(line_start)
+                position = text.find(separator, line_end)
+            else:
+                # Indentation or trailing spaces, the rest of the line may still have cells
+                position = text.find(separator, position + len(separator))
+    return rows
+
+
+def get_lines(text):
+    """
+    Return the (start, end, boundary) of the lines of the text, the boundary telling whether
+    a heading, a table, a paragraph or only a line starts there.
+    """
+    # The headings and the table rows of the whole text are found in one pass each
+    headings = {
+        match.start()
+        for match in HEADING_PATTERN.finditer(text)
+        if len(match.group().strip()) <= MAX_HEADING_CHARACTERS
+    }
+    table_rows = find_table_rows(text)
+
+    lines = []
+    previous_end = 0
+    previous_table = False
+    for match in LINE_PATTERN.finditer(text):
+        start, end = match.span()
+        table = start in table_rows
+        if start in headings:
+            boundary = HEADING
+        elif table != previous_table:
+            boundary = TABLE
+        elif text.count("\n", previous_end, start) > 1 or (
+            not table and text[previous_end - 1 : previous_end] in (".", "!", "?", ":")
+        ):
+            # A blank line or the end of a sentence at the end of the previous line
+            boundary = PARAGRAPH
+        else:
+            boundary = LINE
+
+        lines.append((start, end, boundary))
+        previous_end = end
+        previous_table = table
+    return lines
+
+
+class StructureTextSplitter:
+    """
+    Split the pages of a document into chunks of at most chunk_tokens tokens.
+    The lines of every page are classified as headings, table rows or paragraph text and a
+    chunk is preferably cut before a heading, around a table or between paragraphs. A chunk
+    never spans two pages and is a slice of its page, its start_index is the offset of the
+    slice in the page and its section the last heading seen before it in the document.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens=CHUNK_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS,
+        token_counter=None,
+    ):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.token_counter = token_counter or TokenCounter()
+
+    def split_documents(self, documents):
+        pages = [
+            (document, self.get_units(document.page_content)) for document in documents
+        ]
+
+        # Count the tokens of the lines of every page at once
+        texts = [
+            document.page_content[start:end]
+            for document, units in pages
+            for start, end, _ in units
+        ]
+        counts = iter(self.token_counter.count_batch(texts))
+
+        chunks = []
+        section = None
+        for document, units in pages:
+            text = document.page_content
+            units = [
+                unit
+                for start, end, boundary in units
+                for unit in self.fit_unit(text, start, end, boundary, next(counts))
+            ]
+            position = 0
+            for start, end in self.get_spans(units):
+                # The last heading at or before the start of the chunk
+                while position < len(units) and units[position][0] <= start:
+                    if units[position][2] == HEADING:
+                        section = text[units[position][0] : units[position][1]].strip()
+                    position += 1
+                chunks.append(
+                    Document(
+                        page_content=text[start:end],
+                        metadata={
+                            **document.metadata,
+                            "start_index": start,
+                            "section": section,
+                        },
+                    )
+                )
+
+            # The headings after the last chunk start open the section of the next page
+            for start, end, boundary, _ in units[position:]:
+                if boundary == HEADING:
+                    section = text[start:end].strip()
+        return chunks
+
+    def get_units(self, text):
+        """
+        Return the lines of the text as (start, end, boundary), the lines too long for one
+        chunk being cut into sentences and then into pieces that fit.
+        """
+        # Characters of the longest piece, with some margin on four characters per token. Dense
+        # scripts take more tokens per character, fit_unit cuts their pieces again
+        max_characters = self.chunk_tokens * 3
+        units = []
+        for start, end, boundary in get_lines(text):
+            if end - start <= max_characters:
+                units.append((start, end, boundary))
+                continue
+            for match in SENTENCE_PATTERN.finditer(text, start, end):
+                sentence_start, sentence_end = match.span()
+                for piece_start in range(sentence_start, sentence_end, max_characters):
+                    units.append(
+                        (
+                            piece_start,
+                            min(piece_start + max_characters, sentence_end),
+                            boundary,
+                        )
+                    )
+                    boundary = LINE
+        return units
+
+    def fit_unit(self, text, start, end, boundary, tokens):
+        """
+        Return the (start, end, boundary, tokens) pieces of a unit of the text, cut so that
+        every piece fits in chunk_tokens.
+        """
+        units = []
+        while tokens > self.chunk_tokens and end - start > 1:
+            # The longest start of the unit that fits, found by bisection on its characters
+            low, high = 1, end - start - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.count(text[start : start + middle]) <= self.chunk_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            units.append(
+                (start, start + low, boundary, self.count(text[start : start + low]))
+            )
+            start += low
+            boundary = LINE
+            tokens = self.count(text[start:end])
+        units.append((start, end, boundary, tokens))
+        return units
+
+    def count(self, text):
+        return self.token_counter.count_batch([text])[0]
+
+    def get_spans(self, units):
+        """
+        Return the (start, end) of the chunks of the (start, end, boundary, tokens) units of a
+        page. A chunk ends at the strongest boundary past half of chunk_tokens, or before any
+        heading past a quarter of it, and the next one starts overlap_tokens before its end
+        unless it starts at a heading.
+        """
+        spans = []
+        first = 0
+        while first < len(units):
+            last = first
+            tokens = 0
+            cut, cut_boundary = None, LINE
+            while last < len(units) and (
+                last == first or tokens + units[last][3] <= self.chunk_tokens
+            ):
+                tokens += units[last][3]
+                last += 1
+                if last < len(units):
+                    boundary = units[last][2]
+                    minimum = self.chunk_tokens // (4 if boundary == HEADING else 2)
+                    if tokens >= minimum and boundary >= cut_boundary:
+                        cut, cut_boundary = last, boundary
+
+            if last < len(units) and cut is not None:
+                last = cut
+            spans.append((units[first][0], units[last - 1][1]))
+            if last == len(units):
+                break
+
+            # Repeat the last lines of the chunk at the start of the next one
+            next_first = last
+            overlap = 0
+            if units[last][2] != HEADING:
+                while (
+                    next_first - 1 > first
+                    and overlap + units[next_first - 1][3] <= self.overlap_tokens
+                ):
+                    next_first -= 1
+                    overlap += units[next_first][3]
+            first = next_first
+        return spans
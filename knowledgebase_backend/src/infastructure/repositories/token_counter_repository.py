@@ -0,0 +1,51 @@
+import logging
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+# Encodings loaded by the process, None when the tokenizer is not available
+ENCODINGS = {}
+
+
+def get_encoding(name):
+    # Only try to load an encoding once, even when it fails
+    if name not in ENCODINGS:
+        try:
+            ENCODINGS[name] = tiktoken.get_encoding(name)
+        except Exception as e:
+            logger.warning(
+                "Token counts are estimated, the tokenizer is not available: %s", e
+            )
+            ENCODINGS[name] = None
+    return ENCODINGS[name]
+
+
+class TokenCounter:
+    """
+    Count the tokens of texts with the tokenizer of the OpenAI models.
+    The tokenizer files are downloaded on first use, which fails offline, so the counts are
+    then estimated at about four characters per token.
+    """
+
+    def __init__(self, encoding="cl100k_base"):
+        self.encoding = get_encoding(encoding)
+
+    def count(self, text):
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_batch(self, texts):
+        # The tokenizer encodes the texts of a batch on several threads
+        if self.encoding is None:
+            return [len(text) // 4 + 1 for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def truncate(self, text, tokens):
+        # The longest start of the text that fits in the number of tokens
+        if self.encoding is None:
+            return text[: tokens * 4]
+        return self.encoding.decode(
+            self.encoding.encode(text, disallowed_special=())[:tokens]
+        )
@@ -0,0 +1,203 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", 1024))
+VECTOR_RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", 4))
+VECTOR_SCAN_BLOCK_ROWS = int(os.getenv("VECTOR_SCAN_BLOCK_ROWS", 16384))
+
+
+def normalize(vectors):
+    # Unit vectors, so that the cosine similarity is a dot product
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors):
+    # Symmetric int8 quantization with one scale per vector
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales
+
+
+class VectorIndex:
+    """
+    Vectors and chunks of one version of one document, stored in files that are never
+    modified once written:
+        quantized.npy   int8 vectors, scanned for every question
+        scales.npy      float32 scale of every quantized vector
+        vectors.npy     float32 vectors, only read for the candidates that are re-ranked
+        offsets.npy     uint64 offset of every chunk text in chunks.bin, plus the end
+        chunks.bin      the UTF-8 texts of the chunks back to back
+        metadata.json   the metadata of every chunk
+    The arrays are memory mapped, so every process serving the same index shares its pages
+    through the OS page cache instead of loading a copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.quantized = np.load(os.path.join(path, "quantized.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.chunks = np.memmap(os.path.join(path, "chunks.bin"), mode="r")
+        with open(os.path.join(path, "metadata.json")) as file:
+            self.metadatas = json.load(file)
+
+    @staticmethod
+    def write(path, documents, vectors):
+        os.makedirs(path, exist_ok=True)
+        if not documents:
+            vectors = np.zeros((0, 1), dtype=np.float32)
+        vectors = normalize(vectors)
+        quantized, scales = quantize(vectors)
+        np.save(os.path.join(path, "quantized.npy"), quantized)
+        np.save(os.path.join(path, "scales.npy"), scales)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+
+        texts = [document.page_content.encode("utf-8") for document in documents]
+        offsets = np.zeros(len(texts) + 1, dtype=np.uint64)
+        offsets[1:] = np.cumsum([len(text) for text in texts])
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        with open(os.path.join(path, "chunks.bin"), "wb") as file:
+            # An empty memory map can not be opened, so the file is never left empty
+            file.write(b"".join(texts) or b"\0")
+        with open(os.path.join(path, "metadata.json"), "w") as file:
+            json.dump([document.metadata for document in documents], file)
+
+    def __len__(self):
+        return len(self.metadatas)
+
+    def get_document(self, position):
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return Document(
+            page_content=bytes(self.chunks[start:end]).decode("utf-8"),
+            metadata=self.metadatas[position],
+        )
+
+    def get_documents(self):
+        return [self.get_document(position) for position in range(len(self))]
+
+    def scan(self, query, count):
+        """
+        Return the positions and approximate scores of the count best chunks for the query.
+        The quantized vectors are scanned block by block to bound the memory of the scan.
+        """
+        positions = []
+        scores = []
+        for start in range(0, len(self), VECTOR_SCAN_BLOCK_ROWS):
+            block = self.quantized[start : start + VECTOR_SCAN_BLOCK_ROWS]
+            block_scores = (block.astype(np.float32) @ query) * self.scales[
+                start : start + VECTOR_SCAN_BLOCK_ROWS
+            ]
+            if len(block_scores) > count:
+                best = np.argpartition(-block_scores, count)[:count]
+            else:
+                best = np.arange(len(block_scores))
+            positions.append(best + start)
+            scores.append(block_scores[best])
+
+        if not positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(positions), np.concatenate(scores)
+
+    def rerank(self, positions, query):
+        # Exact scores of the candidates, only their rows of the float32 vectors are read
+        order = np.sort(positions)
+        return order, self.vectors[order] @ query
+
+
+class VectorStoreRepository:
+    """
+    Search the vector indexes of the documents with int8 quantized vectors and re-rank the
+    best candidates with their exact float32 vectors. The most recently searched indexes
+    are kept open, by default as many as the documents a question over all the files of a
+    user usually spans, so that such a question does not reopen every index.
+    """
+
+    def __init__(
+        self, max_loaded=VECTOR_STORE_CACHE_SIZE, rerank_factor=VECTOR_RERANK_FACTOR
+    ):
+        self.max_loaded = max_loaded
+        self.rerank_factor = rerank_factor
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def write(self, path, documents, vectors):
+        VectorIndex.write(path, documents, vectors)
+
+    def exists(self, path):
+        return os.path.isfile(os.path.join(path, "metadata.json"))
+
+    def load(self, path):
+        # The files of an index never change, so an open index is never stale
+        with self.lock:
+            if path in self.loaded:
+                self.loaded.move_to_end(path)
+                return self.loaded[path]
+
+        if not self.exists(path):
+            return None
+        index = VectorIndex(path)
+
+        with self.lock:
+            self.loaded[path] = index
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+        return index
+
+    def forget(self, path):
+        with self.lock:
+            self.loaded.pop(path, None)
+
+    def search(self, paths, query, k):
+        """
+        Return the documents of the k chunks of the indexes closest to the query vector.
+        """
+        indexes = [index for index in map(self.load, paths) if index is not None]
+        if not indexes:
+            return []
+        query = normalize(query)
+        count = k * self.rerank_factor
+
+        # Approximate scores of the best candidates of every index
+        candidates = []
+        for index in indexes:
+            positions, scores = index.scan(query, count)
+            candidates.extend(
+                (float(score), index, int(position))
+                for position, score in zip(positions, scores)
+            )
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return self.rerank(candidates[:count], query, k)
+
+    def rerank(self, candidates, query, k):
+        """
+        Return the documents of the k best of the (approximate score, index, position)
+        candidates by their exact score.
+        """
+        positions = {}
+        for _, index, position in candidates:
+            positions.setdefault(index, []).append(position)
+
+        # Exact scores of the candidates, read index by index
+        results = []
+        for index, index_positions in positions.items():
+            order, scores = index.rerank(np.array(index_positions), query)
+            results.extend(
+                (float(score), index, int(position))
+                for position, score in zip(order, scores)
+            )
+
+        results.sort(key=lambda result: result[0], reverse=True)
+        return [index.get_document(position) for _, index, position in results[:k]]
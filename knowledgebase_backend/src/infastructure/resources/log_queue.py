@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import queue
+import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# The request being handled, set by the logging middleware for every HTTP request
+REQUEST_CONTEXT = contextvars.ContextVar("request_context", default=None)
+
+
+def set_request_user(username):
+    # The context is shared with the middleware, even from the threads of sync routes
+    context = REQUEST_CONTEXT.get()
+    if context is not None:
+        context["user"] = username
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the id of the request being handled to the records logged while handling it.
+    """
+
+    def filter(self, record):
+        context = REQUEST_CONTEXT.get()
+        record.request_id = context["request_id"] if context is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format a record as one JSON object per line, with the fields passed in extra={"fields"}.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None) is not None:
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand the records to the writer thread, the records that do not fit in the queue are
+    dropped and counted instead of blocking the request that logs them.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogQueue:
+    """
+    Send the logs of the process through a bounded queue to a thread that writes them to
+    stdout as JSON, so that no request waits on the write.
+    """
+
+    def __init__(self, level=LOG_LEVEL, queue_size=LOG_QUEUE_SIZE, stream=None):
+        self.level = level
+        self.queue_size = queue_size
+        self.stream = stream
+        self.handler = None
+        self.listener = None
+
+    def open(self):
+        if self.listener is not None:
+            return
+
+        writer = logging.StreamHandler(self.stream or sys.stdout)
+        writer.setFormatter(JsonFormatter())
+        self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=self.queue_size))
+        self.handler.addFilter(RequestContextFilter())
+        self.listener = QueueListener(self.handler.queue, writer)
+        self.listener.start()
+
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+
+    def close(self):
+        # Write the records still in the queue before the process exits
+        if self.listener is None:
+            return
+        logging.getLogger().removeHandler(self.handler)
+        self.listener.stop()
+        self.listener = None
+
+    def get_stats(self) -> dict:
+        if self.handler is None:
+            return {"queued": 0, "dropped": 0}
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+# The log queue shared by the whole process
+log_queue = LogQueue()
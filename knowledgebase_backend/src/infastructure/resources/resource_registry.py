@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+import boto3
+from botocore.config import Config
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+from infastructure.resources.telemetry import telemetry
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+MONG0_URI = (
+    os.getenv("MONG0_URI") or os.getenv("MONGO_URI") or "mongodb://localhost:27017"
+)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)
+)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
+AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+S3_CONNECT_TIMEOUT = int(os.getenv("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = int(os.getenv("S3_READ_TIMEOUT", 60))
+
+
+class ConnectionPoolStats(monitoring.ConnectionPoolListener):
+    """
+    Count the connections checked out of the Mongo pool so that saturation can be observed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkout_failures = 0
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.checkout_failures += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkout_failures": self.checkout_failures,
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+            }
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Record the duration of every Mongo command as the stage mongo.<command>.
+    """
+
+    def __init__(self, telemetry=telemetry):
+        self.telemetry = telemetry
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.telemetry.record(
+            f"mongo.{event.command_name}", event.duration_micros / 1_000_000
+        )
+
+    def failed(self, event):
+        self.telemetry.record(
+            f"mongo.{event.command_name}", event.duration_micros / 1_000_000
+        )
+
+
+def start_s3_call(model, context, **kwargs):
+    context["telemetry_stage"] = f"s3.{model.name}"
+    context["telemetry_started"] = time.perf_counter()
+
+
+def end_s3_call(context, **kwargs):
+    # Also called when the call failed, the retries are part of the call
+    if "telemetry_started" in context:
+        telemetry.record(
+            context["telemetry_stage"],
+            time.perf_counter() - context.pop("telemetry_started"),
+        )
+
+
+class ResourceRegistry:
+    """
+    Hold the clients shared by all the repositories of the process.
+    The clients are opened by the lifespan of the application and created on first use
+    otherwise, so the repositories can be built at import time and still share one pool.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mongo_client = None
+        self.s3_client = None
+        self.mongo_pool_stats = ConnectionPoolStats()
+
+    def get_mongo_client(self) -> AsyncIOMotorClient:
+        with self.lock:
+            if self.mongo_client is None:
+                self.mongo_client = AsyncIOMotorClient(
+                    MONG0_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    event_listeners=self.get_mongo_listeners(),
+                )
+            return self.mongo_client
+
+    def get_mongo_listeners(self):
+        # The commands are only timed when the telemetry records something
+        if telemetry.enabled:
+            return [self.mongo_pool_stats, MongoCommandTimer()]
+        return [self.mongo_pool_stats]
+
+    def get_s3_client(self):
+        with self.lock:
+            if self.s3_client is None:
+                self.s3_client = boto3.client(
+                    "s3",
+                    aws_access_key_id=AWS_ACCESS_KEY,
+                    aws_secret_access_key=AWS_SECRET_KEY,
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        connect_timeout=S3_CONNECT_TIMEOUT,
+                        read_timeout=S3_READ_TIMEOUT,
+                        retries={"max_attempts": 3, "mode": "adaptive"},
+                    ),
+                )
+
+                # Time every call of the client, the managed transfers included
+                if telemetry.enabled:
+                    events = self.s3_client.meta.events
+                    events.register("before-call.s3", start_s3_call)
+                    events.register("after-call.s3", end_s3_call)
+                    events.register("after-call-error.s3", end_s3_call)
+            return self.s3_client
+
+    def open(self):
+        self.get_mongo_client()
+        self.get_s3_client()
+
+    def close(self):
+        with self.lock:
+            if self.mongo_client is not None:
+                self.mongo_client.close()
+                self.mongo_client = None
+            self.s3_client = None
+
+    def get_stats(self) -> dict:
+        return {
+            "mongo": self.mongo_pool_stats.get_stats(),
+            "s3": {"max_pool_connections": S3_MAX_POOL_CONNECTIONS},
+        }
+
+
+# The registry shared by the whole process
+resource_registry = ResourceRegistry()
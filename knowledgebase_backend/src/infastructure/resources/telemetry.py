@@ -0,0 +1,189 @@
+import os
+import time
+import logging
+import contextlib
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "knowledgebase-backend")
+
+# From a Mongo lookup of a millisecond to the ingestion of a large PDF
+STAGE_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+# Entered instead of a span when nothing is recorded
+NO_SPAN = contextlib.nullcontext()
+
+# The stats that only grow, exported as counters, the others are gauges
+COUNTER_STATS = {
+    "hits",
+    "semantic_hits",
+    "misses",
+    "reranked",
+    "timeouts",
+    "overruns",
+    "requests",
+    "batches",
+    "dropped",
+    "checkout_failures",
+}
+
+
+class StatsCollector:
+    """
+    Export the numbers of the get_stats methods of the caches and the workers, read at every
+    scrape. The stats of a source named answer_cache become rag_answer_cache_hits_total,
+    rag_answer_cache_hit_rate and so on, the nested and the other values are left out.
+    """
+
+    def __init__(self):
+        self.sources = {}
+
+    def register(self, name, get_stats):
+        self.sources[name] = get_stats
+
+    def collect(self):
+        for name, get_stats in list(self.sources.items()):
+            try:
+                stats = get_stats() or {}
+            except Exception as e:
+                logger.warning("Error reading the stats of %s: %s", name, e)
+                continue
+
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"rag_{name}_{key}"
+                documentation = f"{key} of the {name}".replace("_", " ")
+                if key in COUNTER_STATS:
+                    yield CounterMetricFamily(metric, documentation, value=value)
+                else:
+                    yield GaugeMetricFamily(metric, documentation, value=value)
+
+
+class Span:
+    """
+    Time one run of a stage, into its histogram and into a trace span when tracing is on.
+    """
+
+    __slots__ = ("telemetry", "stage", "started", "trace_span")
+
+    def __init__(self, telemetry, stage):
+        self.telemetry = telemetry
+        self.stage = stage
+        self.trace_span = None
+
+    def __enter__(self):
+        if self.telemetry.tracer is not None:
+            self.trace_span = self.telemetry.tracer.start_as_current_span(self.stage)
+            self.trace_span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.telemetry.observe(self.stage, time.perf_counter() - self.started)
+        if self.trace_span is not None:
+            self.trace_span.__exit__(exc_type, exc_value, traceback)
+        return False
+
+
+class Telemetry:
+    """
+    Latency of the stages of the pipeline, from the download of a PDF to the answer of the
+    model, as one Prometheus histogram labelled by stage and as OpenTelemetry spans.
+    With both turned off a stage only costs the call that returns NO_SPAN. Every worker
+    process exports its own histograms, Prometheus sums them over the scraped targets.
+    """
+
+    def __init__(
+        self,
+        metrics=METRICS_ENABLED,
+        tracing=TRACING_ENABLED,
+        service_name=TRACING_SERVICE_NAME,
+    ):
+        self.registry = None
+        self.histogram = None
+        self.stats = StatsCollector()
+        self.tracer = None
+        if metrics:
+            self.registry = CollectorRegistry()
+            self.registry.register(self.stats)
+            self.histogram = Histogram(
+                "rag_stage_duration_seconds",
+                "Duration of the stages of the indexing and question pipelines",
+                ["stage"],
+                buckets=STAGE_BUCKETS,
+                registry=self.registry,
+            )
+        if tracing:
+            # Only needed when tracing is enabled, the exporter is set up by the SDK
+            from opentelemetry import trace
+
+            self.tracer = trace.get_tracer(service_name)
+        self.enabled = metrics or tracing
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        if self.histogram is not None:
+            self.histogram.labels(stage).observe(seconds)
+
+    def record(self, stage: str, seconds: float):
+        """
+        Record a stage timed by someone else, like a Mongo command or an S3 call, its trace
+        span ends now.
+        """
+        self.observe(stage, seconds)
+        if self.tracer is not None:
+            ended = time.time_ns()
+            self.tracer.start_span(stage, start_time=ended - int(seconds * 1e9)).end(
+                end_time=ended
+            )
+
+    def register_stats(self, name: str, get_stats):
+        # get_stats is only called when the metrics are scraped
+        self.stats.register(name, get_stats)
+
+    def export(self):
+        # The histograms in the text format of Prometheus, with its content type
+        if self.registry is None:
+            return None, CONTENT_TYPE_LATEST
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+
+# The telemetry shared by the whole process
+telemetry = Telemetry()
@@ -0,0 +1,29 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Access environment variables
+TORCH_THREADS = int(os.getenv("TORCH_THREADS") or os.cpu_count() or 1)
+
+lock = threading.Lock()
+configured = False
+
+
+def import_torch():
+    """
+    Import torch, with the number of CPU threads of the process set once for every model.
+    The local embeddings and the reranker run in the same process and share these threads.
+    """
+    global configured
+
+    # Only needed by the local models, so only imported when one of them is used
+    import torch
+
+    with lock:
+        if not configured:
+            torch.set_num_threads(TORCH_THREADS)
+            configured = True
+    return torch
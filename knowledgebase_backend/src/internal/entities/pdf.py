@@ -1,6 +1,24 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, model_validator
 
-# Both fields should be madnatory.
+# The question is mandatory, it is asked about one file, a list of files, the files with a tag or all the files.
+# Questions sent with the same session id are follow-ups of each other.
 class Pdf(BaseModel):
     question: str
-    filename: str 
\ No newline at end of file
+    filename: Optional[str] = None
+    filenames: Optional[List[str]] = None
+    tag: Optional[str] = None
+    all_files: bool = False
+    session_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_files(self):
+        if not (self.filename or self.filenames or self.tag or self.all_files):
+            raise ValueError("Provide a filename, a list of filenames, a tag or all_files")
+        return self
+
+    def get_filenames(self):
+        # The files asked about by name, None when they are selected by tag or all asked about
+        if self.filename:
+            return [self.filename]
+        return self.filenames or None
\ No newline at end of file
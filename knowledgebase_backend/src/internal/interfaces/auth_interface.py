@@ -4,7 +4,7 @@ from abc import ABC, abstractmethod
 class AuthInterface(ABC):
 
     @abstractmethod
-    def check_password_for_login(self, username: str, password: str):
+    async def check_password_for_login(self, username: str, password: str):
         pass
 
     @abstractmethod
@@ -12,7 +12,7 @@ class AuthInterface(ABC):
         pass
 
     @abstractmethod
-    def save_refresh_token(self, username: str, refresh_token: str):
+    async def save_refresh_token(self, username: str, refresh_token: str):
         pass
 
     @abstractmethod
@@ -7,6 +7,10 @@ class AwsInterface(ABC):
     def upload_pdf(self, user, file_name: str, file_content: bytes):
         pass
 
+    @abstractmethod
+    async def upload_pdf_stream(self, user, file_name: str, file):
+        pass
+
     @abstractmethod
     def get_presigned_pdf_url(self, file_name: str):
         pass
@@ -3,17 +3,47 @@ from abc import ABC, abstractmethod
 
 class DatabaseInterface(ABC):
     @abstractmethod
-    def insert_one(self, data, collection_name: str):
+    async def insert_one(self, data, collection_name: str):
         pass
 
     @abstractmethod
-    def find_all(self, username: str):
+    async def get_pdf_details(self, username: str, pdf_name: str):
         pass
 
     @abstractmethod
-    def delete_one(self, username: str, pdf_name: str):
+    async def find_all(self, username: str):
         pass
-    
+
+    @abstractmethod
+    async def find_pdfs(self, username: str, pdf_names: list = None, tag: str = None):
+        pass
+
+    @abstractmethod
+    async def delete_one(self, username: str, pdf_name: str):
+        pass
+
+    @abstractmethod
+    async def check_if_file_belongs_to_user(self, username: str, pdf_name: str):
+        pass
+
+    @abstractmethod
+    async def update_ingest_status(
+        self, username: str, pdf_name: str, status: str, progress: float, error=None
+    ):
+        pass
+
+    @abstractmethod
+    async def get_ingest_status(self, username: str, pdf_name: str):
+        pass
+
+    @abstractmethod
+    async def get_session(self, username: str, session_id: str):
+        pass
+
+    @abstractmethod
+    async def save_session(self, session: dict):
+        pass
+
     @abstractmethod
-    def check_if_file_belongs_to_user(self, username: str, pdf_name: str):
+    async def delete_session(self, username: str, session_id: str):
         pass
\ No newline at end of file
@@ -0,0 +1,12 @@
+from abc import ABC, abstractmethod
+
+
+class IngestionInterface(ABC):
+
+    @abstractmethod
+    async def enqueue_document(self, username: str, pdf_name: str):
+        pass
+
+    @abstractmethod
+    async def get_ingest_status(self, username: str, pdf_name: str):
+        pass
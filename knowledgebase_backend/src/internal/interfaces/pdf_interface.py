@@ -3,5 +3,21 @@ from abc import ABC, abstractmethod
 class PdfInterface(ABC):
 
     @abstractmethod
-    def generate_response(self, question: str, pdf_path: str):
+    def generate_response(
+        self, question: str, pdf_paths: list, username: str, session: dict = None
+    ):
+        pass
+
+    @abstractmethod
+    def stream_response(
+        self, question: str, pdf_paths: list, username: str, session: dict = None
+    ):
+        pass
+
+    @abstractmethod
+    def index_document(self, username: str, pdf_path: str):
+        pass
+
+    @abstractmethod
+    def delete_index(self, username: str, pdf_path: str):
         pass
\ No newline at end of file
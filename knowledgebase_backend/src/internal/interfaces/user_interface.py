@@ -4,5 +4,5 @@ from abc import ABC, abstractmethod
 class UserInterface(ABC):
 
     @abstractmethod
-    def create_user(self, user_data: dict):
+    async def create_user(self, user_data: dict):
         pass
\ No newline at end of file
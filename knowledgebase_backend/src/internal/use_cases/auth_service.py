@@ -1,7 +1,9 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from infastructure.repositories.auth_repository import AuthRepository
 from internal.interfaces.auth_interface import AuthInterface
-from infastructure.repositories.database_repository import DatabaseRepository
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
 
 
 class AuthenticationService:
@@ -10,14 +12,16 @@ class AuthenticationService:
         return self
 
     def __init__(
-        self, auth_repository=AuthRepository, database_repository=DatabaseRepository
+        self,
+        auth_repository=AuthRepository,
+        database_repository=AsyncDatabaseRepository,
     ):
         self.auth_repository = auth_repository
         self.database_repository = database_repository()
 
-    def check_password_for_login(self, username: str, password: str):
-        result = self.database_repository.find_single_document(
-            "username", username, "users"
+    async def check_password_for_login(self, username: str, password: str):
+        result = await self.database_repository.find_single_document(
+            "username", username, "users", {"password": 1}
         )
 
         if result is not None and result.get("password") == password:
@@ -28,9 +32,15 @@ class AuthenticationService:
     def create_refresh_token(self, username: str):
         return self.auth_repository.create_refresh_token(username)
 
-    def save_refresh_token(self, username: str, refresh_token: str):
-        data = {"sub": username, "refresh_token": refresh_token}
-        return self.database_repository.insert_one(data, "refresh_tokens")
+    async def save_refresh_token(self, username: str, refresh_token: str):
+        data = {
+            "sub": username,
+            "refresh_token": refresh_token,
+            # The TTL index of the collection removes the token once it expires
+            "expires_at": datetime.now(timezone.utc)
+            + self.auth_repository.expires_delta,
+        }
+        return await self.database_repository.insert_one(data, "refresh_tokens")
 
     def create_access_token(self, data: dict):
         return self.auth_repository.create_access_token(data)
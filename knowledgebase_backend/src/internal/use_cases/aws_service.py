@@ -12,5 +12,8 @@ class AwsService:
     def upload_pdf(self, user, file_name: str, file_content: bytes):
         return self.aws_repository.upload_pdf(file_name, file_content)
 
+    async def upload_pdf_stream(self, user, file_name: str, file):
+        return await self.aws_repository.upload_pdf_stream(file_name, file)
+
     def get_presigned_pdf_url(self, file_name: str):
         return self.aws_repository.get_presigned_pdf_url(file_name)
@@ -1,5 +1,26 @@
 from internal.interfaces.database_interface import DatabaseInterface
-from infastructure.repositories.database_repository import DatabaseRepository
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
+
+# Fields of the pdfs collection returned when the files of a user are listed
+PDF_LIST_PROJECTION = {
+    "pdf_name": 1,
+    "tag": 1,
+    "username": 1,
+    "description": 1,
+    "ingest_status": 1,
+}
+
+# Fields of a conversation session stored in the sessions collection
+SESSION_FIELDS = (
+    "pdf_names",
+    "summary",
+    "turns",
+    "recent_documents",
+    "versions",
+    "expires_at",
+)
 
 
 class DatabaseService:
@@ -7,25 +28,98 @@ class DatabaseService:
     def __call__(self) -> DatabaseInterface:
         return self
 
-    def __init__(self, database_repository=DatabaseRepository):
+    def __init__(self, database_repository=AsyncDatabaseRepository):
         self.database_repository = database_repository
 
-    def insert_one(self, username: str, pdf_name: str, tag: str, description: str):
+    async def insert_one(
+        self,
+        username: str,
+        pdf_name: str,
+        tag: str,
+        description: str,
+        content_hash: str = None,
+    ):
         data = {
             "pdf_name": pdf_name,
             "tag": tag,
             "username": username,
             "description": description,
+            "content_hash": content_hash,
         }
-        return self.database_repository.insert_one(data, "pdfs")
 
-    def find_all(self, username: str):
-        return self.database_repository.find_all("username", username, "pdfs")
+        # A file uploaded again under the same name replaces the previous details
+        return await self.database_repository.update_one(
+            {"username": username, "pdf_name": pdf_name}, data, "pdfs", upsert=True
+        )
+
+    async def find_all(self, username: str):
+        return await self.database_repository.find_all(
+            "username", username, "pdfs", PDF_LIST_PROJECTION
+        )
+
+    async def find_pdfs(self, username: str, pdf_names: list = None, tag: str = None):
+        # Files of the user, narrowed down to the given names and tag
+        query = {"username": username}
+        if pdf_names is not None:
+            query["pdf_name"] = {"$in": pdf_names}
+        if tag is not None:
+            query["tag"] = tag
 
-    def delete_one(self, username: str, pdf_name: str):
-        return self.database_repository.delete_one("pdf_name", pdf_name, "pdfs")
+        return await self.database_repository.find_many(
+            query, "pdfs", {"_id": 0, "pdf_name": 1, "ingest_status": 1}
+        )
+
+    async def delete_one(self, username: str, pdf_name: str):
+        return await self.database_repository.delete_one(
+            {"username": username, "pdf_name": pdf_name}, "pdfs"
+        )
 
-    def check_if_file_belongs_to_user(self, username: str, pdf_name: str):
-        return self.database_repository.check_if_file_belongs_to_user(
+    async def get_pdf_details(self, username: str, pdf_name: str):
+        return await self.database_repository.find_one(
+            {"username": username, "pdf_name": pdf_name},
+            "pdfs",
+            {"content_hash": 1, "ingest_status": 1},
+        )
+
+    async def check_if_file_belongs_to_user(self, username: str, pdf_name: str):
+        return await self.database_repository.check_if_file_belongs_to_user(
             username, pdf_name
         )
+
+    async def update_ingest_status(
+        self, username: str, pdf_name: str, status: str, progress: float, error=None
+    ):
+        data = {
+            "ingest_status": status,
+            "ingest_progress": progress,
+            "ingest_error": error,
+        }
+        return await self.database_repository.update_one(
+            {"username": username, "pdf_name": pdf_name}, data, "pdfs"
+        )
+
+    async def get_ingest_status(self, username: str, pdf_name: str):
+        return await self.database_repository.find_one(
+            {"username": username, "pdf_name": pdf_name},
+            "pdfs",
+            {"ingest_status": 1, "ingest_progress": 1, "ingest_error": 1},
+        )
+
+    async def get_session(self, username: str, session_id: str):
+        return await self.database_repository.find_one(
+            {"username": username, "session_id": session_id}, "sessions"
+        )
+
+    async def save_session(self, session: dict):
+        data = {field: session[field] for field in SESSION_FIELDS}
+        return await self.database_repository.update_one(
+            {"username": session["username"], "session_id": session["session_id"]},
+            data,
+            "sessions",
+            upsert=True,
+        )
+
+    async def delete_session(self, username: str, session_id: str):
+        return await self.database_repository.delete_one(
+            {"username": username, "session_id": session_id}, "sessions"
+        )
@@ -0,0 +1,45 @@
+import asyncio
+from internal.interfaces.ingestion_interface import IngestionInterface
+from infastructure.repositories.ingestion_repository import IngestionRepository
+from internal.use_cases.database_service import DatabaseService
+
+
+class IngestionService:
+
+    def __call__(self) -> IngestionInterface:
+        return self
+
+    def __init__(
+        self, ingestion_repository=IngestionRepository, database_service=DatabaseService
+    ):
+        self.ingestion_repository = ingestion_repository
+        self.database_service = database_service
+
+    async def enqueue_document(self, username: str, pdf_name: str):
+        loop = asyncio.get_running_loop()
+
+        # Persist the job state in the pdfs collection so every worker can report it.
+        # The workers are threads, so the update is handed over to the event loop.
+        def on_progress(status: str, progress: float, error=None):
+            update = self.database_service.update_ingest_status(
+                username, pdf_name, status, progress, error
+            )
+            asyncio.run_coroutine_threadsafe(update, loop).result()
+
+        await self.database_service.update_ingest_status(
+            username, pdf_name, "queued", 0.0
+        )
+        return self.ingestion_repository.enqueue(username, pdf_name, on_progress)
+
+    async def get_ingest_status(self, username: str, pdf_name: str):
+        pdf_data = await self.database_service.get_ingest_status(username, pdf_name)
+
+        if pdf_data is None:
+            return None
+
+        return {
+            "pdf_name": pdf_name,
+            "status": pdf_data.get("ingest_status"),
+            "progress": pdf_data.get("ingest_progress"),
+            "error": pdf_data.get("ingest_error"),
+        }
@@ -10,5 +10,22 @@ class PdfService:
     def __init__(self, pdf_repository=PdfChatRepository):
         self.pdf_repository = pdf_repository
 
-    def generate_response(self, question: str, pdf_path):
-        return self.pdf_repository.generate_response(question, pdf_path)
+    def generate_response(
+        self, question: str, pdf_paths: list, username: str, session: dict = None
+    ):
+        return self.pdf_repository.generate_response(
+            question, pdf_paths, username, session
+        )
+
+    def stream_response(
+        self, question: str, pdf_paths: list, username: str, session: dict = None
+    ):
+        return self.pdf_repository.stream_response(
+            question, pdf_paths, username, session
+        )
+
+    def index_document(self, username: str, pdf_path: str):
+        return self.pdf_repository.index_document(username, pdf_path)
+
+    def delete_index(self, username: str, pdf_path: str):
+        return self.pdf_repository.delete_index(username, pdf_path)
@@ -1,13 +1,15 @@
 from internal.interfaces.user_interface import UserInterface
-from infastructure.repositories.database_repository import DatabaseRepository
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
 
 
 class UserService:
     def __call__(self) -> UserInterface:
         return self
 
-    def __init__(self, database_repository=DatabaseRepository):
+    def __init__(self, database_repository=AsyncDatabaseRepository):
         self.database_repository = database_repository()
 
-    def create_user(self, user_data: dict):
-        return self.database_repository.insert_one(user_data, "users")
+    async def create_user(self, user_data: dict):
+        return await self.database_repository.insert_one(user_data, "users")
@@ -1,13 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from application.web.controllers import user_controller
 from application.web.controllers import pdf_controller
 from application.web.controllers import pdf_chat_controller
-from infastructure.middleware.logging_middleware import log_middleware
+from infastructure.middleware.logging_middleware import LoggingMiddleware
+from infastructure.resources.log_queue import log_queue
+from infastructure.resources.resource_registry import resource_registry
+from infastructure.resources.telemetry import telemetry
+from infastructure.repositories.async_database_repository import (
+    AsyncDatabaseRepository,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Write the logs from a background thread instead of the requests
+    log_queue.open()
+
+    # Create the shared Mongo and S3 clients once for the whole process
+    resource_registry.open()
+
+    # Make sure the collections have the indexes the routes rely on
+    await AsyncDatabaseRepository().ensure_indexes()
+    yield
+
+    # Stop the background workers and close the shared clients
+    pdf_controller.ingestion_repository.shutdown()
+    pdf_chat_controller.pdf_repository.shutdown()
+    resource_registry.close()
+    log_queue.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# The counters of the caches and the background workers, exported on /metrics
+pdf_repository = pdf_chat_controller.pdf_repository
+telemetry.register_stats("embedding_cache", pdf_repository.get_embedding_cache_stats)
+telemetry.register_stats("pdf_cache", pdf_repository.get_pdf_cache_stats)
+telemetry.register_stats("answer_cache", pdf_repository.get_answer_cache_stats)
+telemetry.register_stats("llm_batcher", pdf_repository.get_llm_stats)
+telemetry.register_stats("reranker", pdf_repository.get_reranker_stats)
+telemetry.register_stats("log_queue", log_queue.get_stats)
+telemetry.register_stats("mongo_pool", lambda: resource_registry.get_stats()["mongo"])
 
 origins = [
     "*",
@@ -29,10 +65,25 @@ app.include_router(pdf_controller.aws_router, prefix="/aws", tags=["aws"])
 app.include_router(pdf_chat_controller.pdf_router, prefix="/pdf", tags=["pdf"])
 
 # Include the middleware.
-app.add_middleware(BaseHTTPMiddleware, dispatch=log_middleware)
+app.add_middleware(LoggingMiddleware)
 
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return JSONResponse(status_code=200, content={"status": "healthy"})
+
+
+# Connection pool usage of the shared clients
+@app.get("/health/pools")
+async def pool_stats():
+    return JSONResponse(status_code=200, content=resource_registry.get_stats())
+
+
+# Latency histograms of the pipeline stages, in the text format of Prometheus
+@app.get("/metrics")
+async def metrics():
+    content, content_type = telemetry.export()
+    if content is None:
+        return JSONResponse(status_code=404, content={"detail": "Metrics are disabled"})
+    return Response(content=content, media_type=content_type)
@@ -0,0 +1,101 @@
+import os
+import sys
+import threading
+import numpy as np
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.vector_store_repository import (
+    VectorStoreRepository,
+    VectorIndex,
+    normalize,
+)
+from infastructure.repositories.ann_index_repository import IvfIndex
+
+
+def build_segments(tmp_path, count, size=500, dimensions=16):
+    generator = np.random.default_rng(0)
+    vector_store = VectorStoreRepository()
+    segments = {}
+    for segment in range(count):
+        path = str(tmp_path / f"segment-{segment}")
+        documents = [
+            Document(page_content=f"{segment}:{position}", metadata={})
+            for position in range(size)
+        ]
+        VectorIndex.write(path, documents, generator.normal(size=(size, dimensions)))
+        segments[path] = vector_store.load(path)
+    return vector_store, segments
+
+
+def search(vector_store, ivf_index, segments, query, k=5):
+    candidates = ivf_index.search(segments, query, k * vector_store.rerank_factor, 10**6)
+    return [document.page_content for document in vector_store.rerank(candidates, query, k)]
+
+
+def test_probing_every_list_matches_the_exact_search(tmp_path):
+    vector_store, segments = build_segments(tmp_path, 3)
+    ivf_index = IvfIndex.train(list(segments.values()))
+    for path, index in segments.items():
+        ivf_index.insert(path, index)
+    query = normalize(np.random.default_rng(1).normal(size=16))
+
+    exact = vector_store.search(list(segments), query, 5)
+
+    assert search(vector_store, ivf_index, segments, query) == [
+        document.page_content for document in exact
+    ]
+
+
+def test_deleted_segments_are_tombstoned_then_compacted(tmp_path):
+    vector_store, segments = build_segments(tmp_path, 3)
+    paths = list(segments)
+    ivf_index = IvfIndex.train(list(segments.values()))
+    for path, index in segments.items():
+        ivf_index.insert(path, index)
+
+    ivf_index.delete(paths[0])
+    query = segments[paths[0]].vectors[7]
+
+    assert ivf_index.get_deleted_size() == 500
+    assert ivf_index.needs_compaction()
+    assert "0:7" not in search(vector_store, ivf_index, segments, query)
+
+    ivf_index.compact()
+
+    assert ivf_index.get_deleted_size() == 0
+    assert ivf_index.get_live_size() == 1000
+    assert sum(len(codes) for parts in ivf_index.lists for codes in parts) == 1000
+    query = segments[paths[1]].vectors[3]
+    assert search(vector_store, ivf_index, segments, query)[0] == "1:3"
+
+
+def test_searches_run_alongside_inserts_deletes_and_compactions(tmp_path):
+    vector_store, segments = build_segments(tmp_path, 4, size=200)
+    paths = list(segments)
+    ivf_index = IvfIndex.train(list(segments.values()))
+    for path, index in segments.items():
+        ivf_index.insert(path, index)
+    query = segments[paths[0]].vectors[3]
+    stop = threading.Event()
+
+    def replace_segments():
+        # The writer keeps deleting, compacting and inserting the other segments back
+        while not stop.is_set():
+            for path in paths[1:]:
+                ivf_index.delete(path)
+            ivf_index.compact()
+            for path in paths[1:]:
+                ivf_index.insert(path, segments[path])
+
+    # Switch threads often, so that the writer runs in the middle of the searches
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=replace_segments)
+    writer.start()
+    try:
+        for _ in range(300):
+            assert search(vector_store, ivf_index, segments, query)[0] == "0:3"
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(switch_interval)
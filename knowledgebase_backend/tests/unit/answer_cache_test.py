@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.answer_cache_repository import AnswerCacheRepository
+
+
+def document_key(version, pdf_name="manual.pdf"):
+    return ("alice", ((pdf_name, version),))
+
+
+class Embedder:
+    # Returns the given embedding and counts its calls
+    def __init__(self, embedding):
+        self.embedding = embedding
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.embedding
+
+
+def test_normalized_questions_hit_the_same_answer():
+    cache = AnswerCacheRepository()
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"})
+
+    entry, embedding = cache.get(document_key("v1"), "  what is the   WARRANTY ")
+    assert entry["answer"] == "Two years"
+    assert embedding is None
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_answers_expire_after_their_time_to_live():
+    cache = AnswerCacheRepository(ttl_seconds=-1)
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"})
+
+    assert cache.get(document_key("v1"), "What is the warranty?") == (None, None)
+    assert cache.get_stats()["size"] == 0
+
+
+def test_a_new_version_of_a_document_does_not_reuse_its_answers():
+    cache = AnswerCacheRepository()
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"})
+    cache.put(document_key("v1", "other.pdf"), "What is the warranty?", {"answer": "One year"})
+
+    assert cache.get(document_key("v2"), "What is the warranty?") == (None, None)
+
+    # Invalidating the document drops the answers of its versions only
+    cache.invalidate("alice", "manual.pdf")
+    assert cache.get(document_key("v1"), "What is the warranty?") == (None, None)
+    assert cache.get(document_key("v1", "other.pdf"), "What is the warranty?")[0]["answer"] == "One year"
+
+
+def test_the_question_is_only_embedded_when_the_exact_lookup_misses():
+    cache = AnswerCacheRepository(semantic=True)
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"}, [1.0, 0.0])
+    embed = Embedder([1.0, 0.0])
+
+    cache.get(document_key("v1"), "What is the warranty?", embed)
+    assert embed.calls == 0
+
+    entry, embedding = cache.get(document_key("v1"), "How long is the warranty?", embed)
+    assert entry["answer"] == "Two years"
+    assert embedding == [1.0, 0.0]
+    assert embed.calls == 1
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+def test_distant_questions_miss_the_semantic_tier():
+    cache = AnswerCacheRepository(semantic=True, similarity_threshold=0.9)
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"}, [1.0, 0.0])
+
+    entry, embedding = cache.get(document_key("v1"), "Who makes it?", Embedder([0.0, 1.0]))
+    assert entry is None
+    assert embedding == [0.0, 1.0]
+
+
+def test_an_expired_close_question_does_not_hide_a_live_one():
+    cache = AnswerCacheRepository(semantic=True, similarity_threshold=0.5)
+    cache.put(document_key("v1"), "What is the warranty?", {"answer": "Two years"}, [1.0, 0.0])
+    cache.put(document_key("v1"), "Warranty length?", {"answer": "24 months"}, [0.8, 0.6])
+
+    # The closest question has expired, the live one is still close enough
+    cache.entries[(document_key("v1"), "what is the warranty")]["created_at"] -= cache.ttl_seconds + 1
+    entry, _ = cache.get(document_key("v1"), "How long is the warranty?", Embedder([1.0, 0.0]))
+    assert entry["answer"] == "24 months"
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+import boto3
+from moto import mock_aws
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.aws_repository import AWSRepository
+
+BUCKET_NAME = "knowledgebase-test"
+
+
+class LocalResources:
+    # Hand the repository a client of the local S3 stand-in
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+
+    def get_s3_client(self):
+        return self.s3_client
+
+
+class LocalUploadFile:
+    # Same read interface as the UploadFile of FastAPI
+    def __init__(self, content):
+        self.buffer = io.BytesIO(content)
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        return self.buffer.read(size)
+
+
+class FailingS3Client:
+    # Local S3 client whose parts fail, and its aborts too when asked to
+    def __init__(self, s3_client, fail_abort=False):
+        self.s3_client = s3_client
+        self.fail_abort = fail_abort
+
+    def upload_part(self, **kwargs):
+        raise ConnectionError("Connection reset by peer")
+
+    def abort_multipart_upload(self, **kwargs):
+        if self.fail_abort:
+            raise ConnectionError("Connection reset by peer")
+        return self.s3_client.abort_multipart_upload(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.s3_client, name)
+
+
+def upload(file_name, content):
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=BUCKET_NAME)
+
+    aws_repository = AWSRepository(LocalResources(s3_client))
+    aws_repository.aws_bucket_name = BUCKET_NAME
+    aws_repository.part_size = 5 * 1024 * 1024
+    aws_repository.max_concurrent_parts = 2
+
+    content_hash = asyncio.run(
+        aws_repository.upload_pdf_stream(file_name, LocalUploadFile(content))
+    )
+    stored = s3_client.get_object(Bucket=BUCKET_NAME, Key=file_name)["Body"].read()
+    return content_hash, stored
+
+
+@mock_aws
+def test_small_file_is_uploaded_in_one_request():
+    content = b"%PDF-1.4 small file"
+    content_hash, stored = upload("small.pdf", content)
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert stored == content
+
+
+@mock_aws
+def test_large_file_is_uploaded_in_parts():
+    content = os.urandom(12 * 1024 * 1024)
+    content_hash, stored = upload("large.pdf", content)
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert stored == content
+
+
+def upload_with_failing_parts(fail_abort):
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=BUCKET_NAME)
+
+    aws_repository = AWSRepository(
+        LocalResources(FailingS3Client(s3_client, fail_abort))
+    )
+    aws_repository.aws_bucket_name = BUCKET_NAME
+    aws_repository.part_size = 1024
+    aws_repository.max_concurrent_parts = 2
+
+    file = LocalUploadFile(os.urandom(64 * 1024))
+    content_hash = asyncio.run(aws_repository.upload_pdf_stream("failed.pdf", file))
+    return content_hash, file, s3_client
+
+
+@mock_aws
+def test_failed_part_stops_the_upload_and_aborts_it():
+    content_hash, file, s3_client = upload_with_failing_parts(fail_abort=False)
+
+    # The rest of the file is not read once a part failed
+    assert content_hash is None
+    assert file.reads < 8
+    assert not s3_client.list_multipart_uploads(Bucket=BUCKET_NAME).get("Uploads")
+
+
+@mock_aws
+def test_failed_abort_does_not_hide_the_failed_upload():
+    content_hash, file, _ = upload_with_failing_parts(fail_abort=True)
+
+    assert content_hash is None
+    assert file.reads < 8
@@ -0,0 +1,44 @@
+import os
+import sys
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.context_packer_repository import ContextPacker
+
+
+class WordCounter:
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, tokens):
+        return " ".join(text.split()[:tokens])
+
+
+def chunk(text, page, start_index):
+    return Document(
+        page_content=text,
+        metadata={"pdf_name": "a.pdf", "page": page, "start_index": start_index},
+    )
+
+
+def test_overlapping_chunks_of_a_page_are_merged_once():
+    page = "one two three four five six seven eight nine ten eleven twelve thirteen"
+    first = chunk(page[:40], 0, 0)
+    second = chunk(page[25:], 0, 25)
+    packer = ContextPacker(budget=100, token_counter=WordCounter())
+
+    passages = packer.pack([second, first, second])
+
+    assert [passage.page_content for passage in passages] == [page]
+
+
+def test_passages_are_packed_best_first_into_the_budget():
+    best = chunk("alpha " * 30, 0, 0)
+    second = chunk("beta " * 30, 1, 0)
+    third = chunk("gamma " * 30, 2, 0)
+    packer = ContextPacker(budget=45, min_passage_tokens=10, token_counter=WordCounter())
+
+    passages = packer.pack([best, second, third])
+
+    assert len(passages) == 2
+    assert passages[0].page_content == best.page_content
+    assert passages[1].page_content == " ".join(["beta"] * 15)
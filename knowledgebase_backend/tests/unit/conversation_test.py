@@ -0,0 +1,63 @@
+import os
+import sys
+from langchain_core.documents import Document
+from langchain_core.language_models.fake import FakeListLLM
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.conversation_repository import ConversationRepository
+
+VERSIONS = [["manual.pdf", "1"]]
+
+
+class WordCounter:
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, tokens):
+        return " ".join(text.split()[:tokens])
+
+
+def ask(conversations, session, number, llm):
+    document = Document(page_content=f"chunk {number}", metadata={"pdf_name": "manual.pdf"})
+    conversations.add_turn(
+        session, f"question {number}", f"answer {number}", [document], VERSIONS, llm
+    )
+
+
+def test_old_turns_are_folded_into_the_summary():
+    conversations = ConversationRepository(window_turns=2, token_counter=WordCounter())
+    session = conversations.start(None, "alice", "s1", ["manual.pdf"])
+    llm = FakeListLLM(responses=["summary of the first turn"])
+
+    for number in range(3):
+        ask(conversations, session, number, llm)
+
+    assert [turn["question"] for turn in session["turns"]] == ["question 1", "question 2"]
+    assert session["summary"] == "summary of the first turn"
+    assert conversations.get_history(session).startswith("Summary: summary of the first turn")
+    assert conversations.get_search_question(session, "and then?") == "question 2 and then?"
+
+
+def test_history_stays_within_the_token_budget():
+    conversations = ConversationRepository(
+        window_turns=10, history_tokens=12, token_counter=WordCounter()
+    )
+    session = conversations.start(None, "alice", "s1", ["manual.pdf"])
+    for number in range(5):
+        ask(conversations, session, number, None)
+
+    # Every turn is six words, so only the last two fit
+    history = conversations.get_history(session)
+    assert "question 4" in history and "question 3" in history
+    assert "question 2" not in history
+
+
+def test_recent_documents_are_only_reused_for_the_same_versions():
+    conversations = ConversationRepository(token_counter=WordCounter())
+    session = conversations.start(None, "alice", "s1", ["manual.pdf"])
+    ask(conversations, session, 0, None)
+
+    assert [d.page_content for d in conversations.get_recent_documents(session, VERSIONS)] == [
+        "chunk 0"
+    ]
+    assert conversations.get_recent_documents(session, [["manual.pdf", "2"]]) == []
+    assert conversations.start(session, "alice", "s1", ["other.pdf"])["turns"] == []
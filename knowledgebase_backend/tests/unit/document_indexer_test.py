@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import threading
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.pdf_chat_repository import DocumentIndexer
+from infastructure.repositories.ingestion_repository import IngestionRepository
+
+
+def build_chunks(text):
+    return [Document(page_content=f"{text} {number}", metadata={"page": 0}) for number in range(3)]
+
+
+def test_concurrent_writers_of_a_document_leave_one_complete_version(tmp_path):
+    indexer = DocumentIndexer(api_key=None, index_directory=str(tmp_path))
+    write = indexer.vector_store.write
+
+    # The version is written slowly enough for the other writer to switch and clean up
+    def slow_write(path, texts, vectors):
+        write(path, texts, vectors)
+        time.sleep(0.05)
+
+    indexer.vector_store.write = slow_write
+    errors = []
+
+    def upload(text):
+        try:
+            vectors = [[1.0, 0.0, float(number)] for number in range(3)]
+            indexer.write_index("alice", "manual.pdf", build_chunks(text), vectors)
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=upload, args=(text,)) for text in ("old", "new")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert errors == []
+    assert indexer.index_exists("alice", "manual.pdf")
+    assert os.listdir(indexer.get_versions_path("alice", "manual.pdf")) == [
+        indexer.get_index_version("alice", "manual.pdf")
+    ]
+
+
+class SlowIngestion(IngestionRepository):
+    # Records the jobs it runs, the first one only ends once released
+    def __init__(self):
+        super().__init__(pdf_repository=None)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.runs = []
+
+    def run_job(self, job_id, username, pdf_name, on_progress):
+        self.runs.append(job_id)
+        self.started.set()
+        self.release.wait(5)
+
+
+def test_uploads_of_a_document_being_ingested_are_coalesced():
+    ingestion = SlowIngestion()
+    job_id = ingestion.enqueue("alice", "manual.pdf", None)
+    ingestion.started.wait(5)
+
+    # Both uploads during the job end up in one more run of the same job
+    assert ingestion.enqueue("alice", "manual.pdf", None) == job_id
+    assert ingestion.enqueue("alice", "manual.pdf", None) == job_id
+    other_job_id = ingestion.enqueue("alice", "other.pdf", None)
+    ingestion.release.set()
+    ingestion.io_pool.shutdown(wait=True)
+
+    assert sorted(ingestion.runs) == sorted([job_id, job_id, other_job_id])
+    assert ingestion.jobs == {}
+
+
+def test_a_job_whose_failure_is_not_recorded_leaves_the_queue():
+    # Without a repository the job fails, and recording the failure fails too
+    ingestion = IngestionRepository(pdf_repository=None)
+    reports = []
+
+    def on_progress(status, progress, error=None):
+        reports.append(status)
+        raise ConnectionError("Mongo is unreachable")
+
+    ingestion.enqueue("alice", "manual.pdf", on_progress)
+    ingestion.io_pool.shutdown(wait=True)
+
+    assert reports == ["failed"]
+    assert ingestion.jobs == {}
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+from langchain_core.embeddings import Embeddings
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.embedding_cache_repository import EmbeddingCacheRepository, CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    # Embeds a text as its length and records every text it is sent
+    model = "counting"
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.5]
+
+
+def test_vectors_are_found_again_after_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCacheRepository(path=path)
+    cache.put_many({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+
+    cache = EmbeddingCacheRepository(path=path)
+    assert cache.get_many(["a", "b", "c"]) == {"a": [1.0, 2.0], "b": [3.0, 4.0]}
+    assert cache.get_stats() == {"hits": 2, "misses": 1, "size": 2}
+
+
+def test_lookups_do_not_write(tmp_path):
+    cache = EmbeddingCacheRepository(path=str(tmp_path / "cache.sqlite3"))
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    changes = cache.connection.total_changes
+
+    for _ in range(10):
+        cache.get_many(["a", "b"])
+
+    assert cache.connection.total_changes == changes
+
+
+def test_pending_uses_are_written_once_the_batch_is_full(tmp_path):
+    cache = EmbeddingCacheRepository(path=str(tmp_path / "cache.sqlite3"), touch_batch=2)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    changes = cache.connection.total_changes
+
+    cache.get_many(["a"])
+    assert cache.connection.total_changes == changes
+    cache.get_many(["b"])
+    assert cache.connection.total_changes == changes + 2
+    assert cache.touched == {}
+
+
+def test_the_least_recently_used_vectors_are_evicted(tmp_path):
+    cache = EmbeddingCacheRepository(path=str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put_many({key: [1.0]})
+        time.sleep(0.01)
+
+    # Reading a makes b the least recently used vector
+    cache.get_many(["a"])
+    time.sleep(0.01)
+    cache.put_many({"d": [1.0]})
+
+    assert sorted(cache.get_many(["a", "b", "c", "d"])) == ["a", "c", "d"]
+    assert cache.get_stats()["size"] == 3
+
+
+def test_storing_a_known_vector_again_does_not_grow_the_count(tmp_path):
+    cache = EmbeddingCacheRepository(path=str(tmp_path / "cache.sqlite3"))
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.put_many({"a": [1.0], "c": [3.0]})
+
+    assert cache.get_stats()["size"] == 3
+
+
+def test_only_distinct_missing_chunks_are_embedded(tmp_path):
+    cache = EmbeddingCacheRepository(path=str(tmp_path / "cache.sqlite3"))
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, cache)
+
+    assert embeddings.embed_documents(["one", "three", "one"]) == [[3.0, 0.5], [5.0, 0.5], [3.0, 0.5]]
+    assert embeddings.embed_documents(["three", "four"]) == [[5.0, 0.5], [4.0, 0.5]]
+    assert model.texts == ["one", "three", "four"]
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.embedding_dispatcher_repository import (
+    EmbeddingDispatcher,
+    RateLimiter,
+)
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """
+    Embeddings endpoint that answers every third request with a 429 and records the
+    concurrency and the batch sizes it sees. The embedding of a text is its length.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.batch_sizes = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        with server.lock:
+            server.requests += 1
+            rate_limited = server.requests % 3 == 0
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        time.sleep(0.02)
+        with server.lock:
+            server.in_flight -= 1
+
+        if rate_limited:
+            self.send_json(429, {"error": {"message": "Rate limit reached"}})
+            return
+
+        with server.lock:
+            server.batch_sizes.append(len(body["input"]))
+        data = [
+            {"object": "embedding", "index": index, "embedding": [float(len(text))]}
+            for index, text in enumerate(body["input"])
+        ]
+        self.send_json(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def send_json(self, status, payload):
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_chunks_are_embedded_in_order_within_the_limits():
+    server = FakeEmbeddingServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        dispatcher = EmbeddingDispatcher(
+            api_key="test",
+            base_url=server.base_url,
+            batch_size=4,
+            max_concurrency=2,
+            backoff_seconds=0.01,
+        )
+        texts = ["word " * length for length in range(1, 51)]
+
+        vectors = dispatcher.embed_documents(texts)
+
+        assert vectors == [[float(len(text))] for text in texts]
+        assert server.max_in_flight <= 2
+        assert max(server.batch_sizes) <= 4
+        assert dispatcher.retries > 0
+    finally:
+        server.shutdown()
+
+
+def test_batches_are_bounded_by_tokens():
+    dispatcher = EmbeddingDispatcher(api_key="test", batch_tokens=10, batch_size=100)
+    texts = ["one two three four"] * 10
+
+    batches = dispatcher.get_batches(texts)
+
+    assert sum(len(batch) for _, batch, _ in batches) == len(texts)
+    assert all(tokens <= 10 for _, _, tokens in batches)
+
+
+def test_rate_limiter_waits_for_the_token_budget():
+    async def acquire_twice():
+        # 600 tokens per minute refill at 10 tokens per second
+        rate_limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=600)
+        await rate_limiter.acquire(600)
+        started = time.monotonic()
+        await rate_limiter.acquire(5)
+        return time.monotonic() - started
+
+    assert asyncio.run(acquire_twice()) >= 0.4
+
+
+def test_questions_do_not_wait_behind_the_batches_of_an_upload():
+    async def acquire_during_upload():
+        # 10% of the 6000 tokens per minute are left to the questions
+        rate_limiter = RateLimiter(
+            requests_per_minute=6000, tokens_per_minute=6000, reserved_share=0.1
+        )
+        await rate_limiter.acquire(5400)
+
+        # The next batch of the upload waits for the bucket to refill past the reserve
+        batch = asyncio.create_task(rate_limiter.acquire(1000))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        await rate_limiter.acquire(100, priority=True)
+        waited = time.monotonic() - started
+
+        finished = batch.done()
+        batch.cancel()
+        return waited, finished
+
+    waited, finished = asyncio.run(acquire_during_upload())
+    assert waited < 0.05
+    assert not finished
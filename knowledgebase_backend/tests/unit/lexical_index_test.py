@@ -0,0 +1,125 @@
+import os
+import sys
+import numpy as np
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.lexical_index_repository import (
+    LexicalIndexRepository,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from infastructure.repositories.vector_store_repository import VectorStoreRepository
+
+CHUNKS = [
+    "Seal kit PN-40217 fits the pump of the hydraulic circuit.",
+    "Seal kit PN-40218 fits the valve of the cooling loop.",
+    "The pump is checked every 500 hours, see part 40217 of the manual.",
+    "Fault code E_404 is raised when the pump leaks.",
+    "Replace the filter of the fuel line every 1000 hours.",
+    "The relay of the control unit is replaced when it overheats.",
+]
+
+
+def build_documents(texts, pdf_name):
+    return [
+        Document(page_content=text, metadata={"pdf_name": pdf_name, "page": position})
+        for position, text in enumerate(texts)
+    ]
+
+
+def build_repository():
+    return LexicalIndexRepository(VectorStoreRepository())
+
+
+def write(repository, path, documents):
+    # The texts of the chunks are read from the vector index of the same version
+    repository.vector_store.write(path, documents, np.ones((len(documents), 4)))
+    repository.write(path, documents)
+
+
+def test_identifiers_are_indexed_whole_and_by_their_parts():
+    assert tokenize("Replace PN-40217, code E_404 (v2.1)") == [
+        "replace",
+        "pn-40217",
+        "pn",
+        "40217",
+        "code",
+        "e_404",
+        "e",
+        "404",
+        "v2.1",
+        "v2",
+        "1",
+    ]
+
+
+def test_an_exact_identifier_ranks_its_chunk_first(tmp_path):
+    repository = build_repository()
+    path = str(tmp_path / "manual")
+    write(repository, path, build_documents(CHUNKS, "manual.pdf"))
+
+    documents = repository.search([path], "Which pump uses PN-40217?", 3)
+    assert documents[0].page_content == CHUNKS[0]
+
+    documents = repository.search([path], "what does E_404 mean", 3)
+    assert documents[0].page_content == CHUNKS[3]
+
+
+def test_scores_over_several_indexes_match_one_index(tmp_path):
+    # The same chunks in one index or split over two documents rank the same
+    repository = build_repository()
+    whole = str(tmp_path / "whole")
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    write(repository, whole, build_documents(CHUNKS, "manual.pdf"))
+    write(repository, first, build_documents(CHUNKS[:3], "manual.pdf"))
+    write(repository, second, build_documents(CHUNKS[3:], "manual.pdf"))
+
+    for query in ("pump seal 40217", "replace the relay every hours", "E_404 leaks"):
+        expected = [document.page_content for document in repository.search([whole], query, 4)]
+        found = [
+            document.page_content
+            for document in repository.search([first, second], query, 4)
+        ]
+        assert found == expected
+
+
+def test_indexes_are_reloaded_from_disk(tmp_path):
+    path = str(tmp_path / "manual")
+    write(build_repository(), path, build_documents(CHUNKS, "manual.pdf"))
+
+    documents = build_repository().search([path], "PN-40218", 1)
+    assert documents[0].page_content == CHUNKS[1]
+    assert documents[0].metadata == {"pdf_name": "manual.pdf", "page": 1}
+
+    # Only the postings are stored, the texts stay in the chunk store of the vector index
+    stored = os.listdir(os.path.join(path, "lexical"))
+    assert sorted(stored) == [
+        "chunk_ids.npy",
+        "chunk_lengths.npy",
+        "offsets.npy",
+        "term_frequencies.npy",
+        "terms.json",
+    ]
+
+
+def test_rank_fusion_favours_chunks_found_by_both_rankings():
+    a, b, c, d = build_documents(["a", "b", "c", "d"], "manual.pdf")
+
+    # b is second in both rankings, a and c are first in only one
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], 3)
+    assert [document.page_content for document in fused] == ["b", "a", "c"]
+
+    # Ties keep the order the chunks were first seen in, the same chunk is returned once
+    fused = reciprocal_rank_fusion([[a, b, c], [b, a, d]], 10)
+    assert [document.page_content for document in fused] == ["a", "b", "c", "d"]
+
+
+def test_rank_fusion_tells_apart_the_same_text_of_two_files():
+    (first,) = build_documents(["Replace the seal."], "first.pdf")
+    (second,) = build_documents(["Replace the seal."], "second.pdf")
+
+    fused = reciprocal_rank_fusion([[first], [second]], 2)
+    assert [document.metadata["pdf_name"] for document in fused] == [
+        "first.pdf",
+        "second.pdf",
+    ]
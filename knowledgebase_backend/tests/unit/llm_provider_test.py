@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.llm_provider_repository import (
+    CompletionLLM,
+    FakeCompletionLLM,
+    OpenAICompletionLLM,
+)
+
+
+class FakeCompletionServer(ThreadingHTTPServer):
+    """
+    Completions endpoint that answers every prompt with its upper case, the choices in the
+    reverse order, and records the prompts of every request and the client ports.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeCompletionHandler)
+        self.lock = threading.Lock()
+        self.batches = []
+        self.ports = set()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeCompletionHandler(BaseHTTPRequestHandler):
+    # Keep the connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.batches.append(body["prompt"])
+            self.server.ports.add(self.client_address[1])
+
+        choices = [
+            {"index": index, "text": prompt.upper(), "finish_reason": "stop", "logprobs": None}
+            for index, prompt in enumerate(body["prompt"])
+        ]
+        content = json.dumps(
+            {
+                "id": "cmpl",
+                "object": "text_completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": choices[::-1],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_concurrent_questions_are_sent_as_one_batch_on_one_connection():
+    server = FakeCompletionServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        llm = OpenAICompletionLLM(
+            "key", base_url=server.base_url, batch_window_ms=200, max_batch_size=4
+        )
+        prompts = [f"prompt {number}" for number in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            answers = list(pool.map(llm.invoke, prompts))
+
+        assert answers == [prompt.upper() for prompt in prompts]
+        assert sorted(server.batches[0]) == prompts
+
+        llm.invoke("prompt 4")
+        assert len(server.batches) == 2
+        assert len(server.ports) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fake_model_streams_the_answer_it_completes():
+    llm = FakeCompletionLLM(latency_seconds=0, token_seconds=0)
+
+    assert "".join(llm.stream("a prompt")) == llm.invoke("a prompt")
+    assert llm.invoke("a prompt") != llm.invoke("another prompt")
+
+
+def test_models_must_implement_completion_and_streaming():
+    class BatchOnlyLLM(CompletionLLM):
+        def complete_batch(self, prompts):
+            return prompts
+
+    with pytest.raises(TypeError):
+        BatchOnlyLLM()
@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import json
+import asyncio
+import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.middleware.logging_middleware import LoggingMiddleware
+from infastructure.resources.log_queue import LogQueue, set_request_user
+
+
+class Route:
+    def __init__(self, path):
+        self.path = path
+
+
+def build_app(status, route, username=None):
+    # Answers like a route of the router, which sets the route it matched in the scope
+    async def app(scope, receive, send):
+        scope["route"] = Route(route)
+        set_request_user(username)
+        logging.getLogger("knowledgebase.test").info("answering")
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app
+
+
+def call(middleware, path, headers=()):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages
+
+
+def read_lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_requests_are_logged_as_json_with_their_request_id():
+    stream = io.StringIO()
+    log_queue = LogQueue(level="INFO", stream=stream)
+    log_queue.open()
+    try:
+        middleware = LoggingMiddleware(
+            build_app(200, "/pdf/{pdf_name}", "alice"), sample_rates=""
+        )
+        messages = call(middleware, "/pdf/manual.pdf", [(b"x-request-id", b"abc")])
+    finally:
+        log_queue.close()
+
+    assert (b"x-request-id", b"abc") in messages[0]["headers"]
+    inner, access = read_lines(stream)
+    assert inner["message"] == "answering"
+    assert inner["request_id"] == "abc"
+    assert access["route"] == "/pdf/{pdf_name}"
+    assert access["status"] == 200
+    assert access["user"] == "alice"
+    assert access["request_id"] == "abc"
+    assert access["duration_ms"] >= 0
+
+
+def test_sampled_routes_still_log_their_failures():
+    stream = io.StringIO()
+    log_queue = LogQueue(level="INFO", stream=stream)
+    log_queue.open()
+    try:
+        for status in (200, 200, 503):
+            middleware = LoggingMiddleware(
+                build_app(status, "/health"), sample_rates="/health=0"
+            )
+            call(middleware, "/health")
+    finally:
+        log_queue.close()
+
+    access = [line for line in read_lines(stream) if line["message"] == "request"]
+    assert [line["status"] for line in access] == [503]
+
+
+def test_records_are_dropped_when_the_queue_is_full():
+    log_queue = LogQueue(level="INFO", queue_size=2, stream=io.StringIO())
+    log_queue.open()
+
+    # Stop the writer so that nothing leaves the queue
+    log_queue.listener.stop()
+    for number in range(5):
+        logging.getLogger("knowledgebase.test").info("record %d", number)
+    stats = log_queue.get_stats()
+    logging.getLogger().removeHandler(log_queue.handler)
+
+    assert stats == {"queued": 2, "dropped": 3}
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from botocore.exceptions import ClientError
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.pdf_cache_repository import PdfCacheRepository
+
+
+class FakeBody:
+    def __init__(self, content):
+        self.content = content
+
+    def iter_chunks(self, size):
+        for start in range(0, len(self.content), size):
+            yield self.content[start : start + size]
+
+
+class FakeS3Client:
+    # Objects by key, the ETag of an object being the md5 of its content like in S3
+    def __init__(self, delay=0.0):
+        self.objects = {}
+        self.delay = delay
+        self.gets = 0
+        self.heads = 0
+        self.lock = threading.Lock()
+
+    def put(self, key, content):
+        self.objects[key] = content
+
+    def get_etag(self, key):
+        return '"' + hashlib.md5(self.objects[key]).hexdigest() + '"'
+
+    def get_object(self, Bucket, Key):
+        with self.lock:
+            self.gets += 1
+        time.sleep(self.delay)
+        content = self.objects[Key]
+        return {
+            "Body": FakeBody(content),
+            "ETag": self.get_etag(Key),
+            "ContentLength": len(content),
+        }
+
+    def head_object(self, Bucket, Key, IfNoneMatch):
+        with self.lock:
+            self.heads += 1
+        if IfNoneMatch == self.get_etag(Key):
+            raise ClientError({"Error": {"Code": "304"}}, "HeadObject")
+        return {"ETag": self.get_etag(Key)}
+
+
+class FakeResources:
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+
+    def get_s3_client(self):
+        return self.s3_client
+
+
+def build_cache(tmp_path, s3_client, **kwargs):
+    return PdfCacheRepository(
+        FakeResources(s3_client), directory=str(tmp_path / "pdf_cache"), **kwargs
+    )
+
+
+def read(cache, key):
+    with cache.local_copy(key) as path:
+        with open(path, "rb") as file:
+            return file.read()
+
+
+def test_a_file_in_use_is_not_evicted(tmp_path):
+    s3_client = FakeS3Client()
+    for key in ("a.pdf", "b.pdf", "c.pdf"):
+        s3_client.put(key, key.encode() * 4)
+    cache = build_cache(tmp_path, s3_client, max_bytes=45)
+
+    with cache.local_copy("a.pdf") as path:
+        # The third file goes over the bound, but the one being read stays
+        read(cache, "b.pdf")
+        read(cache, "c.pdf")
+        with open(path, "rb") as file:
+            assert file.read() == b"a.pdf" * 4
+
+    # Once it is not in use anymore it is the least recently used one
+    read(cache, "b.pdf")
+    assert cache.get_stats()["files"] == 2
+    assert not os.path.exists(path)
+
+
+def test_an_invalidated_file_is_removed_after_its_last_read(tmp_path):
+    s3_client = FakeS3Client()
+    s3_client.put("a.pdf", b"first version")
+    cache = build_cache(tmp_path, s3_client)
+
+    with cache.local_copy("a.pdf") as path:
+        cache.invalidate("a.pdf")
+        assert os.path.exists(path)
+
+        # A reader after the invalidation gets the file again from S3
+        s3_client.put("a.pdf", b"second version")
+        assert read(cache, "a.pdf") == b"second version"
+
+    assert read(cache, "a.pdf") == b"second version"
+    cache.invalidate("a.pdf")
+    assert not os.path.exists(path)
+
+
+def test_the_size_bound_covers_the_files_of_every_worker(tmp_path):
+    s3_client = FakeS3Client()
+    for key in ("a.pdf", "b.pdf", "c.pdf", "d.pdf"):
+        s3_client.put(key, b"0123456789")
+    first = build_cache(tmp_path, s3_client, max_bytes=25)
+    second = build_cache(tmp_path, s3_client, max_bytes=25)
+
+    # Two workers share the directory, each caches two files
+    read(first, "a.pdf")
+    read(first, "b.pdf")
+    read(second, "c.pdf")
+    read(second, "d.pdf")
+
+    assert first.get_stats()["bytes"] == second.get_stats()["bytes"] == 20
+
+
+def test_concurrent_reads_of_a_key_wait_for_a_single_download(tmp_path):
+    s3_client = FakeS3Client(delay=0.1)
+    s3_client.put("a.pdf", b"content")
+    cache = build_cache(tmp_path, s3_client)
+    contents = []
+
+    threads = [
+        threading.Thread(target=lambda: contents.append(read(cache, "a.pdf")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert contents == [b"content"] * 8
+    assert s3_client.gets == 1
+    assert cache.get_stats()["misses"] == 1
+    assert cache.get_stats()["hits"] == 7
+
+
+def test_a_stale_copy_is_revalidated_with_a_conditional_head(tmp_path):
+    s3_client = FakeS3Client()
+    s3_client.put("a.pdf", b"first version")
+    cache = build_cache(tmp_path, s3_client, revalidate_seconds=0)
+    read(cache, "a.pdf")
+
+    # An unchanged file is only checked, not downloaded again
+    assert read(cache, "a.pdf") == b"first version"
+    assert (s3_client.heads, s3_client.gets) == (1, 1)
+
+    # A changed file is downloaded again
+    s3_client.put("a.pdf", b"second version")
+    assert read(cache, "a.pdf") == b"second version"
+    assert (s3_client.heads, s3_client.gets) == (2, 2)
+
+
+def test_a_fresh_copy_is_only_revalidated_when_asked(tmp_path):
+    s3_client = FakeS3Client()
+    s3_client.put("a.pdf", b"content")
+    cache = build_cache(tmp_path, s3_client, revalidate_seconds=60)
+    read(cache, "a.pdf")
+
+    read(cache, "a.pdf")
+    assert s3_client.heads == 0
+
+    with cache.local_copy("a.pdf", revalidate=True):
+        pass
+    assert s3_client.heads == 1
@@ -0,0 +1,101 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.pdf_parser_repository import PdfParser
+
+
+def build_form(writer, text):
+    # A form XObject that draws the text, like the pages of imposition tools
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    form = DecodedStreamObject()
+    form.set_data(f"BT /F1 12 Tf 20 100 Td ({text}) Tj ET".encode("latin-1"))
+    form.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject([NumberObject(0)] * 2 + [NumberObject(200)] * 2),
+            NameObject("/Resources"): DictionaryObject(
+                {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+            ),
+        }
+    )
+    return writer._add_object(form)
+
+
+def write_pdf(path, texts):
+    # Every page has the same content stream, only the form it draws differs
+    writer = PdfWriter()
+    for text in texts:
+        page = writer.add_blank_page(200, 200)
+        contents = DecodedStreamObject()
+        contents.set_data(b"/Fm0 Do")
+        page[NameObject("/Contents")] = writer._add_object(contents)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/XObject"): DictionaryObject(
+                    {NameObject("/Fm0"): build_form(writer, text)}
+                )
+            }
+        )
+    with open(path, "wb") as file:
+        writer.write(file)
+
+
+def test_pages_with_the_same_contents_but_other_forms_keep_their_text(tmp_path):
+    path = str(tmp_path / "imposed.pdf")
+    write_pdf(path, ["Pump seal", "Valve bearing"])
+
+    pages = PdfParser().load(path, "imposed.pdf")
+    hashes = [page.metadata["page_hash"] for page in pages]
+    assert hashes[0] != hashes[1]
+    assert "Pump seal" in pages[0].page_content
+    assert "Valve bearing" in pages[1].page_content
+
+    # Uploaded again, every page gets its own text back
+    known_pages = {page.metadata["page_hash"]: page.page_content for page in pages}
+    reloaded = PdfParser().load(path, "imposed.pdf", known_pages=known_pages)
+    assert [page.page_content for page in reloaded] == [
+        page.page_content for page in pages
+    ]
+
+
+def test_the_same_page_keeps_its_hash(tmp_path):
+    first, second = str(tmp_path / "first.pdf"), str(tmp_path / "second.pdf")
+    write_pdf(first, ["Pump seal", "Valve bearing"])
+    write_pdf(second, ["Pump seal", "Filter"])
+
+    first_hashes = [page.metadata["page_hash"] for page in PdfParser().load(first, "a")]
+    second_hashes = [page.metadata["page_hash"] for page in PdfParser().load(second, "a")]
+    assert first_hashes[0] == second_hashes[0]
+    assert first_hashes[1] != second_hashes[1]
+
+
+def test_pages_are_parsed_by_spawned_worker_processes(tmp_path):
+    path = str(tmp_path / "imposed.pdf")
+    write_pdf(path, ["Pump seal", "Valve bearing", "Filter"])
+
+    # A spawned worker starts a fresh interpreter, so nothing locked is copied from this one
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        pages = PdfParser(pool, pages_per_task=1).load(path, "imposed.pdf")
+
+    assert [page.page_content for page in pages] == [
+        page.page_content for page in PdfParser().load(path, "imposed.pdf")
+    ]
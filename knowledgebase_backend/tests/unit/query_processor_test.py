@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+from langchain_core.documents import Document
+from langchain_core.language_models.fake import FakeStreamingListLLM
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.pdf_chat_repository import QueryProcessor
+
+ANSWER = "The warranty period is two years."
+DOCUMENTS = [
+    Document(page_content="The warranty period is two years.", metadata={"page": 3}),
+    Document(page_content="Returns are accepted within 30 days.", metadata={"page": 4}),
+]
+
+
+def test_answer_is_streamed_token_by_token():
+    # The fake model yields one character every 10 milliseconds
+    llm = FakeStreamingListLLM(responses=[ANSWER], sleep=0.01)
+    query_processor = QueryProcessor(api_key=None, llm=llm)
+
+    started = time.perf_counter()
+    tokens = query_processor.stream_answer("What is the warranty period?", DOCUMENTS)
+    first_token = next(tokens)
+    time_to_first_token = time.perf_counter() - started
+    rest = list(tokens)
+    total_time = time.perf_counter() - started
+
+    assert first_token + "".join(rest) == ANSWER
+    assert time_to_first_token < total_time / 2
+
+
+def test_prompt_contains_the_retrieved_chunks():
+    query_processor = QueryProcessor(api_key=None, llm=FakeStreamingListLLM(responses=[ANSWER]))
+    prompt = query_processor.build_prompt("What is the warranty period?", DOCUMENTS)
+
+    for document in DOCUMENTS:
+        assert document.page_content in prompt
+    assert "What is the warranty period?" in prompt
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.reranker_repository import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    # Scores a chunk by the number it holds, in delay seconds per chunk
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = 0
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        time.sleep(self.delay * len(pairs))
+        self.batches += 1
+        return [float(content) for _, content in pairs]
+
+
+def build_reranker(cross_encoder, **kwargs):
+    reranker = CrossEncoderReranker(**kwargs)
+    reranker.cross_encoder = cross_encoder
+    return reranker
+
+
+DOCUMENTS = [Document(page_content=str(number), metadata={}) for number in range(10)]
+
+
+def test_candidates_are_ordered_by_their_score_in_batches():
+    cross_encoder = FakeCrossEncoder()
+    reranker = build_reranker(cross_encoder, batch_size=4, top_k=3)
+
+    reranked = reranker.rerank("question", DOCUMENTS)
+
+    assert [document.page_content for document in reranked] == ["9", "8", "7"]
+    assert cross_encoder.batches == 3
+    assert reranker.get_stats()["timeouts"] == 0
+
+
+def test_candidates_past_the_timeout_keep_the_retrieval_order():
+    reranker = build_reranker(
+        FakeCrossEncoder(delay=0.05), batch_size=2, timeout_seconds=0.18
+    )
+
+    reranked = reranker.rerank("question", DOCUMENTS, k=6)
+
+    # The first batch measures the model, the second is cut to the one chunk that still fits
+    assert [document.page_content for document in reranked] == ["2", "1", "0", "3", "4", "5"]
+    assert reranker.get_stats()["timeouts"] == 1
+    assert reranker.get_stats()["overruns"] == 0
+
+
+def test_batches_are_sized_to_the_remaining_time():
+    cross_encoder = FakeCrossEncoder(delay=0.05)
+    reranker = build_reranker(cross_encoder, batch_size=4, timeout_seconds=0.06)
+
+    # Nothing is measured yet, so the first batch is a full one and overruns the deadline
+    reranker.rerank("question", DOCUMENTS)
+    assert reranker.get_stats()["overruns"] == 1
+
+    # Then only the one chunk that fits in the deadline is scored
+    reranked = reranker.rerank("question", DOCUMENTS, k=2)
+
+    assert [document.page_content for document in reranked] == ["0", "1"]
+    assert cross_encoder.batches == 2
+    assert reranker.get_stats()["overruns"] == 1
+    assert reranker.get_stats()["timeouts"] == 2
@@ -0,0 +1,72 @@
+import os
+import sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.resources.telemetry import NO_SPAN, Telemetry
+
+
+def get_count(telemetry, stage):
+    return telemetry.registry.get_sample_value(
+        "rag_stage_duration_seconds_count", {"stage": stage}
+    )
+
+
+def test_spans_are_observed_by_stage():
+    telemetry = Telemetry(metrics=True, tracing=False)
+
+    for _ in range(3):
+        with telemetry.span("query.vector_search"):
+            pass
+    telemetry.record("mongo.find", 0.002)
+
+    assert get_count(telemetry, "query.vector_search") == 3
+    assert get_count(telemetry, "mongo.find") == 1
+    assert get_count(telemetry, "query.llm") is None
+
+
+def test_failed_stages_are_observed_and_raise():
+    telemetry = Telemetry(metrics=True, tracing=False)
+
+    with pytest.raises(ValueError):
+        with telemetry.span("index.parse"):
+            raise ValueError("broken PDF")
+
+    assert get_count(telemetry, "index.parse") == 1
+
+
+def test_export_holds_the_histograms():
+    telemetry = Telemetry(metrics=True, tracing=False)
+    with telemetry.span("index.split"):
+        pass
+
+    content, content_type = telemetry.export()
+
+    assert b'rag_stage_duration_seconds_bucket{le="0.001",stage="index.split"}' in content
+    assert content_type.startswith("text/plain")
+
+
+def test_nothing_is_recorded_when_disabled():
+    telemetry = Telemetry(metrics=False, tracing=False)
+
+    assert telemetry.span("query.llm") is NO_SPAN
+    with telemetry.span("query.llm"):
+        pass
+    telemetry.record("s3.GetObject", 0.1)
+
+    assert telemetry.export()[0] is None
+
+
+def test_stats_of_the_caches_are_exported_at_every_scrape():
+    telemetry = Telemetry(metrics=True, tracing=False)
+    stats = {"hits": 3, "misses": 1, "hit_rate": 0.75, "users": {"alice": 1}}
+    telemetry.register_stats("answer_cache", lambda: stats)
+    telemetry.register_stats("reranker", lambda: None)
+    telemetry.register_stats("broken", lambda: 1 / 0)
+
+    get_value = telemetry.registry.get_sample_value
+    assert get_value("rag_answer_cache_hits_total") == 3
+    assert get_value("rag_answer_cache_hit_rate") == 0.75
+
+    stats["hits"] = 4
+    assert get_value("rag_answer_cache_hits_total") == 4
+    assert b"rag_answer_cache_users" not in telemetry.export()[0]
@@ -0,0 +1,73 @@
+import os
+import sys
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.text_splitter_repository import (
+    StructureTextSplitter,
+    find_table_rows,
+    is_heading,
+)
+
+
+class WordCounter:
+    def count_batch(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+def paragraph(word, lines):
+    return "\n".join(" ".join([word] * 9) + "." for _ in range(lines))
+
+
+def split(pages, chunk_tokens=40, overlap_tokens=10):
+    splitter = StructureTextSplitter(chunk_tokens, overlap_tokens, WordCounter())
+    return splitter.split_documents(
+        [Document(page_content=page, metadata={"page": number}) for number, page in enumerate(pages)]
+    )
+
+
+def test_chunks_are_slices_of_their_page_within_the_budget():
+    pages = [paragraph("alpha", 12), paragraph("beta", 3)]
+    chunks = split(pages)
+
+    for chunk in chunks:
+        page = pages[chunk.metadata["page"]]
+        start = chunk.metadata["start_index"]
+        assert page[start : start + len(chunk.page_content)] == chunk.page_content
+        assert len(chunk.page_content.split()) <= 40
+    assert [chunk.metadata["page"] for chunk in chunks][-1] == 1
+    assert "beta" not in " ".join(c.page_content for c in chunks if c.metadata["page"] == 0)
+
+
+def test_headings_start_a_chunk_and_name_its_section():
+    page = "1.1 Scope\n" + paragraph("alpha", 3) + "\n1.2 Pumps\n" + paragraph("beta", 3)
+    chunks = split([page, paragraph("gamma", 1)])
+
+    assert [chunk.page_content.split("\n")[0] for chunk in chunks[:2]] == ["1.1 Scope", "1.2 Pumps"]
+    assert [chunk.metadata["section"] for chunk in chunks] == ["1.1 Scope", "1.2 Pumps", "1.2 Pumps"]
+
+
+def test_headings_and_table_rows_are_recognized():
+    assert is_heading("2.1 Hydraulic pump")
+    assert is_heading("SAFETY NOTES")
+    assert not is_heading("Check the pump before every start.")
+
+    text = "Part   Count\nPN-1   4\nThe   pump is checked.\n  indented line"
+    assert find_table_rows(text) == {0, 13, 22}
+
+
+class CharacterCounter:
+    # One token per character, like the dense scripts
+    def count_batch(self, texts):
+        return [len(text) for text in texts]
+
+
+def test_dense_lines_are_cut_within_the_budget():
+    page = "漢字" * 150 + "\n" + "かな" * 10
+    splitter = StructureTextSplitter(40, 10, CharacterCounter())
+    chunks = splitter.split_documents([Document(page_content=page, metadata={"page": 0})])
+
+    # The lines are counted without the line breaks between them
+    assert all(len(chunk.page_content.replace("\n", "")) <= 40 for chunk in chunks)
+    ends = [chunk.metadata["start_index"] + len(chunk.page_content) for chunk in chunks]
+    assert [chunk.metadata["start_index"] for chunk in chunks[1:]] == ends[:-1]
+    assert ends[-1] == len(page)
@@ -0,0 +1,22 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.token_counter_repository import TokenCounter
+
+
+TEXTS = ["Replace the pump seal every 500 hours.", "Fault code E404_0012", ""]
+
+
+def test_batches_are_counted_like_single_texts():
+    token_counter = TokenCounter()
+
+    assert token_counter.count_batch(TEXTS) == [token_counter.count(text) for text in TEXTS]
+
+
+def test_tokens_are_estimated_without_the_tokenizer():
+    token_counter = TokenCounter()
+    token_counter.encoding = None
+
+    assert token_counter.count("a" * 40) == 11
+    assert token_counter.count_batch(["a" * 40, ""]) == [11, 1]
+    assert token_counter.truncate("a" * 40, 3) == "a" * 12
@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+from langchain_core.documents import Document
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src")))
+from infastructure.repositories.vector_store_repository import (
+    VectorStoreRepository,
+    VectorIndex,
+    normalize,
+)
+
+
+def build_index(path, count, dimensions=32, seed=0):
+    # The text of every chunk names its index and its position
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions))
+    documents = [
+        Document(
+            page_content=f"{path.name} chunk {position} – ü",
+            metadata={"page": position},
+        )
+        for position in range(count)
+    ]
+    VectorIndex.write(str(path), documents, vectors)
+    return vectors
+
+
+def test_search_returns_the_exact_nearest_chunks(tmp_path):
+    vectors = build_index(tmp_path / "a", 1000)
+    query = np.random.default_rng(1).normal(size=32)
+
+    documents = VectorStoreRepository().search([str(tmp_path / "a")], query, 5)
+
+    expected = np.argsort(-(normalize(vectors) @ normalize(query)))[:5]
+    assert [document.metadata["page"] for document in documents] == list(expected)
+
+
+def test_chunks_are_read_back_from_the_offset_table(tmp_path):
+    build_index(tmp_path / "a", 10)
+
+    index = VectorIndex(str(tmp_path / "a"))
+
+    assert len(index) == 10
+    assert index.get_document(7).page_content == "a chunk 7 – ü"
+    assert index.get_document(7).metadata == {"page": 7}
+    assert index.quantized.dtype == np.int8
+
+
+def test_search_spans_several_indexes(tmp_path):
+    build_index(tmp_path / "a", 100, seed=0)
+    vectors = build_index(tmp_path / "b", 100, seed=1)
+
+    documents = VectorStoreRepository().search(
+        [str(tmp_path / "a"), str(tmp_path / "b"), str(tmp_path / "missing")],
+        vectors[42],
+        1,
+    )
+
+    assert documents[0].page_content == "b chunk 42 – ü"